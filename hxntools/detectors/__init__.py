@@ -4,3 +4,4 @@ from .xspress3 import (Xspress3Detector, Xspress3HDF5Handler,
 from .zebra import (HXNZebra, Zebra)
 from .merlin import (MerlinDetector, MerlinFileStore)
 from .beamstatus import (BeamStatusDetector, )
+from .master_detector import (MasterDetector, DetectorConfigurationError)
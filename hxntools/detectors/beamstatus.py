@@ -1,5 +1,9 @@
 from __future__ import print_function
+import time
 import logging
+import threading
+
+import numpy as np
 
 from ophyd.controls.ophydobj import OphydObject
 from ophyd.controls import EpicsSignal
@@ -13,19 +17,151 @@ sr_beam_current = EpicsSignal('SR:C03-BI{DCCT:1}I:Real-I', rw=False,
                               name='sr_beam_current')
 
 
+class BeamStatusHistory(object):
+    '''Fixed-size ring buffer of beam status samples
+
+    Each sample holds (timestamp, current, shutter, ok), where ok is the
+    overall beam status. A sample describes the state from its timestamp
+    until the next sample, so only status changes need to be recorded.
+
+    Parameters
+    ----------
+    size : int, optional
+        Number of samples kept; the oldest are overwritten
+    '''
+    dtype = np.dtype([('timestamp', 'f8'), ('current', 'f8'),
+                      ('shutter', 'i2'), ('ok', '?')])
+
+    def __init__(self, size=10000):
+        self._data = np.zeros(int(size), dtype=self.dtype)
+        self._index = 0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._count
+
+    def append(self, timestamp, current, shutter, ok):
+        '''Add a sample'''
+        with self._lock:
+            self._data[self._index] = (timestamp, current, shutter, ok)
+            self._index = (self._index + 1) % len(self._data)
+            self._count = min(self._count + 1, len(self._data))
+
+    def samples(self):
+        '''All samples in chronological order (a copy)'''
+        with self._lock:
+            if self._count < len(self._data):
+                return self._data[:self._count].copy()
+            return np.roll(self._data, -self._index)
+
+    def down_intervals(self, start=None, stop=None):
+        '''Intervals during which the beam was down
+
+        Parameters
+        ----------
+        start : float, optional
+            Clip intervals to start at this time
+        stop : float, optional
+            Clip intervals to end at this time; defaults to now
+
+        Returns
+        -------
+        intervals : ndarray
+            (num_intervals, 2) array of (down time, up time)
+        '''
+        if stop is None:
+            stop = time.time()
+
+        samples = self.samples()
+        if not len(samples):
+            return np.zeros((0, 2))
+
+        times = samples['timestamp']
+        ok = samples['ok']
+        ends = np.append(times[1:], max(stop, times[-1]))
+
+        # merge consecutive down samples into single intervals
+        down = ~ok
+        changes = np.diff(down.astype(np.int8))
+        first = np.flatnonzero(np.append(down[0], changes == 1))
+        last = np.flatnonzero(np.append(changes == -1, down[-1]))
+        intervals = np.column_stack([times[first], ends[last]])
+
+        if start is not None:
+            intervals[:, 0] = np.maximum(intervals[:, 0], start)
+        intervals[:, 1] = np.minimum(intervals[:, 1], stop)
+        return intervals[intervals[:, 1] > intervals[:, 0]]
+
+    def downtime(self, start=None, stop=None):
+        '''Total time the beam was down between start and stop'''
+        intervals = self.down_intervals(start, stop)
+        return float(np.sum(intervals[:, 1] - intervals[:, 0]))
+
+    def affected_points(self, point_timestamps, exposure=0.0):
+        '''Indices of points acquired while the beam was down
+
+        Parameters
+        ----------
+        point_timestamps : array_like
+            Time at which each point was read
+        exposure : float, optional
+            Points are taken to span [timestamp - exposure, timestamp]
+
+        Returns
+        -------
+        indices : ndarray
+        '''
+        ts = np.asarray(point_timestamps, dtype=float)
+        if not len(ts):
+            return np.zeros(0, dtype=int)
+
+        intervals = self.down_intervals(stop=np.max(ts))
+        if not len(intervals):
+            return np.zeros(0, dtype=int)
+
+        # a point overlaps an interval if it starts before the interval ends
+        # and ends after it starts
+        idx = np.searchsorted(intervals[:, 1], ts - exposure, side='right')
+        idx = np.minimum(idx, len(intervals) - 1)
+        overlaps = ((intervals[idx, 0] <= ts) &
+                    (intervals[idx, 1] > ts - exposure))
+        return np.flatnonzero(overlaps)
+
+    def __repr__(self):
+        return '{0.__class__.__name__}(samples={1})'.format(self, len(self))
+
+
 class BeamStatusDetector(OphydObject, Detector):
     def __init__(self, *args, **kwargs):
         self._shutter_status = kwargs.pop('shutter_status', sr_shutter_status)
         self._beam_current = kwargs.pop('beam_current', sr_beam_current)
         self._min_current = kwargs.pop('min_current', 100.0)
+        history_size = kwargs.pop('history_size', 10000)
+        # minimum time between beam status log messages
+        self.log_interval = kwargs.pop('log_interval', 1.0)
 
         OphydObject.__init__(self, *args, **kwargs)
 
         self._shutter_ok = False
         self._current_ok = False
+        # None until the first value of each signal arrives
+        self._shutter = None
+        self._current = None
         self._last_status = None
         self._statuses = []
 
+        self.history = BeamStatusHistory(history_size)
+        self._scan_start = None
+        # time at which each point of the current scan was read
+        self.point_timestamps = []
+        self._last_log = 0.0
+        self._suppressed = 0
+        # logs the latest status once log_interval has passed
+        self._log_timer = None
+        self._log_lock = threading.Lock()
+
+        # both signals report on subscription, which seeds the history
         self._shutter_status.subscribe(self._shutter_changed)
         self._beam_current.subscribe(self._current_changed)
 
@@ -38,17 +174,18 @@ class BeamStatusDetector(OphydObject, Detector):
             self._statuses.append(status)
 
         if not status.done:
-            logger.warning('---')
-            logger.warning('Waiting for beam status to change...')
-            logger.warning('---')
+            logger.warning('Waiting for beam status to change (%s)',
+                           self._status_summary())
 
         return status
 
     def _shutter_changed(self, value=None, **kwargs):
+        self._shutter = value
         self._shutter_ok = (value == 1)
         self._check_status()
 
     def _current_changed(self, value=None, **kwargs):
+        self._current = value
         self._current_ok = (value > self._min_current)
         self._check_status()
 
@@ -60,31 +197,98 @@ class BeamStatusDetector(OphydObject, Detector):
     def status(self):
         return self._shutter_ok and self._current_ok
 
+    def _status_summary(self):
+        return ('shutters {}, current {:.1f} {} threshold of {:.1f}'
+                ''.format('open' if self._shutter_ok else 'closed',
+                          float(self._current),
+                          'meets' if self._current_ok else 'below',
+                          self._min_current))
+
     def _check_status(self):
-        status = self.status
+        if self._shutter is None or self._current is None:
+            return
 
+        status = self.status
         if status:
             self._done()
 
         if status != self._last_status:
-            logger.warning('Beam status changed:')
+            # local time, as for point_timestamps (IOC timestamps come from
+            # another clock and may predate the subscription)
+            self.history.append(time.time(), self._current, self._shutter,
+                                status)
+            self._log_change(status)
 
-            if self._shutter_ok:
-                logger.warning('Shutters are open')
-            else:
-                logger.warning('Shutters are closed')
+        self._last_status = status
 
-            if self._current_ok:
-                logger.warning('Current meets threshold of %f' %
-                               self._min_current)
-            else:
-                logger.warning('Current does not meet threshold of %f' %
-                               self._min_current)
+    def _log_change(self, status):
+        '''Log a status change, at most once per log_interval
 
-        self._last_status = status
+        Changes within the interval are not logged immediately; the latest
+        status is logged when the interval expires.
+        '''
+        with self._log_lock:
+            wait = self.log_interval - (time.time() - self._last_log)
+            if wait > 0:
+                self._suppressed += 1
+                if self._log_timer is None:
+                    self._log_timer = threading.Timer(wait, self._flush_log)
+                    self._log_timer.daemon = True
+                    self._log_timer.start()
+                return
+
+            self._emit_log(status)
+
+    def _flush_log(self):
+        '''Log the latest status if changes since the last log were not
+        logged'''
+        with self._log_lock:
+            if self._log_timer is not None:
+                self._log_timer.cancel()
+                self._log_timer = None
+
+            if self._suppressed:
+                # the latest change is the one being logged
+                self._suppressed -= 1
+                self._emit_log(self.status)
+
+    def _emit_log(self, status):
+        now = time.time()
+        if self._suppressed:
+            suppressed = ' ({} earlier changes not logged)'.format(
+                self._suppressed)
+        else:
+            suppressed = ''
+
+        logger.warning('Beam status changed to %s: %s%s',
+                       'OK' if status else 'DOWN', self._status_summary(),
+                       suppressed)
+        self._last_log = now
+        self._suppressed = 0
+
+    def configure(self, state=None):
+        super(BeamStatusDetector, self).configure(state=state)
+        self._scan_start = time.time()
+        self.point_timestamps = []
+
+    def deconfigure(self):
+        self._flush_log()
+        super(BeamStatusDetector, self).deconfigure()
+
+    def scan_downtime(self):
+        '''Total time the beam was down since the scan was configured'''
+        if self._scan_start is None:
+            return 0.0
+        return self.history.downtime(start=self._scan_start)
+
+    def affected_points(self, point_timestamps, exposure=0.0):
+        '''Indices of points acquired while the beam was down'''
+        return self.history.affected_points(point_timestamps,
+                                            exposure=exposure)
 
     def read(self):
         del self._statuses[:]
+        self.point_timestamps.append(time.time())
         return self._beam_current.read()
 
     def describe(self):
@@ -1,21 +1,66 @@
 from __future__ import print_function
+import time
 import logging
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from filestore.commands import bulk_insert_datum
+
+from ..timing import instrumented
 
 
 logger = logging.getLogger(__name__)
 
 
+class DetectorConfigurationError(RuntimeError):
+    '''One or more detectors failed to configure/deconfigure
+
+    Attributes
+    ----------
+    errors : dict
+        {detector: exception}
+    '''
+    def __init__(self, msg, errors):
+        super(DetectorConfigurationError, self).__init__(msg)
+        self.errors = errors
+
+
+def _det_name(det):
+    return getattr(det, 'name', None) or repr(det)
+
+
+@instrumented()
 class MasterDetector(object):
     '''Hardware-trigger master detector
+
+    Parameters
+    ----------
+    master : detector
+        The detector which generates the hardware triggers
+    slaves : list, optional
+        Detectors triggered by the master
+    read_master : bool, optional
+        Include the master in read/describe
+    concurrent : bool, optional
+        Configure and deconfigure slaves in parallel on a thread pool. All
+        slaves are configured (armed) before the master, and the master is
+        deconfigured (stops triggering) before the slaves.
+    max_workers : int, optional
+        Thread pool size for concurrent mode; defaults to the number of slaves
     '''
 
-    def __init__(self, master, slaves=None, read_master=True):
+    def __init__(self, master, slaves=None, read_master=True,
+                 concurrent=False, max_workers=None):
         if slaves is None:
             slaves = []
 
         self._master = master
         self._slaves = list(slaves)
         self._read_master = bool(read_master)
+        self.concurrent = bool(concurrent)
+        self.max_workers = max_workers
+        # {'configure': {name: elapsed}, 'deconfigure': {name: elapsed}}
+        self.timings = {}
 
     @property
     def count_time(self):
@@ -28,16 +73,108 @@ class MasterDetector(object):
     def trigger(self, *args, **kwargs):
         return self._master.trigger(*args, **kwargs)
 
+    def _call_all(self, phase, calls):
+        '''Call `phase` on each detector, timing each and collecting errors
+
+        Parameters
+        ----------
+        phase : str
+            Method name, e.g., 'configure'
+        calls : list of (detector, kwargs)
+            Run on a thread pool if concurrent mode is enabled
+
+        Returns
+        -------
+        errors : dict
+            {detector: exception}
+        '''
+        timings = self.timings.setdefault(phase, OrderedDict())
+
+        def run(det, kwargs):
+            t0 = time.time()
+            try:
+                getattr(det, phase)(**kwargs)
+            finally:
+                timings[_det_name(det)] = time.time() - t0
+
+        errors = OrderedDict()
+        if self.concurrent and len(calls) > 1:
+            max_workers = self.max_workers or len(calls)
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = [(det, executor.submit(run, det, kwargs))
+                           for det, kwargs in calls]
+                for det, future in futures:
+                    ex = future.exception()
+                    if ex is not None:
+                        errors[det] = ex
+        else:
+            for det, kwargs in calls:
+                try:
+                    run(det, kwargs)
+                except Exception as ex:
+                    if not self.concurrent:
+                        raise
+                    errors[det] = ex
+
+        for det, ex in errors.items():
+            logger.error('%s of %s failed', phase, _det_name(det),
+                         exc_info=ex)
+        return errors
+
+    def _check_errors(self, phase, errors):
+        if errors:
+            names = ', '.join('{} ({})'.format(_det_name(det), ex)
+                              for det, ex in errors.items())
+            raise DetectorConfigurationError('{} failed: {}'.format(phase,
+                                                                    names),
+                                             errors)
+
+    def _report_timings(self, phase):
+        for name, elapsed in self.timings.get(phase, {}).items():
+            logger.debug('%s %s: %.3f s', phase, name, elapsed)
+
     def configure(self, state=None):
         # TODO not sure how state should work here
-        self._master.configure(state=state)
-        for slave in self._slaves:
-            slave.configure(state={})
+        self.timings['configure'] = OrderedDict()
+        if not self.concurrent:
+            self._call_all('configure', [(self._master, dict(state=state))])
+            self._call_all('configure', [(slave, dict(state={}))
+                                         for slave in self._slaves])
+        else:
+            # slaves are armed before the master can start triggering
+            errors = self._call_all('configure', [(slave, dict(state={}))
+                                                  for slave in self._slaves])
+            if not errors:
+                errors = self._call_all('configure',
+                                        [(self._master, dict(state=state))])
+            if errors:
+                self._disarm_slaves(errors)
+            self._check_errors('configure', errors)
+        self._report_timings('configure')
+
+    def _disarm_slaves(self, errors):
+        '''Deconfigure the slaves which configured, after a failed configure
+
+        The RunEngine does not deconfigure a detector which failed to
+        configure, so slaves left armed would otherwise stay armed.
+        '''
+        configured = [slave for slave in self._slaves if slave not in errors]
+        if not configured:
+            return
+
+        logger.warning('configure failed; deconfiguring %s',
+                       ', '.join(_det_name(slave) for slave in configured))
+        self._call_all('deconfigure', [(slave, {}) for slave in configured])
 
     def deconfigure(self):
-        self._master.deconfigure()
-        for slave in self._slaves:
-            slave.deconfigure()
+        self.timings['deconfigure'] = OrderedDict()
+        # the master stops triggering first; slaves are all deconfigured even
+        # if one of them fails
+        errors = self._call_all('deconfigure', [(self._master, {})])
+        errors.update(self._call_all('deconfigure',
+                                     [(slave, {}) for slave in self._slaves]))
+        self._check_errors('deconfigure', errors)
+        self._report_timings('deconfigure')
 
     @property
     def master(self):
@@ -73,6 +210,46 @@ class MasterDetector(object):
             read.update(det.read())
         return read
 
+    def bulk_read(self, timestamps):
+        '''Bulk read from all readable detectors, e.g., after a fly scan
+
+        Detectors are read concurrently. Those which support `bulk_datum`
+        hand back their datum documents instead of inserting them, and the
+        datums are inserted in one batch per filestore resource.
+        '''
+        dets = [det for det in self.readable_detectors
+                if hasattr(det, 'bulk_datum') or hasattr(det, 'bulk_read')]
+
+        def read(det):
+            if hasattr(det, 'bulk_datum'):
+                return det.bulk_datum(timestamps)
+            return det.bulk_read(timestamps), []
+
+        if len(dets) > 1:
+            max_workers = self.max_workers or len(dets)
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                results = list(executor.map(read, dets))
+        else:
+            results = [read(det) for det in dets]
+
+        data = {}
+        batches = OrderedDict()
+        for det_data, datums in results:
+            data.update(det_data)
+            for resource, uids, datum_args in datums:
+                key = id(resource)
+                if key not in batches:
+                    batches[key] = (resource, [], [])
+                batches[key][1].extend(uids)
+                batches[key][2].extend(datum_args)
+
+        for resource, uids, datum_args in batches.values():
+            logger.debug('Inserting %d datums for resource %s', len(uids),
+                         resource)
+            bulk_insert_datum(resource, uids, datum_args)
+
+        return data
+
     @property
     def slaves(self):
         '''All slave detectors'''
@@ -108,7 +285,8 @@ class MasterDetector(object):
 
     def __repr__(self):
         return ('{0.__class__.__name__}({0.master}, slaves={0.slaves}, '
-                'read_master={0._read_master})'.format(self))
+                'read_master={0._read_master}, concurrent={0.concurrent})'
+                ''.format(self))
 
     def stop(self):
         # TODO bluesky implementation detail
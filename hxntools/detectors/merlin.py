@@ -6,6 +6,7 @@ from filestore.commands import bulk_insert_datum
 from ophyd.controls.areadetector.detectors import AreaDetector
 from ophyd.controls.area_detector import AreaDetectorFSIterativeWrite
 from .utils import makedirs
+from ..timing import instrumented
 
 import filestore.api as fs
 
@@ -13,6 +14,7 @@ import filestore.api as fs
 logger = logging.getLogger(__name__)
 
 
+@instrumented()
 class MerlinFileStore(AreaDetectorFSIterativeWrite):
     def __init__(self, det, basename, **kwargs):
         super(MerlinFileStore, self).__init__(basename, cam='cam1:',
@@ -43,11 +45,26 @@ class MerlinFileStore(AreaDetectorFSIterativeWrite):
         lightfield_key = '{}_image_lightfield'.format(self._det.name)
         return {self._det.name: ret[lightfield_key]}
 
-    def bulk_read(self, timestamps):
+    def bulk_datum(self, timestamps):
+        '''Generate datum uids for all points, without inserting them
+
+        Returns
+        -------
+        data : dict
+            {data key: list of uids}
+        datums : list of (resource, uids, datum_args)
+            Datum documents to insert with bulk_insert_datum
+        '''
         uids = list(str(uuid.uuid4()) for ts in timestamps)
-        datum_args = (dict(point_number=i) for i in range(len(uids)))
-        bulk_insert_datum(self._filestore_res, uids, datum_args)
-        return {self._det.name: uids}
+        datum_args = [dict(point_number=i) for i in range(len(uids))]
+        return ({self._det.name: uids},
+                [(self._filestore_res, uids, datum_args)])
+
+    def bulk_read(self, timestamps):
+        data, datums = self.bulk_datum(timestamps)
+        for resource, uids, datum_args in datums:
+            bulk_insert_datum(resource, uids, datum_args)
+        return data
 
     def describe(self):
         size = (self._arraysize1.value,
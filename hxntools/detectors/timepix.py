@@ -1,12 +1,13 @@
 from __future__ import print_function
 import os
 import numpy as np
-import time
 import logging
 
 from ophyd.controls.areadetector.detectors import (AreaDetector, ADSignal)
 from ophyd.controls.area_detector import AreaDetectorFileStoreTIFF
-from .utils import makedirs
+from .utils import (makedirs, put_many, put_and_wait, wait_for_values,
+                    PhaseTimer)
+from ..timing import instrumented
 
 
 logger = logging.getLogger(__name__)
@@ -24,6 +25,7 @@ if USE_TPX_RAW:
     _tpx_raw = pympx.MpxModule(0, 3, 0, pympx.MPIX_ROWS, 0, _tpx_raw_log)
 
 
+@instrumented()
 class TimepixFileStore(AreaDetectorFileStoreTIFF):
     def __init__(self, det, basename, **kwargs):
         super(TimepixFileStore, self).__init__(basename, cam='cam1:',
@@ -121,62 +123,95 @@ class TimepixDetector(AreaDetector):
                                           file_path=file_path,
                                           ioc_file_path=ioc_file_path,
                                           name=self.name)
+        # per-phase timing of the last fly_configure/fly_deconfigure
+        self.fly_timing = None
 
     def fly_configure(self, path, prefix, num_points,
-                      raw=False, external_trig=True, create_dirs=True):
+                      raw=False, external_trig=True, create_dirs=True,
+                      timeout=2.0):
         # NOTE: due to timepix IOC-related issues, can't use external
         # triggering reliably, so step scan and fly scan configuration
         # are different
-        if not external:
+        if not external_trig:
             raise NotImplementedError('TODO')
 
-        if self.acquire.value:
-            self.acquire.put(0)
-            time.sleep(0.1)
-
-        self.array_callbacks.put('Enable')
+        timer = PhaseTimer('{} fly_configure'.format(self.name))
+        with timer.phase('stop'):
+            if self.acquire.value:
+                put_and_wait([(self.acquire, 0)], timeout=timeout)
 
         if create_dirs:
-            try:
-                os.makedirs(path)
-            except OSError:
-                pass
+            with timer.phase('create_dirs'):
+                try:
+                    os.makedirs(path)
+                except OSError:
+                    pass
 
         # timepix 1 external triggering
-        self.trigger_mode.put(1)
+        common = [(self.array_callbacks, 'Enable'),
+                  (self.trigger_mode, 1),
+                  ]
 
         if raw:
             # setup raw file saving (buggy IOC currently)
-            self.tpx_save_raw = 0
-            time.sleep(0.1)
-
-            self.image_mode = 'Multiple'
-            self.tpx_raw_path = path + '/'
-            self.tpx_raw_prefix = prefix
-            self.num_images.put(num_points + 1)
-
-            self.tpx_save_raw = 1
-            time.sleep(0.1)
+            with timer.phase('raw_disable'):
+                self.tpx_save_raw = 0
+                wait_for_values([(self._tpx_save_to_file, 0)],
+                                timeout=timeout)
+
+            with timer.phase('configure'):
+                # NOTE: as for the tiff plugin, the path readback may not
+                #       match what was written, so it is not verified
+                put_many([(self.tpx_raw_path, path + '/')])
+                put_and_wait(common +
+                             [(self.image_mode, 'Multiple'),
+                              (self.tpx_raw_prefix, prefix),
+                              (self.num_images, num_points + 1),
+                              ], timeout=timeout)
+
+            with timer.phase('raw_enable'):
+                self.tpx_save_raw = 1
+                wait_for_values([(self._tpx_save_to_file, 1)],
+                                timeout=timeout)
         else:
             # setup the tiff plugin
-            self.tpx_save_raw = 0
-
-            self.tiff1.enable.put(1)
-            self.tiff1.file_path.put(path)
-            self.tiff1.file_name.put(prefix)
-            self.tiff1.file_number.put(0)
-            self.tiff1.auto_save.put(1)
-
-        self.acquire.put(1)
-
-    def fly_deconfigure(self):
+            with timer.phase('configure'):
+                self.tpx_save_raw = 0
+                # NOTE: the IOC may append a separator to the file path
+                #       readback, so it is not verified
+                put_many([(self.tiff1.file_number, 0),
+                          (self.tiff1.auto_save, 1),
+                          (self.tiff1.file_path, path),
+                          ])
+                put_and_wait(common +
+                             [(self.tiff1.enable, 1),
+                              (self.tiff1.file_name, prefix),
+                              ], timeout=timeout)
+                wait_for_values([(self._tpx_save_to_file, 0)],
+                                timeout=timeout)
+
+        with timer.phase('start'):
+            self.acquire.put(1)
+
+        self.fly_timing = timer
+        logger.debug(timer.report())
+
+    def fly_deconfigure(self, timeout=2.0):
+        timer = PhaseTimer('{} fly_deconfigure'.format(self.name))
         if self.tpx_save_raw.value == 1:
-            self.tpx_save_raw = 0
-            # self.dump_raw_files()
+            with timer.phase('raw_disable'):
+                self.tpx_save_raw = 0
+                wait_for_values([(self._tpx_save_to_file, 0)],
+                                timeout=timeout)
+                # self.dump_raw_files()
         else:
-            self.acquire.put(0)
-            # timepix1.trigger_mode.put(0)  # internal
-            # timepix1.image_mode = 'Continuous'
+            with timer.phase('stop'):
+                put_and_wait([(self.acquire, 0)], timeout=timeout)
+                # timepix1.trigger_mode.put(0)  # internal
+                # timepix1.image_mode = 'Continuous'
+
+        self.fly_timing = timer
+        logger.debug(timer.report())
 
     def dump_raw_files(self):
         raise NotImplementedError()
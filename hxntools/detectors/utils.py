@@ -1,6 +1,18 @@
 from __future__ import print_function
 import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
 import numpy as np
+from ophyd.utils import TimeoutError
+
+from ..timing import recorder
+
+
+logger = logging.getLogger(__name__)
 
 
 def makedirs(path, mode=0o777):
@@ -21,3 +33,139 @@ def makedirs(path, mode=0o777):
     os.chmod(path, mode)
     ret.append(path)
     return ret
+
+
+def readback_matches(signal, value):
+    '''Check if the readback of a signal matches the value put to it'''
+    if isinstance(value, str):
+        try:
+            readback = signal.get(as_string=True)
+        except TypeError:
+            readback = signal.get()
+        return readback == value
+
+    readback = signal.get()
+    try:
+        return bool(np.isclose(float(readback), float(value), rtol=1e-6,
+                               atol=1e-9))
+    except (TypeError, ValueError):
+        return readback == value
+
+
+def put_many(puts):
+    '''Issue puts to several signals without waiting on any of them
+
+    Parameters
+    ----------
+    puts : sequence of (signal, value)
+    '''
+    for signal, value in puts:
+        signal.put(value, wait=False)
+
+
+def wait_for_values(expected, timeout=2.0):
+    '''Wait for the readbacks of several signals to match expected values
+
+    Monitor callbacks on each signal wake up the waiting thread, so this
+    returns as soon as the last readback matches rather than at the next
+    polling interval.
+
+    Parameters
+    ----------
+    expected : sequence of (signal, value)
+    timeout : float, optional
+        Maximum total time to wait, in seconds
+
+    Raises
+    ------
+    TimeoutError
+        Listing the signals which did not read back the expected value
+    '''
+    pending = [(signal, value) for signal, value in expected
+               if not readback_matches(signal, value)]
+    if not pending:
+        return
+
+    changed = threading.Event()
+
+    def value_changed(**kwargs):
+        changed.set()
+
+    subscribed = []
+    try:
+        for signal, value in pending:
+            signal.subscribe(value_changed, run=False)
+            subscribed.append(signal)
+
+        t_end = time.time() + timeout
+        while pending:
+            remaining = t_end - time.time()
+            if remaining <= 0:
+                break
+
+            changed.wait(remaining)
+            changed.clear()
+            pending = [(signal, value) for signal, value in pending
+                       if not readback_matches(signal, value)]
+    finally:
+        for signal in subscribed:
+            signal.clear_sub(value_changed)
+
+    if pending:
+        msg = ', '.join('{}={!r} (expected {!r})'
+                        ''.format(getattr(signal, 'pvname', signal),
+                                  signal.get(), value)
+                        for signal, value in pending)
+        raise TimeoutError('Readbacks did not match after {} s: {}'
+                           ''.format(timeout, msg))
+
+
+def put_and_wait(puts, timeout=2.0):
+    '''Issue all puts concurrently, then wait for all of the readbacks'''
+    puts = list(puts)
+    put_many(puts)
+    wait_for_values(puts, timeout=timeout)
+
+
+class PhaseTimer(object):
+    '''Record the wall-clock duration of named phases
+
+    Parameters
+    ----------
+    name : str, optional
+        Name used in the report
+    '''
+    def __init__(self, name=''):
+        self.name = name
+        self.phases = OrderedDict()
+
+    @contextmanager
+    def phase(self, name):
+        '''Context manager timing a single phase
+
+        The phase is also added to the timing recorder, if enabled.
+        '''
+        t0 = time.time()
+        try:
+            yield
+        finally:
+            elapsed = time.time() - t0
+            self.phases[name] = self.phases.get(name, 0.0) + elapsed
+            if recorder.enabled:
+                recorder.record(self.name, name, t0, elapsed)
+
+    @property
+    def total(self):
+        '''Total time of all phases'''
+        return sum(self.phases.values())
+
+    def report(self):
+        '''Per-phase timing report'''
+        lines = ['{} timing (total {:.3f} s):'.format(self.name, self.total)]
+        lines.extend('    {:<20s} {:.3f} s'.format(phase, elapsed)
+                     for phase, elapsed in self.phases.items())
+        return '\n'.join(lines)
+
+    def __repr__(self):
+        return ('{0.__class__.__name__}(name={0.name!r}, '
+                'phases={1})'.format(self, dict(self.phases)))
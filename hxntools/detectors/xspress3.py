@@ -16,6 +16,7 @@ from ophyd.controls.area_detector import AreaDetectorFileStore
 from ophyd.controls.detector import (DetectorStatus, Detector)
 
 from .utils import makedirs
+from ..timing import instrumented
 
 from ..handlers import Xspress3HDF5Handler
 from ..handlers.xspress3 import XRF_DATA_KEY
@@ -23,6 +24,7 @@ from ..handlers.xspress3 import XRF_DATA_KEY
 logger = logging.getLogger(__name__)
 
 
+@instrumented()
 class Xspress3FileStore(AreaDetectorFileStore):
     '''Xspress3 acquisition -> filestore'''
 
@@ -66,28 +68,39 @@ class Xspress3FileStore(AreaDetectorFileStore):
                 for uid, ch in zip(uids, self.channels)
                 }
 
-    def bulk_read(self, timestamps):
+    def bulk_datum(self, timestamps):
+        '''Generate datum uids for all points, without inserting them
+
+        Returns
+        -------
+        data : dict
+            {data key: list of uids}
+        datums : list of (resource, uids, datum_args)
+            Datum documents to insert with bulk_insert_datum
+        '''
         channels = self.channels
         ch_uids = {ch: [str(uuid.uuid4()) for ts in timestamps]
                    for ch in channels}
 
         count = len(timestamps)
         if count == 0:
-            return {}
+            return {}, []
 
-        def get_datum_args():
-            for ch in channels:
-                for seq_num in range(count):
-                    yield {'frame': seq_num,
-                           'channel': ch}
+        datum_args = [{'frame': seq_num, 'channel': ch}
+                      for ch in channels
+                      for seq_num in range(count)]
+        uids = list(itertools.chain(*(ch_uids[ch] for ch in channels)))
 
-        uids = [ch_uids[ch] for ch in channels]
-        bulk_insert_datum(self._filestore_res, itertools.chain(*uids),
-                          get_datum_args())
-
-        return {self.mds_keys[ch]: ch_uids[ch]
+        data = {self.mds_keys[ch]: ch_uids[ch]
                 for ch in channels
                 }
+        return data, [(self._filestore_res, uids, datum_args)]
+
+    def bulk_read(self, timestamps):
+        data, datums = self.bulk_datum(timestamps)
+        for resource, uids, datum_args in datums:
+            bulk_insert_datum(resource, uids, datum_args)
+        return data
 
     def _make_filename(self, **kwargs):
         super()._make_filename(**kwargs)
@@ -1,11 +1,20 @@
 from __future__ import print_function
-import logging
 import time
+import logging
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import numpy as np
 
 from ophyd.controls.areadetector.detectors import (ADBase, ADSignal)
 from ophyd.controls import EpicsSignal
 from ophyd.controls.ophydobj import DetectorStatus
 
+from ophyd.utils import TimeoutError
+
+from .utils import (readback_matches, wait_for_values)
+from ..timing import instrumented
+
 logger = logging.getLogger(__name__)
 
 
@@ -80,6 +89,277 @@ class ZebraGate(ADBase):
         self.input2_edge = EpicsSignal(inp2_b, alias='input2_edge')
 
 
+class ZebraPositionCapture(ADBase):
+    '''Zebra position compare/capture (PC) readout
+
+    Captured encoder positions and times are downloaded by the IOC into
+    waveforms, which are read in bulk at the end of a scan (`bulk_read`) or
+    incrementally during it (`read_chunk`). In step scans, each point
+    records only its capture index (`read`); the positions are downloaded
+    once, on `disarm`, and are available from `captured`.
+
+    `arm` only arms capture: the PC gate and pulse sources, their
+    parameters and the captured encoder bits (PC_GATE_*, PC_PULSE_*,
+    PC_BIT_CAP) must be configured beforehand, e.g., in the Zebra GUI or a
+    `ZebraProfile`.
+
+    Parameters
+    ----------
+    prefix : str
+        The Zebra prefix
+    zebra : Zebra
+        The parent Zebra
+    encoders : sequence of int, optional
+        Encoder channels (1-4) to record
+    key_format : str, optional
+        Data key format for encoder channels, formatted with zebra and enc
+    '''
+    _html_docs = ['']
+
+    _arm = ADSignal('PC_ARM')
+    _disarm = ADSignal('PC_DISARM')
+    armed = ADSignal('PC_ARM_OUT', rw=False)
+    time_units = ADSignal('PC_TSPRE', string=True)
+    num_downloaded = ADSignal('PC_NUM_DOWN', rw=False)
+    array_update = ADSignal('ARRAY_UPDATE')
+
+    time = ADSignal('PC_TIME', rw=False)
+    enc1 = ADSignal('PC_ENC1', rw=False)
+    enc2 = ADSignal('PC_ENC2', rw=False)
+    enc3 = ADSignal('PC_ENC3', rw=False)
+    enc4 = ADSignal('PC_ENC4', rw=False)
+
+    def __init__(self, prefix, zebra, encoders=(1, 2),
+                 key_format='{zebra.name}_pc_enc{enc}', **kwargs):
+        super(ZebraPositionCapture, self).__init__(prefix, **kwargs)
+
+        self._zebra = zebra
+        self.encoders = list(encoders)
+        self.key_format = key_format
+        self._chunk_start = 0
+        # number of step-scan points read since arming
+        self._num_read = 0
+        # {data key: array} downloaded on disarm
+        self.captured = None
+
+    @property
+    def data_keys(self):
+        '''{data key: waveform signal}'''
+        keys = OrderedDict()
+        keys['{}_pc_time'.format(self._zebra.name)] = self.time
+        for enc in self.encoders:
+            key = self.key_format.format(zebra=self._zebra, enc=enc)
+            keys[key] = getattr(self, 'enc{}'.format(enc))
+        return keys
+
+    @property
+    def index_key(self):
+        '''Data key of the capture index recorded by `read`'''
+        return '{}_pc_index'.format(self._zebra.name)
+
+    def arm(self):
+        '''Arm position capture, resetting the readout'''
+        self._chunk_start = 0
+        self._num_read = 0
+        self.captured = None
+        self._arm.put(1)
+
+    def disarm(self):
+        '''Disarm position capture and download the captured points'''
+        self._disarm.put(1)
+        count = self._download()
+        self.captured = self._read_arrays(0, count)
+
+    def _download(self):
+        '''Have the IOC update the waveforms; returns the point count'''
+        self.array_update.put(1, wait=True)
+        return int(self.num_downloaded.get())
+
+    def _read_arrays(self, start, stop):
+        return OrderedDict((key, np.asarray(signal.get())[start:stop])
+                           for key, signal in self.data_keys.items())
+
+    def read_chunk(self):
+        '''Read the points captured since the last chunk (or arm)
+
+        Returns
+        -------
+        data : dict
+            {data key: array}
+        '''
+        count = self._download()
+        data = self._read_arrays(self._chunk_start, count)
+        self._chunk_start = count
+        return data
+
+    def bulk_read(self, timestamps=None):
+        '''Read all captured points in one transfer
+
+        Parameters
+        ----------
+        timestamps : list, optional
+            Event timestamps; if given, only the first len(timestamps)
+            captured points are returned
+
+        Returns
+        -------
+        data : dict
+            {data key: list of values}
+        '''
+        if self.captured is not None:
+            data = self.captured
+        else:
+            data = self._read_arrays(0, self._download())
+
+        count = min(len(values) for values in data.values())
+        if timestamps is not None:
+            if count < len(timestamps):
+                logger.warning('Zebra %s: only %d of %d positions captured',
+                               self._zebra, count, len(timestamps))
+            count = min(count, len(timestamps))
+
+        return {key: values[:count].tolist() for key, values in data.items()}
+
+    def read(self):
+        '''Capture index of the current step-scan point
+
+        No data is transferred; the position of the point is
+        ``captured[key][index]`` once capture is disarmed.
+        '''
+        index = self._num_read
+        self._num_read += 1
+        return {self.index_key: {'value': index,
+                                 'timestamp': time.time()}}
+
+    def describe_read(self):
+        '''Describe the data returned by `read`'''
+        return {self.index_key: {'source': 'PV:{}'.format(self.time.pvname),
+                                 'dtype': 'number',
+                                 'shape': [],
+                                 }}
+
+    def describe(self):
+        return {key: {'source': 'PV:{}'.format(signal.pvname),
+                      'dtype': 'number',
+                      'shape': [],
+                      }
+                for key, signal in self.data_keys.items()}
+
+
+class ZebraProfile(object):
+    '''Zebra wiring, expressed as data
+
+    Registers are named ``'<block><index>.<attribute>'`` (e.g., 'pulse1.width',
+    'gate2.input1_edge', 'output1.ttl') or by top-level signal name (e.g.,
+    'soft_input4'). Input and output selections take address names from
+    `Zebra.addresses` (e.g., 'IN1_TTL', 'PULSE1').
+
+    The profile is validated on creation and split into stages which are
+    applied in order: inputs, then gate/pulse edges (readbacks verified),
+    then outputs. Registers within a stage are independent and are written
+    together.
+
+    Parameters
+    ----------
+    name : str
+        Profile name; also usable as a scan mode
+    registers : dict
+        {register: value}
+    description : str, optional
+    '''
+    blocks = {'pulse': (range(1, 5), ('width', 'input_', 'delay', 'time_units',
+                                      'input_edge')),
+              'gate': (range(1, 5), ('input1', 'input2', 'input1_edge',
+                                     'input2_edge')),
+              'output': (range(1, 9), ('ttl', 'nim', 'lvds', 'open_collector',
+                                       'pecl', 'enca', 'encb', 'encz',
+                                       'conn')),
+              }
+    top_level = ('soft_input1', 'soft_input2', 'soft_input3', 'soft_input4')
+    address_attrs = {'input_', 'input1', 'input2', 'ttl', 'nim', 'lvds',
+                     'open_collector', 'pecl', 'enca', 'encb', 'encz', 'conn'}
+    front_outputs = ('ttl', 'nim', 'lvds', 'open_collector', 'pecl')
+    stage_names = ('inputs', 'edges', 'outputs')
+
+    _address_numbers = None
+
+    def __init__(self, name, registers, description=''):
+        self.name = name
+        self.description = description
+        self.registers = OrderedDict(registers)
+        self.stages = self._validate(self.registers)
+
+    @classmethod
+    def _get_address(cls, value):
+        if cls._address_numbers is None:
+            cls._address_numbers = {name: addr for addr, name
+                                    in Zebra.addresses.items()}
+
+        if isinstance(value, int) and value in Zebra.addresses:
+            return value
+
+        try:
+            return cls._address_numbers[value]
+        except KeyError:
+            raise ValueError('Unknown Zebra address {!r}'.format(value))
+
+    @classmethod
+    def parse_register(cls, register):
+        '''Parse a register name into (block, index, attribute)
+
+        block and index are None for top-level signals.
+        '''
+        if register in cls.top_level:
+            return None, None, register
+
+        try:
+            block_index, attr = register.split('.')
+            block = block_index.rstrip('0123456789')
+            index = int(block_index[len(block):])
+            indices, attrs = cls.blocks[block]
+        except (ValueError, KeyError):
+            raise ValueError('Invalid Zebra register {!r}'.format(register))
+
+        if index not in indices:
+            raise ValueError('Invalid {} index in register {!r}'
+                             ''.format(block, register))
+        if attr not in attrs:
+            raise ValueError('Invalid attribute in register {!r}'
+                             ''.format(register))
+        if block == 'output' and ((index <= 4) !=
+                                  (attr in cls.front_outputs)):
+            raise ValueError('Output {} has no {} signal (register {!r})'
+                             ''.format(index, attr, register))
+        return block, index, attr
+
+    @classmethod
+    def _validate(cls, registers):
+        stages = OrderedDict((stage, []) for stage in cls.stage_names)
+        for register, value in registers.items():
+            block, index, attr = cls.parse_register(register)
+            if attr in cls.address_attrs:
+                value = cls._get_address(value)
+            elif attr.endswith('edge'):
+                if value not in (0, 1):
+                    raise ValueError('Edge register {!r} must be 0 (rising) '
+                                     'or 1 (falling)'.format(register))
+
+            if attr.endswith('edge'):
+                stage = 'edges'
+            elif block == 'output':
+                stage = 'outputs'
+            else:
+                stage = 'inputs'
+            stages[stage].append((register, value))
+
+        return [(stage, stage == 'edges', regs)
+                for stage, regs in stages.items() if regs]
+
+    def __repr__(self):
+        return ('{0.__class__.__name__}({0.name!r}, {1!r})'
+                ''.format(self, dict(self.registers)))
+
+
 class Zebra(ADBase):
     _html_docs = ['']
 
@@ -154,6 +434,9 @@ class Zebra(ADBase):
     soft_input3 = ADSignal('SOFT_IN:B2')
     soft_input4 = ADSignal('SOFT_IN:B3')
 
+    # ZebraProfiles available as scan modes
+    default_profiles = ()
+
     def __init__(self, *args, **kwargs):
         super(Zebra, self).__init__(*args, **kwargs)
 
@@ -177,6 +460,237 @@ class Zebra(ADBase):
                             'fly_scan': self.fly_scan
                             }
 
+        # last value written to each register signal
+        self._register_cache = {}
+        # always write all registers, regardless of their readbacks
+        self.force_resync = False
+        # (written, skipped) counts of the last set()/apply_profile call
+        self.register_stats = (0, 0)
+        self._stats_depth = 0
+
+        self.profiles = {}
+        self._compiled_profiles = {}
+        for profile in self.default_profiles:
+            self.add_profile(profile)
+
+        self.position_capture = ZebraPositionCapture(self._prefix, self)
+        # arm position capture in configure and make it readable
+        self.capture_positions = False
+
+    @contextmanager
+    def _register_batch(self):
+        '''Accumulate register_stats over all writes in the block
+
+        Nested batches add to the stats of the outermost one.
+        '''
+        if not self._stats_depth:
+            self.register_stats = (0, 0)
+        self._stats_depth += 1
+        try:
+            yield
+        finally:
+            self._stats_depth -= 1
+
+    def _count_registers(self, written, skipped):
+        self.register_stats = (self.register_stats[0] + written,
+                               self.register_stats[1] + skipped)
+
+    def apply_registers(self, registers, force=None):
+        '''Write register values, skipping those which are already set
+
+        A register is skipped only if its (monitored) readback matches the
+        value, so registers changed from elsewhere (e.g., after an IOC
+        reboot or from the Zebra GUI) are always rewritten. The last value
+        written to each register is kept to report such changes.
+
+        Parameters
+        ----------
+        registers : sequence of (signal, value)
+        force : bool, optional
+            Write all registers. Defaults to `force_resync`.
+
+        Returns
+        -------
+        written, skipped : int
+        '''
+        if force is None:
+            force = self.force_resync
+
+        written = skipped = 0
+        cache = self._register_cache
+        for signal, value in registers:
+            if not force:
+                if readback_matches(signal, value):
+                    cache[signal] = value
+                    skipped += 1
+                    continue
+                elif cache.get(signal) == value:
+                    logger.info('Zebra %s: %s was changed from elsewhere; '
+                                'rewriting %r', self,
+                                getattr(signal, 'pvname', signal), value)
+
+            signal.put(value)
+            cache[signal] = value
+            written += 1
+
+        logger.debug('Zebra %s: wrote %d registers, %d already set', self,
+                     written, skipped)
+        with self._register_batch():
+            self._count_registers(written, skipped)
+        return written, skipped
+
+    def resync(self):
+        '''Forget the last-known register state'''
+        self._register_cache.clear()
+
+    def _apply_verified(self, registers, timeout=1.0, retries=1,
+                        description='registers'):
+        '''Write registers together, then wait on all of their readbacks
+
+        On timeout, the registers are re-written up to `retries` times before
+        raising TimeoutError.
+        '''
+        written = skipped = 0
+        with self._register_batch():
+            for attempt in range(retries + 1):
+                w, s = self.apply_registers(registers,
+                                            force=True if attempt else None)
+                written += w
+                skipped += s
+                try:
+                    wait_for_values(registers, timeout=timeout)
+                except TimeoutError as ex:
+                    logger.warning('Zebra %s: %s not set (attempt %d of '
+                                   '%d): %s', self, description, attempt + 1,
+                                   retries + 1, ex)
+                    error = ex
+                else:
+                    return written, skipped
+
+        raise TimeoutError('Zebra {}: failed to set {}: {}'
+                           ''.format(self, description, error))
+
+    def set_input_edges(self, edges, timeout=1.0, retries=1):
+        '''Program gate input edges, waiting on the readbacks
+
+        All edge registers are written at once, then the readback monitors
+        are waited on together.
+
+        Parameters
+        ----------
+        edges : dict
+            {gate: (edge1, edge2)} where gate is a ZebraGate and edges are
+            0 (rising) or 1 (falling)
+        timeout : float, optional
+            Time to wait for the readbacks, per attempt
+        retries : int, optional
+            Number of times to re-write the registers if the readbacks do not
+            match in time
+
+        Raises
+        ------
+        TimeoutError
+            If the readbacks do not match after all retries
+        '''
+        registers = []
+        for gate, (edge1, edge2) in edges.items():
+            registers.extend([(gate.input1_edge, int(edge1)),
+                              (gate.input2_edge, int(edge2)),
+                              ])
+
+        self._apply_verified(registers, timeout=timeout, retries=retries,
+                             description='gate input edges')
+
+    def add_profile(self, profile):
+        '''Add a ZebraProfile, making it available as a scan mode'''
+        self.profiles[profile.name] = profile
+        self._compiled_profiles.pop(profile.name, None)
+        if profile.name not in self._scan_modes:
+            self._scan_modes[profile.name] = (
+                lambda: self.apply_profile(profile.name))
+
+    def _get_register(self, register):
+        '''Get the signal for a profile register name'''
+        block, index, attr = ZebraProfile.parse_register(register)
+        if block is None:
+            return getattr(self, attr)
+        return getattr(getattr(self, block)[index], attr)
+
+    def compile_profile(self, profile):
+        '''Compile a profile into a put plan for this Zebra
+
+        The plan is cached per profile name, and only reused for the same
+        profile object.
+
+        Returns
+        -------
+        plan : list of (stage, verify, [(signal, value), ...])
+        '''
+        if isinstance(profile, str):
+            profile = self.profiles[profile]
+
+        try:
+            compiled_for, plan = self._compiled_profiles[profile.name]
+        except KeyError:
+            pass
+        else:
+            if compiled_for is profile:
+                return plan
+
+        plan = [(stage, verify,
+                 [(self._get_register(register), value)
+                  for register, value in registers])
+                for stage, verify, registers in profile.stages]
+        self._compiled_profiles[profile.name] = (profile, plan)
+        return plan
+
+    def apply_profile(self, profile, extra=None, timeout=1.0, retries=1):
+        '''Apply a wiring profile
+
+        Parameters
+        ----------
+        profile : str or ZebraProfile
+            Profile or name of a profile added with `add_profile`
+        extra : sequence of (signal, value), optional
+            Additional registers written along with the first stage, for
+            settings that are not fixed (e.g., pulse widths)
+        timeout : float, optional
+            Readback timeout for verified stages
+        retries : int, optional
+            Re-write attempts for verified stages
+        '''
+        plan = self.compile_profile(profile)
+        name = getattr(profile, 'name', profile)
+        logger.debug('Zebra %s: applying profile %r', self, name)
+
+        extra = list(extra) if extra else []
+        written = skipped = 0
+        with self._register_batch():
+            for stage, verify, registers in plan:
+                if extra:
+                    registers = list(registers) + extra
+                    extra = []
+
+                if verify:
+                    description = '{} {}'.format(name, stage)
+                    w, s = self._apply_verified(registers, timeout=timeout,
+                                                retries=retries,
+                                                description=description)
+                else:
+                    w, s = self.apply_registers(registers)
+
+                written += w
+                skipped += s
+
+            if extra:
+                w, s = self.apply_registers(extra)
+                written += w
+                skipped += s
+
+        logger.debug('Zebra %s: profile %r wrote %d registers, %d already '
+                     'set', self, name, written, skipped)
+        return written, skipped
+
     def step_scan(self):
         logger.debug('Zebra %s: configuring step-scan mode', self)
 
@@ -196,14 +710,17 @@ class Zebra(ADBase):
             raise ValueError('Unrecognized scan mode {!r}. Available: {}'
                              ''.format(scan_mode, self._scan_modes.keys()))
 
-        mode_setup()
+        with self._register_batch():
+            mode_setup()
         self._scan_mode = scan_mode
 
     def configure(self, state=None):
-        pass
+        if self.capture_positions:
+            self.position_capture.arm()
 
     def deconfigure(self):
-        pass
+        if self.capture_positions:
+            self.position_capture.disarm()
 
     def trigger(self):
         # Re-implement this to trigger as desired in bluesky
@@ -212,17 +729,95 @@ class Zebra(ADBase):
         return status
 
     def describe(self):
-        return {}
+        if not self.capture_positions:
+            return {}
+        elif self._scan_mode == 'step_scan':
+            return self.position_capture.describe_read()
+        return self.position_capture.describe()
 
     def read(self):
+        # Fly scans get their positions from bulk_read
+        if self.capture_positions and self._scan_mode == 'step_scan':
+            return self.position_capture.read()
         return {}
 
+    def bulk_read(self, timestamps):
+        '''Captured positions for all points of a fly scan'''
+        if not self.capture_positions:
+            return {}
+        return self.position_capture.bulk_read(timestamps)
+
     def stop(self):
         # TODO bluesky implementation detail
         pass
 
 
+hxn_step_scan = ZebraProfile(
+    'step_scan',
+    OrderedDict([
+        # Scaler triggers all detectors
+        # Scaler, output mode 1, LNE (output 5) connected to Zebra IN1_TTL
+        # Pulse 1 has pulse width set to the count_time
+        ('pulse1.input_', 'IN1_TTL'),
+        ('pulse1.delay', 0.0),
+        ('pulse1.input_edge', 1),
+        # To be used in regular scaler mode, scaler 1 has to have inhibit
+        # cleared and counting enabled:
+        ('soft_input4', 1),
+        ('gate2.input1', 'PULSE1'),
+        ('gate2.input2', 'PULSE1'),
+        ('gate2.input1_edge', 0),
+        ('gate2.input2_edge', 1),
+        # OUT1_TTL Merlin
+        # OUT2_TTL Scaler 1 inhibit
+        # OUT3_TTL Scaler 1 gate
+        # OUT4_TTL Xspress3
+        ('output1.ttl', 'PULSE1'),
+        ('output2.ttl', 'SOFT_IN4'),
+        ('output3.ttl', 'SOFT_IN4'),
+        ('output4.ttl', 'GATE2'),
+        # Merlin LVDS
+        ('output1.lvds', 'PULSE1'),
+    ]),
+    description='Step scan: scaler LNE triggers Merlin and Xspress3')
+
+hxn_fly_scan = ZebraProfile(
+    'fly_scan',
+    OrderedDict([
+        ('gate1.input1', 'IN3_OC'),
+        ('gate1.input2', 'IN3_OC'),
+        ('gate1.input1_edge', 1),
+        ('gate1.input2_edge', 0),
+        ('gate2.input1', 'IN3_OC'),
+        ('gate2.input2', 'IN3_OC'),
+        ('gate2.input1_edge', 0),
+        ('gate2.input2_edge', 1),
+        # Merlin is now on TTL 1 output, replacing timepix 1
+        ('output1.ttl', 'GATE2'),
+        ('output2.ttl', 'GATE1'),
+        ('output3.ttl', 'GATE2'),
+        ('output4.ttl', 'GATE2'),
+    ]),
+    description='Fly scan: Merlin on TTL 1')
+
+hxn_fly_scan_timepix = ZebraProfile(
+    'fly_scan_timepix',
+    OrderedDict(list(hxn_fly_scan.registers.items()) +
+                [('output1.ttl', 'GATE1')]),
+    description='Fly scan: Timepix 1 on TTL 1')
+
+hxn_fly_scan_merlin_lvds = ZebraProfile(
+    'fly_scan_merlin_lvds',
+    OrderedDict(list(hxn_fly_scan.registers.items()) +
+                [('output1.lvds', 'GATE2')]),
+    description='Fly scan: Merlin on TTL 1 and LVDS 1')
+
+
+@instrumented()
 class HXNZebra(Zebra):
+    default_profiles = (hxn_step_scan, hxn_fly_scan, hxn_fly_scan_timepix,
+                        hxn_fly_scan_merlin_lvds)
+
     def __init__(self, *args, **kwargs):
         super(HXNZebra, self).__init__(*args, **kwargs)
 
@@ -230,81 +825,30 @@ class HXNZebra(Zebra):
         self.count_time = None
         self._mode = None
 
-    def _set_input_edges(self, gate, edge1, edge2):
-        edge1, edge2 = int(edge1), int(edge2)
-        while gate.input1_edge.value != edge1:
-            gate.input1_edge.put(edge1)
-            time.sleep(0.1)
-
-        while gate.input2_edge.value != edge2:
-            gate.input2_edge.put(edge2)
-            time.sleep(0.1)
-
     def step_scan(self):
         super(HXNZebra, self).step_scan()
 
-        # Scaler triggers all detectors
-        # Scaler, output mode 1, LNE (output 5) connected to Zebra IN1_TTL
-        # Pulse 1 has pulse width set to the count_time
-
-        # OUT1_TTL Merlin
-        # OUT2_TTL Scaler 1 inhibit
-        #
-        # OUT3_TTL Scaler 1 gate
-        # OUT4_TTL Xspress3
-        self.pulse[1].input_.value = self.IN1_TTL
-
+        extra = []
         if self.count_time is not None:
             logger.debug('Step scan pulse-width is %s', self.count_time)
-            self.pulse[1].width.value = self.count_time
-            self.pulse[1].time_units.value = 's'
-
-        self.pulse[1].delay.value = 0.0
-        self.pulse[1].input_edge.value = 1
-
-        # To be used in regular scaler mode, scaler 1 has to have
-        # inhibit cleared and counting enabled:
-        self.soft_input4.value = 1
-
-        # Timepix
-        # self.output[1].ttl = self.PULSE1
-        # Merlin
-        self.output[1].ttl.value = self.PULSE1
-        self.output[2].ttl.value = self.SOFT_IN4
-
-        self.gate[2].input1.value = self.PULSE1
-        self.gate[2].input2.value = self.PULSE1
-        self._set_input_edges(self.gate[2], 0, 1)
+            extra = [(self.pulse[1].width, self.count_time),
+                     (self.pulse[1].time_units, 's'),
+                     ]
 
-        self.output[3].ttl.value = self.SOFT_IN4
-        self.output[4].ttl.value = self.GATE2
-
-        # Merlin LVDS
-        self.output[1].lvds.value = self.PULSE1
+        self.apply_profile('step_scan', extra=extra)
 
     def fly_scan(self):
         super(HXNZebra, self).fly_scan()
+        self.apply_profile('fly_scan')
 
-        self.gate[1].input1.value = self.IN3_OC
-        self.gate[1].input2.value = self.IN3_OC
-        self._set_input_edges(self.gate[1], 1, 0)
-
-        # timepix:
-        # self.output[1].ttl = self.GATE1
-        # merlin:
-        # (Merlin is now on TTL 1 output, replacing timepix 1)
-        self.output[1].ttl.value = self.GATE2
-        self.output[2].ttl.value = self.GATE1
-
-        self.gate[2].input1.value = self.IN3_OC
-        self.gate[2].input2.value = self.IN3_OC
-        self._set_input_edges(self.gate[2], 0, 1)
+    def set(self, total_points=None, scan_mode='step_scan', force=False,
+            capture_positions=False, **kwargs):
+        # per-scan setting: not carried over from a previous set()
+        self.capture_positions = bool(capture_positions)
 
-        self.output[3].ttl.value = self.GATE2
-        self.output[4].ttl.value = self.GATE2
-
-        # Merlin LVDS
-        # self.output[1].lvds.value = self.GATE2
-
-    def set(self, total_points=None, scan_mode='step_scan', **kwargs):
-        self.scan_mode = scan_mode
+        force_resync = self.force_resync
+        self.force_resync = force_resync or force
+        try:
+            self.scan_mode = scan_mode
+        finally:
+            self.force_resync = force_resync
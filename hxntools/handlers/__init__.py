@@ -1 +1,6 @@
 from .xspress3 import Xspress3HDF5Handler
+from .tiff import AreaDetectorTiffHandler
+from .corrections import (FrameCorrector, ReferenceCache, reference_cache)
+from .sparse import (SparseFrames, SparseFrameHandler, SparseFrameWriter)
+from .utils import center_crop
+from .prefetch import FramePrefetcher
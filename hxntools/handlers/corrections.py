@@ -0,0 +1,310 @@
+from __future__ import print_function
+
+import logging
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from .utils import normalize_crop
+
+
+logger = logging.getLogger(__name__)
+
+
+def settings_key(settings):
+    '''Normalize a dictionary of detector settings into a hashable key
+
+    Floating point values are rounded so that readbacks which differ only in
+    the last few bits map onto the same key.
+    '''
+    if settings is None:
+        return ()
+
+    def normalize(value):
+        if isinstance(value, float):
+            return round(value, 9)
+        elif isinstance(value, (list, tuple)):
+            return tuple(normalize(v) for v in value)
+        return value
+
+    return tuple(sorted((key, normalize(value))
+                        for key, value in dict(settings).items()))
+
+
+def detector_settings(det, attrs=('acquire_time', 'acquire_period')):
+    '''Read the settings which affect dark/flat reference frames
+
+    Parameters
+    ----------
+    det : AreaDetector
+        The detector instance (e.g., MerlinDetector, TimepixDetector)
+    attrs : sequence of str, optional
+        Signal attribute names to read from the detector
+    '''
+    settings = {'detector': det.name}
+    for attr in attrs:
+        settings[attr] = getattr(det, attr).value
+    return settings
+
+
+def average_frames(frames, dtype=np.float32):
+    '''Average a stack of frames, one frame at a time
+
+    Parameters
+    ----------
+    frames : iterable of ndarray
+        Frames to average. May be a generator, so that the full stack never
+        has to be held in memory.
+    dtype : np.dtype, optional
+        Accumulator and output data type
+    '''
+    total = None
+    count = 0
+    for frame in frames:
+        if total is None:
+            total = np.zeros(np.shape(frame), dtype=np.float64)
+        np.add(total, frame, out=total)
+        count += 1
+
+    if count == 0:
+        raise ValueError('No frames to average')
+
+    total /= count
+    return total.astype(dtype, copy=False)
+
+
+class ReferenceCache(object):
+    '''Bounded cache of averaged reference (dark/flat) frames
+
+    Keyed on (kind, settings key), so that a change in detector settings
+    invalidates the reference without affecting other settings.
+
+    Parameters
+    ----------
+    max_entries : int, optional
+        Maximum number of averaged frames to keep
+    '''
+    def __init__(self, max_entries=16):
+        self.max_entries = int(max_entries)
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, kind, settings, loader):
+        '''Get an averaged reference frame, loading it if necessary
+
+        Parameters
+        ----------
+        kind : str
+            Reference type, e.g., 'dark' or 'flat'
+        settings : dict
+            Detector settings the reference was taken with
+        loader : callable
+            Called with no arguments on a cache miss; returns an iterable of
+            frames to be averaged
+        '''
+        key = (kind, settings_key(settings))
+        with self._lock:
+            try:
+                ref = self._cache.pop(key)
+            except KeyError:
+                pass
+            else:
+                self._cache[key] = ref
+                return ref
+
+        logger.debug('Averaging %s reference frames (settings=%s)', kind,
+                     settings)
+        ref = average_frames(loader())
+        ref.setflags(write=False)
+
+        with self._lock:
+            self._cache[key] = ref
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return ref
+
+    def clear(self):
+        '''Clear all cached references'''
+        with self._lock:
+            self._cache.clear()
+
+    def __len__(self):
+        return len(self._cache)
+
+
+reference_cache = ReferenceCache()
+
+
+class FrameCorrector(object):
+    '''Dark subtraction, flat normalization and bad pixel masking
+
+    The dark, flat and mask are folded into a per-pixel gain and offset once,
+    so correcting a frame is ``frame * gain - offset``, computed in place over
+    a batch of frames without any full-size temporaries.
+
+    Parameters
+    ----------
+    dark : ndarray, optional
+        Averaged dark frame
+    flat : ndarray, optional
+        Averaged flat frame (not dark-subtracted)
+    mask : ndarray of bool, optional
+        True where a pixel is bad; bad pixels are set to `fill_value`
+    dtype : np.dtype, optional
+        Floating point data type of corrected frames
+    fill_value : float, optional
+        Value given to masked pixels
+    '''
+    def __init__(self, dark=None, flat=None, mask=None, dtype=np.float32,
+                 fill_value=0.0):
+        self.dtype = np.dtype(dtype)
+        self.fill_value = fill_value
+        self._gain = None
+        self._offset = None
+        self._prepare(dark, flat, mask)
+
+    @classmethod
+    def from_stacks(cls, settings, dark_loader=None, flat_loader=None,
+                    mask=None, cache=None, **kwargs):
+        '''Create a corrector from (cached) averaged dark and flat stacks
+
+        Parameters
+        ----------
+        settings : dict
+            Detector settings, used as the cache key (see
+            `detector_settings`)
+        dark_loader : callable, optional
+            Returns an iterable of dark frames
+        flat_loader : callable, optional
+            Returns an iterable of flat frames
+        mask : ndarray of bool, optional
+            Bad pixel mask
+        cache : ReferenceCache, optional
+            Defaults to the module-level `reference_cache`
+        '''
+        if cache is None:
+            cache = reference_cache
+
+        dark = flat = None
+        if dark_loader is not None:
+            dark = cache.get('dark', settings, dark_loader)
+        if flat_loader is not None:
+            flat = cache.get('flat', settings, flat_loader)
+        return cls(dark=dark, flat=flat, mask=mask, **kwargs)
+
+    def _prepare(self, dark, flat, mask):
+        shapes = set(np.shape(arr) for arr in (dark, flat, mask)
+                     if arr is not None)
+        if len(shapes) > 1:
+            raise ValueError('Dark, flat and mask shapes differ: {}'
+                             ''.format(shapes))
+        elif not shapes:
+            # nothing to do
+            return
+
+        shape, = shapes
+        dtype = self.dtype
+
+        if dark is not None:
+            dark = np.asarray(dark, dtype=dtype)
+
+        if flat is not None:
+            flat = np.asarray(flat, dtype=dtype)
+            if dark is not None:
+                flat = flat - dark
+
+            bad = ~(flat > 0)
+            if mask is not None:
+                bad |= np.asarray(mask, dtype=bool)
+            mask = bad
+
+            # normalize the gain so that corrected frames keep the mean scale
+            # of the raw data
+            gain = np.zeros(shape, dtype=dtype)
+            good = ~mask
+            if np.any(good):
+                gain[good] = np.mean(flat[good]) / flat[good]
+        else:
+            gain = np.ones(shape, dtype=dtype)
+            if mask is not None:
+                mask = np.asarray(mask, dtype=bool)
+                gain[mask] = 0
+
+        if dark is not None:
+            offset = dark * gain
+        else:
+            offset = np.zeros(shape, dtype=dtype)
+
+        if mask is not None and self.fill_value != 0:
+            offset[mask] = -self.fill_value
+
+        self._gain = gain
+        self._offset = offset
+        self._gain.setflags(write=False)
+        self._offset.setflags(write=False)
+
+    @property
+    def shape(self):
+        '''Frame shape the corrector applies to'''
+        if self._gain is None:
+            return None
+        return self._gain.shape
+
+    def cropped(self, crop):
+        '''A corrector for a cropped region of the frame
+
+        Parameters
+        ----------
+        crop : (row_slice, col_slice) or (row0, row1, col0, col1)
+        '''
+        ret = self.__class__(dtype=self.dtype, fill_value=self.fill_value)
+        if self._gain is not None:
+            crop = normalize_crop(crop, self._gain.shape)
+            ret._gain = np.ascontiguousarray(self._gain[crop])
+            ret._offset = np.ascontiguousarray(self._offset[crop])
+            ret._gain.setflags(write=False)
+            ret._offset.setflags(write=False)
+        return ret
+
+    def apply(self, frames, out=None):
+        '''Correct a frame or a batch of frames
+
+        Parameters
+        ----------
+        frames : ndarray
+            Either a single frame or a (num_frames, rows, cols) batch
+        out : ndarray, optional
+            Output array of `dtype`. If `frames` is already a writable array
+            of `dtype`, it is corrected in place when `out` is not given.
+
+        Returns
+        -------
+        out : ndarray
+        '''
+        frames = np.asarray(frames)
+        if out is None:
+            if frames.dtype == self.dtype and frames.flags.writeable:
+                out = frames
+            else:
+                out = np.empty(frames.shape, dtype=self.dtype)
+
+        if self._gain is None:
+            if out is not frames:
+                out[...] = frames
+            return out
+
+        if frames.shape[-2:] != self._gain.shape:
+            raise ValueError('Frame shape {} does not match reference shape '
+                             '{}'.format(frames.shape[-2:], self._gain.shape))
+
+        # two passes over the whole stack, broadcasting the gain and offset
+        np.multiply(frames, self._gain, out=out)
+        np.subtract(out, self._offset, out=out)
+        return out
+
+    __call__ = apply
+
+    def __repr__(self):
+        return ('{0.__class__.__name__}(shape={0.shape}, dtype={0.dtype}, '
+                'fill_value={0.fill_value})'.format(self))
@@ -0,0 +1,167 @@
+from __future__ import print_function
+
+import collections
+import logging
+import threading
+import time
+
+from concurrent.futures import (ThreadPoolExecutor, wait, FIRST_COMPLETED)
+
+import numpy as np
+
+
+logger = logging.getLogger(__name__)
+
+
+class PrefetchStats(object):
+    '''Decode throughput of a FramePrefetcher'''
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.frames = 0
+        self.nbytes = 0
+        self.decode_time = 0.0
+        self.start_time = None
+        self.end_time = None
+
+    def add(self, nbytes, decode_time):
+        with self._lock:
+            self.frames += 1
+            self.nbytes += nbytes
+            self.decode_time += decode_time
+
+    @property
+    def elapsed(self):
+        '''Wall-clock time of the iteration'''
+        if self.start_time is None:
+            return 0.0
+        end = self.end_time if self.end_time is not None else time.time()
+        return end - self.start_time
+
+    @property
+    def frames_per_second(self):
+        elapsed = self.elapsed
+        return self.frames / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def bytes_per_second(self):
+        elapsed = self.elapsed
+        return self.nbytes / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def parallelism(self):
+        '''Total decode time over wall-clock time'''
+        elapsed = self.elapsed
+        return self.decode_time / elapsed if elapsed > 0 else 0.0
+
+    def __repr__(self):
+        return ('{0.__class__.__name__}(frames={0.frames}, '
+                'elapsed={0.elapsed:.3f}, '
+                'frames_per_second={0.frames_per_second:.1f}, '
+                'MB_per_second={1:.1f}, parallelism={0.parallelism:.2f})'
+                ''.format(self, self.bytes_per_second / 1e6))
+
+
+class FramePrefetcher(object):
+    '''Iterate over frames, decoding ahead of the consumer on a thread pool
+
+    Iterating yields ``(index, frame)`` tuples, where ``index`` is the
+    position of the key in `keys`.
+
+    Parameters
+    ----------
+    keys : iterable
+        Datum uids (or any other keys understood by `reader`), in scan order.
+        Use a sequence rather than an iterator to iterate more than once.
+    reader : callable, optional
+        Called with a single key in a worker thread, returning the frame.
+        Defaults to ``filestore.api.retrieve``.
+    max_workers : int, optional
+        Number of decoding threads
+    read_ahead : int, optional
+        Maximum number of frames decoded (or being decoded) but not yet
+        consumed. Bounds memory use.
+    ordered : bool, optional
+        Yield frames in scan order. Otherwise, yield frames as soon as they
+        are decoded.
+
+    Examples
+    --------
+    >>> prefetcher = FramePrefetcher(datum_uids, max_workers=8)
+    >>> for index, frame in prefetcher:
+    ...     process(frame)
+    >>> print(prefetcher.stats)
+    '''
+    def __init__(self, keys, reader=None, max_workers=4, read_ahead=16,
+                 ordered=True):
+        if reader is None:
+            import filestore.api as fs_api
+            reader = fs_api.retrieve
+
+        self.keys = keys
+        self.reader = reader
+        self.max_workers = int(max_workers)
+        self.read_ahead = max(int(read_ahead), 1)
+        self.ordered = bool(ordered)
+        self.stats = PrefetchStats()
+
+    def _decode(self, index, key):
+        t0 = time.time()
+        frame = self.reader(key)
+        elapsed = time.time() - t0
+        nbytes = getattr(frame, 'nbytes', None)
+        if nbytes is None:
+            nbytes = np.asarray(frame).nbytes
+        self.stats.add(nbytes, elapsed)
+        return index, frame
+
+    def __iter__(self):
+        self.stats.reset()
+        self.stats.start_time = time.time()
+        keys = enumerate(self.keys)
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+
+        def submit_next():
+            try:
+                index, key = next(keys)
+            except StopIteration:
+                return None
+            return executor.submit(self._decode, index, key)
+
+        pending = collections.deque()
+        try:
+            for i in range(self.read_ahead):
+                future = submit_next()
+                if future is None:
+                    break
+                pending.append(future)
+
+            if self.ordered:
+                while pending:
+                    result = pending.popleft().result()
+                    future = submit_next()
+                    if future is not None:
+                        pending.append(future)
+                    yield result
+            else:
+                pending = set(pending)
+                while pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        next_future = submit_next()
+                        if next_future is not None:
+                            pending.add(next_future)
+                        yield future.result()
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=True)
+            self.stats.end_time = time.time()
+            logger.debug('Frame prefetch finished: %s', self.stats)
+
+    def __repr__(self):
+        return ('{0.__class__.__name__}(max_workers={0.max_workers}, '
+                'read_ahead={0.read_ahead}, ordered={0.ordered})'
+                ''.format(self))
@@ -0,0 +1,411 @@
+from __future__ import print_function
+
+import logging
+
+import h5py
+import numpy as np
+
+import filestore.api as fs_api
+from filestore.handlers import HandlerBase
+
+from .utils import (normalize_crop, normalize_binning, binned_shape)
+
+
+logger = logging.getLogger(__name__)
+
+OFFSETS_KEY = 'frame_offsets'
+INDEX_KEY = 'pixel_index'
+VALUE_KEY = 'pixel_value'
+
+
+def to_sparse(frame, threshold=0):
+    '''Convert a dense frame to (flat pixel index, value) arrays
+
+    Parameters
+    ----------
+    frame : ndarray
+        Dense 2D frame
+    threshold : number, optional
+        Only pixels with values greater than this are kept
+    '''
+    flat = np.asarray(frame).ravel()
+    index = np.flatnonzero(flat > threshold).astype(np.uint32)
+    return index, flat[index]
+
+
+class SparseFrames(object):
+    '''A stack of frames stored as per-frame pixel index and value arrays
+
+    Frame ``i`` consists of ``index[offsets[i]:offsets[i + 1]]`` (flattened
+    pixel indices) and the matching slice of ``values``. All reductions work
+    on the sparse arrays directly, without densifying frames.
+
+    Parameters
+    ----------
+    offsets : ndarray
+        (num_frames + 1, ) offsets into index/values
+    index : ndarray
+        Flattened pixel indices
+    values : ndarray
+        Pixel values
+    frame_shape : tuple
+        (rows, cols) of a dense frame
+    '''
+    def __init__(self, offsets, index, values, frame_shape):
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.index = np.asarray(index)
+        self.values = np.asarray(values)
+        self.frame_shape = tuple(int(dim) for dim in frame_shape)
+        self._frame_ids = None
+
+    @classmethod
+    def from_dense(cls, frames, threshold=0):
+        '''Create from an iterable of dense frames'''
+        writer = _SparseAccumulator()
+        for frame in frames:
+            writer.append(frame, threshold=threshold)
+        return writer.finish()
+
+    @classmethod
+    def from_hdf5(cls, fn):
+        '''Load a sparse frame file written by `SparseFrameWriter`'''
+        with h5py.File(fn, 'r') as f:
+            return cls(f[OFFSETS_KEY][:], f[INDEX_KEY][:], f[VALUE_KEY][:],
+                       f.attrs['frame_shape'])
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    @property
+    def nnz(self):
+        '''Number of stored (non-zero) pixels'''
+        return len(self.index)
+
+    @property
+    def frame_ids(self):
+        '''Frame number of every stored pixel'''
+        if self._frame_ids is None:
+            self._frame_ids = np.repeat(np.arange(len(self)),
+                                        np.diff(self.offsets))
+        return self._frame_ids
+
+    def frame(self, i):
+        '''Sparse (index, values) of a single frame'''
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return self.index[start:end], self.values[start:end]
+
+    def dense(self, i, dtype=None):
+        '''Dense array of a single frame'''
+        index, values = self.frame(i)
+        if dtype is None:
+            dtype = self.values.dtype
+        out = np.zeros(self.frame_shape, dtype=dtype)
+        out.ravel()[index] = values
+        return out
+
+    __getitem__ = dense
+
+    def select(self, start, stop):
+        '''Frames start to stop (exclusive), as SparseFrames'''
+        start, stop, _ = slice(start, stop).indices(len(self))
+        stop = max(start, stop)
+        first, last = self.offsets[start], self.offsets[stop]
+        return SparseFrames(self.offsets[start:stop + 1] - first,
+                            self.index[first:last], self.values[first:last],
+                            self.frame_shape)
+
+    def frame_sums(self):
+        '''Total counts of each frame'''
+        cumsum = np.zeros(len(self.values) + 1, dtype=np.float64)
+        np.cumsum(self.values, out=cumsum[1:])
+        return cumsum[self.offsets[1:]] - cumsum[self.offsets[:-1]]
+
+    def sum_frames(self):
+        '''Sum of all frames, as a dense frame'''
+        size = self.frame_shape[0] * self.frame_shape[1]
+        total = np.bincount(self.index, weights=self.values, minlength=size)
+        return total.reshape(self.frame_shape)
+
+    def center_of_mass(self):
+        '''Per-frame center of mass, (num_frames, 2) of (row, col)
+
+        Frames with no counts are NaN.
+        '''
+        num = len(self)
+        rows, cols = np.divmod(self.index, self.frame_shape[1])
+        weights = self.values.astype(np.float64)
+        total = np.bincount(self.frame_ids, weights=weights, minlength=num)
+        com = np.empty((num, 2))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            com[:, 0] = np.bincount(self.frame_ids, weights=rows * weights,
+                                    minlength=num) / total
+            com[:, 1] = np.bincount(self.frame_ids, weights=cols * weights,
+                                    minlength=num) / total
+        return com
+
+    def roi_sums(self, row_slice, col_slice):
+        '''Per-frame sum over a rectangular ROI
+
+        Parameters
+        ----------
+        row_slice : slice
+        col_slice : slice
+        '''
+        row0, row1, _ = row_slice.indices(self.frame_shape[0])
+        col0, col1, _ = col_slice.indices(self.frame_shape[1])
+        rows, cols = np.divmod(self.index, self.frame_shape[1])
+        in_roi = ((rows >= row0) & (rows < row1) &
+                  (cols >= col0) & (cols < col1))
+        return np.bincount(self.frame_ids[in_roi],
+                           weights=self.values[in_roi],
+                           minlength=len(self))
+
+    def crop_bin(self, crop=None, binning=None):
+        '''Crop and sum-bin all frames, without densifying them
+
+        Parameters
+        ----------
+        crop : (row_slice, col_slice) or (row0, row1, col0, col1), optional
+        binning : int or (row_bin, col_bin), optional
+
+        Returns
+        -------
+        frames : SparseFrames
+        '''
+        row_sl, col_sl = normalize_crop(crop, self.frame_shape)
+        row_bin, col_bin = normalize_binning(binning)
+        shape = binned_shape((row_sl.stop - row_sl.start,
+                              col_sl.stop - col_sl.start),
+                             (row_bin, col_bin))
+
+        rows, cols = np.divmod(self.index.astype(np.int64),
+                               self.frame_shape[1])
+        rows -= row_sl.start
+        cols -= col_sl.start
+        keep = ((rows >= 0) & (rows < shape[0] * row_bin) &
+                (cols >= 0) & (cols < shape[1] * col_bin))
+
+        frame_ids = self.frame_ids[keep]
+        index = (rows[keep] // row_bin) * shape[1] + cols[keep] // col_bin
+        values = self.values[keep]
+
+        if row_bin > 1 or col_bin > 1:
+            # merge pixels which fall into the same bin
+            key = frame_ids * (shape[0] * shape[1]) + index
+            key, inverse = np.unique(key, return_inverse=True)
+            dtype = np.promote_types(values.dtype, np.uint32)
+            values = np.bincount(inverse, weights=values).astype(dtype)
+            frame_ids, index = np.divmod(key, shape[0] * shape[1])
+
+        offsets = np.zeros(len(self) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(frame_ids, minlength=len(self)),
+                  out=offsets[1:])
+        return SparseFrames(offsets, index.astype(np.uint32), values, shape)
+
+    def __repr__(self):
+        return ('{0.__class__.__name__}(num_frames={1}, '
+                'frame_shape={0.frame_shape}, nnz={0.nnz})'
+                ''.format(self, len(self)))
+
+
+class _SparseAccumulator(object):
+    '''In-memory builder for SparseFrames'''
+    def __init__(self):
+        self._index = []
+        self._values = []
+        self._counts = []
+        self.frame_shape = None
+
+    def append(self, frame, threshold=0):
+        frame = np.asarray(frame)
+        if self.frame_shape is None:
+            self.frame_shape = frame.shape
+        elif frame.shape != self.frame_shape:
+            raise ValueError('Frame shape changed: {} != {}'
+                             ''.format(frame.shape, self.frame_shape))
+
+        index, values = to_sparse(frame, threshold=threshold)
+        self._index.append(index)
+        self._values.append(values)
+        self._counts.append(len(index))
+
+    def finish(self):
+        if self.frame_shape is None:
+            raise ValueError('No frames')
+
+        offsets = np.zeros(len(self._counts) + 1, dtype=np.int64)
+        np.cumsum(self._counts, out=offsets[1:])
+        return SparseFrames(offsets, np.concatenate(self._index),
+                            np.concatenate(self._values), self.frame_shape)
+
+
+class SparseFrameWriter(object):
+    '''Append dense frames to an HDF5 sparse frame file
+
+    Parameters
+    ----------
+    fn : str
+        Output HDF5 filename
+    value_dtype : np.dtype, optional
+        Data type of stored pixel values
+    threshold : number, optional
+        Only pixels with values greater than this are stored
+    '''
+    def __init__(self, fn, value_dtype=np.uint32, threshold=0,
+                 compression='gzip'):
+        self.fn = fn
+        self.threshold = threshold
+        self._file = h5py.File(fn, 'w')
+        self._offsets = self._file.create_dataset(
+            OFFSETS_KEY, shape=(1, ), maxshape=(None, ), dtype=np.int64,
+            chunks=(4096, ))
+        self._offsets[0] = 0
+        self._index = self._file.create_dataset(
+            INDEX_KEY, shape=(0, ), maxshape=(None, ), dtype=np.uint32,
+            chunks=(65536, ), compression=compression)
+        self._values = self._file.create_dataset(
+            VALUE_KEY, shape=(0, ), maxshape=(None, ), dtype=value_dtype,
+            chunks=(65536, ), compression=compression)
+        self.frame_shape = None
+        self.num_frames = 0
+
+    def append(self, frame):
+        '''Append a single dense frame'''
+        frame = np.asarray(frame)
+        if self.frame_shape is None:
+            self.frame_shape = frame.shape
+            self._file.attrs['frame_shape'] = frame.shape
+        elif frame.shape != self.frame_shape:
+            raise ValueError('Frame shape changed: {} != {}'
+                             ''.format(frame.shape, self.frame_shape))
+
+        index, values = to_sparse(frame, threshold=self.threshold)
+        nnz = len(self._index)
+        for dataset, data in ((self._index, index), (self._values, values)):
+            dataset.resize((nnz + len(data), ))
+            dataset[nnz:] = data
+
+        self.num_frames += 1
+        self._offsets.resize((self.num_frames + 1, ))
+        self._offsets[self.num_frames] = nnz + len(index)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def convert_tiff_series(handler, num_points, fn, threshold=0):
+    '''Convert a TIFF series to a sparse frame file
+
+    Parameters
+    ----------
+    handler : AreaDetectorTiffHandler
+        Handler for the TIFF series resource
+    num_points : int
+        Number of points (datums) in the series
+    fn : str
+        Output HDF5 filename
+    threshold : number, optional
+        Only pixels with values greater than this are stored
+
+    Returns
+    -------
+    frames : SparseFrames
+    '''
+    with SparseFrameWriter(fn, threshold=threshold) as writer:
+        for point in range(num_points):
+            frames = handler(point)
+            if frames.ndim == 2:
+                frames = [frames]
+            for frame in frames:
+                writer.append(frame)
+
+        logger.debug('Converted %d frames to %s (%d pixels stored)',
+                     writer.num_frames, fn, len(writer._index))
+
+    return SparseFrames.from_hdf5(fn)
+
+
+class SparseFrameHandler(HandlerBase):
+    '''Filestore handler for sparse frame files
+
+    Datum kwargs are the same as 'AD_TIFF' (point_number), so resources can be
+    switched over from the TIFF series after conversion.
+
+    Parameters
+    ----------
+    filename : str
+        Sparse frame HDF5 file
+    frame_per_point : int, optional
+        Number of frames per datum
+    crop : (row_slice, col_slice) or (row0, row1, col0, col1), optional
+        Region of each frame to keep
+    binning : int or (row_bin, col_bin), optional
+        Sum-binning applied after cropping
+
+    `crop` and `binning` may also be given per call, overriding those of the
+    handler.
+    '''
+    specs = {'HXN_SPARSE'} | HandlerBase.specs
+    HANDLER_NAME = 'HXN_SPARSE'
+
+    def __init__(self, filename, frame_per_point=1, crop=None, binning=None):
+        self._filename = filename
+        self._fpp = int(frame_per_point)
+        self._raw_frames = None
+        self._frames = None
+        self.crop = crop
+        self.binning = binning
+
+    @property
+    def frames(self):
+        '''All frames in the file, as SparseFrames
+
+        Cropped and binned according to the handler `crop` and `binning`.
+        '''
+        if self._frames is None:
+            frames = self._read_frames()
+            if self.crop is not None or self.binning is not None:
+                frames = frames.crop_bin(self.crop, self.binning)
+            self._frames = frames
+        return self._frames
+
+    def _read_frames(self):
+        if self._raw_frames is None:
+            self._raw_frames = SparseFrames.from_hdf5(self._filename)
+        return self._raw_frames
+
+    def __call__(self, point_number, crop=None, binning=None):
+        start = point_number * self._fpp
+        if crop is None and binning is None:
+            frames = self.frames
+        else:
+            # crop and bin only the frames of this point
+            if crop is None:
+                crop = self.crop
+            if binning is None:
+                binning = self.binning
+            frames = self._read_frames().select(start, start + self._fpp)
+            frames = frames.crop_bin(crop, binning)
+            start = 0
+
+        if self._fpp == 1:
+            return frames.dense(start)
+        return np.asarray([frames.dense(i)
+                           for i in range(start, start + self._fpp)])
+
+    def get_file_list(self, datum_kwarg_gen):
+        return [self._filename]
+
+    def __repr__(self):
+        return '{0.__class__.__name__}(filename={0._filename!r})'.format(self)
+
+
+fs_api.register_handler(SparseFrameHandler.HANDLER_NAME, SparseFrameHandler)
@@ -0,0 +1,142 @@
+from __future__ import print_function
+
+import logging
+
+import numpy as np
+import tifffile
+
+from filestore.handlers import HandlerBase
+
+from .utils import (normalize_crop, bin_frames)
+
+
+logger = logging.getLogger(__name__)
+
+
+class AreaDetectorTiffHandler(HandlerBase):
+    '''Reader for the TIFF series written by the Merlin/Timepix file stores
+
+    Resources are inserted with the 'AD_TIFF' spec (see
+    `MerlinFileStore._insert_fs_resource`). This handler is not registered on
+    import, as filestore ships its own 'AD_TIFF' handler; to use it::
+
+        fs_api.register_handler('AD_TIFF', AreaDetectorTiffHandler,
+                                overwrite=True)
+
+    Parameters
+    ----------
+    fpath : str
+        Resource path
+    template : str
+        Filename template, formatted with (fpath, filename, frame number)
+    filename : str
+        Base filename
+    frame_per_point : int, optional
+        Number of frames per datum
+    corrector : FrameCorrector, optional
+        Correction to apply to each batch of frames read
+    crop : (row_slice, col_slice) or (row0, row1, col0, col1), optional
+        Region of each frame to read. Uncompressed TIFFs are memory-mapped so
+        that only the rows in the region are read from disk.
+    binning : int or (row_bin, col_bin), optional
+        Sum-binning applied after cropping and correction
+    '''
+    specs = {'AD_TIFF'} | HandlerBase.specs
+    HANDLER_NAME = 'AD_TIFF'
+
+    def __init__(self, fpath, template, filename, frame_per_point=1,
+                 corrector=None, crop=None, binning=None):
+        self._path = fpath
+        self._template = template
+        self._filename = filename
+        self._fpp = int(frame_per_point)
+        self.corrector = corrector
+        self.crop = crop
+        self.binning = binning
+        self._cropped_correctors = {}
+
+    def get_filename(self, frame):
+        '''Filename of a single frame'''
+        return self._template % (self._path, self._filename, frame)
+
+    def read_frame(self, frame, crop=None):
+        '''Decode a single frame (or the cropped region of it), uncorrected'''
+        fn = self.get_filename(frame)
+        if crop is None:
+            return tifffile.imread(fn)
+
+        try:
+            data = tifffile.memmap(fn, mode='r')
+        except ValueError:
+            # compressed or otherwise not memory-mappable
+            data = tifffile.imread(fn)
+
+        return np.array(data[normalize_crop(crop, data.shape)])
+
+    def _get_corrector(self, crop):
+        '''Corrector matching the cropped region of the frame'''
+        corrector = self.corrector
+        if corrector is None or crop is None or corrector.shape is None:
+            return corrector
+
+        crop = normalize_crop(crop, corrector.shape)
+        key = (id(corrector), ) + tuple((sl.start, sl.stop) for sl in crop)
+        try:
+            return self._cropped_correctors[key]
+        except KeyError:
+            # only the most recently used region is kept
+            self._cropped_correctors = {key: corrector.cropped(crop)}
+            return self._cropped_correctors[key]
+
+    def read_frames(self, frames, crop=None, binning=None):
+        '''Read a batch of frames into a single (num_frames, ...) array
+
+        The batch is cropped while decoding, corrected in place if a corrector
+        is set, then binned. `crop` and `binning` default to those the handler
+        was created with.
+        '''
+        if crop is None:
+            crop = self.crop
+        if binning is None:
+            binning = self.binning
+
+        frames = list(frames)
+        out = None
+        corrector = None
+        for i, frame in enumerate(frames):
+            data = self.read_frame(frame, crop=crop)
+            if out is None:
+                corrector = self._get_corrector(crop)
+                if corrector is not None:
+                    dtype = corrector.dtype
+                else:
+                    dtype = data.dtype
+                out = np.empty((len(frames), ) + data.shape, dtype=dtype)
+            out[i] = data
+
+        if out is None:
+            return np.empty((0, 0, 0))
+
+        if corrector is not None:
+            corrector.apply(out, out=out)
+        return bin_frames(out, binning)
+
+    def __call__(self, point_number, crop=None, binning=None):
+        start = point_number * self._fpp
+        frames = self.read_frames(range(start, start + self._fpp), crop=crop,
+                                  binning=binning)
+        if self._fpp == 1:
+            return frames[0]
+        return frames
+
+    def get_file_list(self, datum_kwarg_gen):
+        return [self.get_filename(frame)
+                for kw in datum_kwarg_gen
+                for frame in range(kw['point_number'] * self._fpp,
+                                   (kw['point_number'] + 1) * self._fpp)]
+
+    def __repr__(self):
+        return ('{0.__class__.__name__}(fpath={0._path!r}, '
+                'filename={0._filename!r}, corrector={0.corrector!r}, '
+                'crop={0.crop!r}, binning={0.binning!r})'
+                ''.format(self))
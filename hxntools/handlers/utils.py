@@ -0,0 +1,88 @@
+from __future__ import print_function
+
+import numpy as np
+
+
+def center_crop(center, size):
+    '''Crop region of the given size around a center pixel
+
+    Parameters
+    ----------
+    center : (row, col)
+        Center pixel, e.g., the direct beam position
+    size : int or (rows, cols)
+        Size of the region
+
+    Returns
+    -------
+    crop : (row_slice, col_slice)
+    '''
+    rows, cols = np.broadcast_to(size, (2, ))
+    row0 = max(int(center[0]) - int(rows) // 2, 0)
+    col0 = max(int(center[1]) - int(cols) // 2, 0)
+    return (slice(row0, row0 + int(rows)), slice(col0, col0 + int(cols)))
+
+
+def normalize_crop(crop, shape):
+    '''Normalize a crop specification against a frame shape
+
+    Parameters
+    ----------
+    crop : (row_slice, col_slice) or (row0, row1, col0, col1) or None
+        The region to keep. None keeps the full frame.
+    shape : (rows, cols)
+        Full frame shape
+
+    Returns
+    -------
+    crop : (row_slice, col_slice)
+        With start/stop clipped to the frame and a step of 1
+    '''
+    if crop is None:
+        crop = (slice(None), slice(None))
+    elif len(crop) == 4:
+        crop = (slice(crop[0], crop[1]), slice(crop[2], crop[3]))
+
+    ret = []
+    for sl, dim in zip(crop, shape):
+        start, stop, step = sl.indices(dim)
+        if step != 1:
+            raise ValueError('Crop slices must have a step of 1')
+        ret.append(slice(start, max(start, stop)))
+    return tuple(ret)
+
+
+def normalize_binning(binning):
+    '''Normalize binning to a (row_bin, col_bin) tuple of ints'''
+    if binning is None:
+        return (1, 1)
+
+    row_bin, col_bin = (int(b) for b in np.broadcast_to(binning, (2, )))
+    if row_bin < 1 or col_bin < 1:
+        raise ValueError('Binning must be >= 1')
+    return row_bin, col_bin
+
+
+def binned_shape(shape, binning):
+    '''Shape of a frame after binning; partial bins are dropped'''
+    row_bin, col_bin = normalize_binning(binning)
+    return (shape[0] // row_bin, shape[1] // col_bin)
+
+
+def bin_frames(frames, binning, dtype=None):
+    '''Sum-bin the last two axes of a frame or stack of frames
+
+    Rows and columns which do not fill a complete bin are dropped.
+    '''
+    row_bin, col_bin = normalize_binning(binning)
+    frames = np.asarray(frames)
+    if row_bin == col_bin == 1:
+        return frames
+
+    rows, cols = binned_shape(frames.shape[-2:], (row_bin, col_bin))
+    frames = frames[..., :rows * row_bin, :cols * col_bin]
+    shape = frames.shape[:-2] + (rows, row_bin, cols, col_bin)
+    if dtype is None and frames.dtype.kind in 'ui':
+        # avoid overflowing narrow integer types
+        dtype = np.promote_types(frames.dtype, np.uint32)
+    return frames.reshape(shape).sum(axis=(-3, -1), dtype=dtype)
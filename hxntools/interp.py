@@ -3,6 +3,7 @@ import matplotlib.pyplot as plt
 from scipy.interpolate import interp1d, interp2d
 
 from hxntools.scan_info import ScanInfo
+from hxntools.spatial import PointIndex
 
 
 def fly2d_grid(hdr, x_data=None, y_data=None, plot=False):
@@ -62,6 +63,59 @@ def interp1d_scan(hdr, x_data, y_data, spectrum, kind='linear',
     return spectrum2
 
 
+def interp_scattered(x_data, y_data, values, grid_x, grid_y, k=4, power=2.0,
+                     max_distance=None, index=None):
+    '''Inverse-distance weighted gridding of scattered (e.g., Fermat) scans
+
+    Parameters
+    ----------
+    x_data, y_data : array_like
+        Measured positions
+    values : array_like
+        Value at each position
+    grid_x, grid_y : array_like
+        Grid coordinates along each axis
+    k : int, optional
+        Number of nearest measured points used per grid point (1 gives
+        nearest-neighbour gridding)
+    power : float, optional
+        Inverse-distance weighting power
+    max_distance : float, optional
+        Grid points farther than this from all measured points are NaN
+    index : PointIndex, optional
+        Prebuilt index of the measured positions, e.g. reused across
+        several channels of the same scan
+
+    Returns
+    -------
+    gridded : ndarray
+        (len(grid_y), len(grid_x)) array
+    '''
+    if index is None:
+        index = PointIndex(np.column_stack([np.ravel(x_data),
+                                            np.ravel(y_data)]))
+
+    values = np.ravel(values).astype(float)
+    mesh_x, mesh_y = np.meshgrid(grid_x, grid_y)
+    dist, idx = index.nearest(np.column_stack([mesh_x.ravel(),
+                                               mesh_y.ravel()]), k=k)
+
+    valid = idx >= 0
+    with np.errstate(divide='ignore'):
+        weights = np.where(valid, 1.0 / dist ** power, 0.0)
+
+    # grid points that coincide with a measured point take its value
+    exact = np.isinf(weights)
+    hit = np.any(exact, axis=1)
+    weights[hit] = exact[hit]
+
+    gridded = (np.sum(weights * values[np.where(valid, idx, 0)], axis=1) /
+               np.sum(weights, axis=1))
+    if max_distance is not None:
+        gridded[dist[:, 0] > max_distance] = np.nan
+    return gridded.reshape(mesh_x.shape)
+
+
 def fly2d_reshape(hdr, spectrum, verbose=True, copy=False):
     '''Reshape a 1D array to match the shape of a 2D flyscan'''
     info = ScanInfo(hdr)
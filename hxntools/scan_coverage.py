@@ -0,0 +1,270 @@
+'''Probe overlap and coverage analysis of scan patterns
+
+For ptychography, the overlap between neighbouring probe positions is
+what makes reconstruction possible. Given a pattern and a probe diameter,
+`analyze_coverage` reports the nearest-neighbour spacing, the probe overlap
+with the nearest neighbour and the fraction of the scan region not
+illuminated at all. `choose_fermat_dr` picks the Fermat spiral step that
+guarantees a target overlap::
+
+    dr = choose_fermat_dr(5.0, 5.0, probe_diameter=0.2, overlap=0.6)
+    x, y = spiral_fermat(5.0, 5.0, dr, 1)
+    print(analyze_coverage(np.column_stack([x, y]), 0.2))
+
+Overlap is the linear overlap ``1 - spacing / diameter``; the fraction of
+the probe area shared with the nearest neighbour is reported as well.
+'''
+import logging
+from collections import namedtuple
+
+import numpy as np
+
+from .spatial import PointIndex
+from .scan_patterns import spiral_fermat
+
+
+logger = logging.getLogger(__name__)
+
+
+CoverageReport = namedtuple('CoverageReport',
+                            'num_points spacing_min spacing_mean '
+                            'spacing_max overlap_min overlap_mean '
+                            'area_overlap_min uncovered_fraction')
+
+
+def _as_points(points):
+    points = np.asarray(points, dtype=float)
+    if points.ndim != 2 or points.shape[1] != 2:
+        raise ValueError('Expected an (N, 2) array of points')
+    return points
+
+
+def nearest_spacing(points, index=None):
+    '''Distance from each point to its nearest neighbour
+
+    Parameters
+    ----------
+    points : array_like
+        (N, 2) positions
+    index : PointIndex, optional
+        Prebuilt index of the points
+    '''
+    points = _as_points(points)
+    if len(points) < 2:
+        return np.full(len(points), np.inf)
+
+    if index is None:
+        index = PointIndex(points)
+    dist, idx = index.nearest(points, k=2)
+    # the point itself is normally first, unless coincident points exist
+    is_self = (idx[:, 0] == np.arange(len(points)))
+    return np.where(is_self, dist[:, 1], dist[:, 0])
+
+
+def linear_overlap(spacing, probe_diameter):
+    '''Linear overlap ``1 - spacing / diameter`` (negative for gaps)'''
+    return 1.0 - np.asarray(spacing, dtype=float) / probe_diameter
+
+
+def area_overlap(spacing, probe_diameter):
+    '''Fraction of a circular probe's area shared with a probe at the given
+    distance'''
+    r = probe_diameter / 2.
+    d = np.clip(np.asarray(spacing, dtype=float), 0.0, 2 * r)
+    lens = (2 * r ** 2 * np.arccos(d / (2 * r)) -
+            d / 2. * np.sqrt(4 * r ** 2 - d ** 2))
+    return lens / (np.pi * r ** 2)
+
+
+def uncovered_fraction(points, probe_diameter, bounds=None, resolution=None,
+                       chunk_size=2 ** 16):
+    '''Fraction of the scan region outside every probe footprint
+
+    The region is sampled on a regular grid; each probe footprint marks the
+    samples it covers, for chunks of points at a time.
+
+    Parameters
+    ----------
+    points : array_like
+        (N, 2) positions
+    probe_diameter : float
+    bounds : ((x0, y0), (x1, y1)), optional
+        Region to check; defaults to the bounding box of the points
+    resolution : float, optional
+        Sampling step; defaults to a tenth of the probe diameter
+    chunk_size : int, optional
+        Number of points rasterized at once
+    '''
+    points = _as_points(points)
+    if len(points) == 0:
+        return 1.0
+    if bounds is None:
+        bounds = (points.min(axis=0), points.max(axis=0))
+    if resolution is None:
+        resolution = probe_diameter / 10.
+
+    origin = np.asarray(bounds[0], dtype=float)
+    extent = np.asarray(bounds[1], dtype=float) - origin
+    shape = tuple(int(n) for n in np.floor(extent / resolution))
+    if min(shape) <= 0:
+        return 0.0
+
+    radius = probe_diameter / 2.
+    reach = int(np.ceil(radius / resolution)) + 1
+    steps = np.arange(-reach, reach + 1)
+    offsets = np.stack(np.meshgrid(steps, steps, indexing='ij'),
+                       axis=-1).reshape(-1, 2)
+
+    covered = np.zeros(shape, dtype=bool)
+    for start in range(0, len(points), chunk_size):
+        chunk = (points[start:start + chunk_size] - origin) / resolution
+        base = np.floor(chunk).astype(int)
+        for offset in offsets:
+            cell = base + offset
+            # distance from the probe center to the sample (cell center)
+            dist = np.hypot(*((cell + 0.5 - chunk) * resolution).T)
+            hit = ((dist <= radius) & np.all(cell >= 0, axis=1) &
+                   (cell[:, 0] < shape[0]) & (cell[:, 1] < shape[1]))
+            covered[cell[hit, 0], cell[hit, 1]] = True
+
+    return 1.0 - float(np.count_nonzero(covered)) / covered.size
+
+
+def analyze_coverage(points, probe_diameter, bounds=None, resolution=None):
+    '''Spacing, overlap and coverage of a 2D scan pattern
+
+    Parameters
+    ----------
+    points : array_like
+        (N, 2) positions
+    probe_diameter : float
+    bounds : ((x0, y0), (x1, y1)), optional
+        Region to check for coverage; defaults to the bounding box of the
+        points
+    resolution : float, optional
+        Coverage sampling step; defaults to a tenth of the probe diameter
+
+    Returns
+    -------
+    report : CoverageReport
+        The minimum overlap is that of the most isolated point, i.e. the
+        guaranteed overlap of every point with at least one neighbour
+    '''
+    points = _as_points(points)
+    index = PointIndex(points)
+    spacing = nearest_spacing(points, index=index)
+    if len(spacing) == 0:
+        spacing = np.array([np.inf])
+
+    finite = spacing[np.isfinite(spacing)]
+    if not len(finite):
+        finite = np.array([np.inf])
+    overlap = linear_overlap(finite, probe_diameter)
+    return CoverageReport(
+        num_points=len(points),
+        spacing_min=float(finite.min()),
+        spacing_mean=float(finite.mean()),
+        spacing_max=float(finite.max()),
+        overlap_min=float(overlap.min()),
+        overlap_mean=float(overlap.mean()),
+        area_overlap_min=float(area_overlap(finite.max(), probe_diameter)),
+        uncovered_fraction=uncovered_fraction(points, probe_diameter,
+                                              bounds=bounds,
+                                              resolution=resolution),
+    )
+
+
+def _largest_spacing(x_range, y_range, dr, factor):
+    '''Largest nearest-neighbour spacing of a Fermat pattern (inf if it
+    has fewer than two points)'''
+    x, y = spiral_fermat(x_range, y_range, dr, factor)
+    if len(x) < 2:
+        return np.inf
+    return nearest_spacing(np.column_stack([x, y])).max()
+
+
+def choose_fermat_dr(x_range, y_range, probe_diameter, overlap=0.6,
+                     factor=1, iterations=3, rtol=1e-3, max_steps=60):
+    '''Largest Fermat spiral step giving at least the target overlap
+
+    The Fermat pattern scales with dr / factor, so the nearest-neighbour
+    spacing is proportional to dr; the step is solved for from the spacing
+    of a trial pattern, then refined by bisection to account for the
+    clipping at the edges.
+
+    Parameters
+    ----------
+    x_range, y_range : float
+        Scan ranges, as for `spiral_fermat`
+    probe_diameter : float
+    overlap : float, optional
+        Minimum linear overlap of every point with its nearest neighbour
+    factor : float, optional
+        The `factor` parameter of `spiral_fermat`
+    iterations : int, optional
+        Rescaling steps of the initial estimate
+    rtol : float, optional
+        Relative precision of the bisection
+    max_steps : int, optional
+        Maximum number of patterns generated by the bisection
+
+    Returns
+    -------
+    dr : float
+
+    Raises
+    ------
+    RuntimeError
+        If no step meeting the target is found within max_steps
+    '''
+    if not 0 <= overlap < 1:
+        raise ValueError('Overlap must be in [0, 1)')
+    if probe_diameter <= 0:
+        raise ValueError('Probe diameter must be positive')
+
+    target = probe_diameter * (1. - overlap)
+
+    # spacing / dr is constant apart from edge effects: solve for dr
+    dr = target
+    for i in range(max(1, iterations)):
+        largest = _largest_spacing(x_range, y_range, dr, factor)
+        logger.debug('Fermat dr=%g: largest spacing %g (target %g)', dr,
+                     largest, target)
+        if not np.isfinite(largest):
+            # not enough points for a spacing; shrink the step
+            dr /= 2.
+            continue
+        if np.isclose(largest, target, rtol=rtol):
+            break
+        dr *= target / largest
+
+    # bracket the step: lower meets the target, upper does not
+    def meets(dr):
+        return _largest_spacing(x_range, y_range, dr, factor) <= target
+
+    steps = 0
+    lower, upper = dr, dr
+    if meets(dr):
+        upper = dr * (1 + 16 * rtol)
+        while meets(upper) and steps < max_steps:
+            lower, upper = upper, upper * 2
+            steps += 1
+    else:
+        lower = dr * (1 - 16 * rtol)
+        while not meets(lower) and steps < max_steps:
+            upper, lower = lower, lower / 2
+            steps += 1
+
+    while upper - lower > rtol * lower and steps < max_steps:
+        middle = 0.5 * (lower + upper)
+        if meets(middle):
+            lower = middle
+        else:
+            upper = middle
+        steps += 1
+
+    if upper - lower > rtol * lower:
+        raise RuntimeError('Fermat step for a spacing of {} did not converge '
+                           'in {} steps (between {} and {})'
+                           ''.format(target, max_steps, lower, upper))
+    return lower
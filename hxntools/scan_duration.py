@@ -0,0 +1,378 @@
+'''Scan duration prediction
+
+The duration of a step scan is estimated from its points as
+
+    setup + sum(move time + exposure + per-point overhead)
+
+where the move time between consecutive points is the slowest of the
+per-axis trapezoidal velocity profiles (axes move simultaneously) plus the
+axis settle time, and the per-point overhead (detector readout, bluesky
+and EPICS round trips) is learned from the event timestamps of past scans.
+
+Examples
+--------
+>>> limits = {'ssx': AxisLimits(velocity=10., acceleration=100.,
+...                             settle_time=0.02),
+...           'ssy': AxisLimits(velocity=10., acceleration=100.,
+...                             settle_time=0.02)}
+>>> overhead = OverheadStats.from_headers(db[-10:], axis_limits=limits)
+>>> estimate = predict_plan_duration(my_fermat_plan, limits, overhead)
+>>> print(estimate)
+'''
+import logging
+from collections import namedtuple
+
+import numpy as np
+from boltons.iterutils import chunked
+
+from .scan_ordering import relative_scan_order
+
+
+logger = logging.getLogger(__name__)
+
+
+AxisLimits = namedtuple('AxisLimits', 'velocity acceleration settle_time')
+AxisLimits.__new__.__defaults__ = (0.0, )
+
+DurationEstimate = namedtuple('DurationEstimate',
+                              'total low high num_points moving exposure '
+                              'overhead setup')
+
+
+def move_times(distances, velocity, acceleration):
+    '''Time for point-to-point moves with a trapezoidal velocity profile
+
+    Parameters
+    ----------
+    distances : array_like
+        Move distances (any shape; the sign is ignored)
+    velocity : float or array_like
+        Maximum velocity, broadcast against distances
+    acceleration : float or array_like
+        Acceleration (and deceleration); non-positive means instantaneous
+
+    Returns
+    -------
+    times : ndarray
+    '''
+    distances = np.abs(np.asarray(distances, dtype=float))
+    velocity = np.asarray(velocity, dtype=float)
+    acceleration = np.asarray(acceleration, dtype=float)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        accel = np.where(acceleration > 0, acceleration, np.inf)
+        # moves shorter than this never reach full velocity
+        ramp = velocity ** 2 / accel
+        times = np.where(distances >= ramp,
+                         distances / velocity + velocity / accel,
+                         2 * np.sqrt(distances / accel))
+    return np.where(distances > 0, times, 0.0)
+
+
+def _axis_limits(axes, axis_limits):
+    '''Per-axis (velocity, acceleration, settle_time) arrays'''
+    if isinstance(axis_limits, dict):
+        limits = []
+        for axis in axes:
+            name = getattr(axis, 'name', axis)
+            try:
+                limits.append(axis_limits[axis])
+            except (KeyError, TypeError):
+                try:
+                    limits.append(axis_limits[name])
+                except KeyError:
+                    raise ValueError('No limits specified for axis {!r}'
+                                     ''.format(name))
+    else:
+        limits = list(axis_limits)
+        if len(limits) != len(axes):
+            raise ValueError('Expected limits for {} axes (got {})'
+                             ''.format(len(axes), len(limits)))
+
+    limits = [AxisLimits(*limit) for limit in limits]
+    return (np.array([limit.velocity for limit in limits], dtype=float),
+            np.array([limit.acceleration for limit in limits], dtype=float),
+            np.array([limit.settle_time for limit in limits], dtype=float))
+
+
+def point_move_times(points, axis_limits, start=None):
+    '''Time to move to each point from the previous one
+
+    Parameters
+    ----------
+    points : array_like
+        (N, n_axes) positions
+    axis_limits : sequence of AxisLimits
+        One (velocity, acceleration[, settle_time]) per axis
+    start : array_like, optional
+        Position before the first point; if unset, the first move is free
+
+    Returns
+    -------
+    times : ndarray
+        (N, ) move plus settle times
+    '''
+    points = np.asarray(points, dtype=float)
+    if points.ndim == 1:
+        points = points[:, np.newaxis]
+    if start is None:
+        start = points[:1]
+    points = np.concatenate([np.reshape(start, (1, -1)), points])
+
+    velocity, acceleration, settle = _axis_limits(range(points.shape[1]),
+                                                  axis_limits)
+    deltas = np.abs(np.diff(points, axis=0))
+    times = move_times(deltas, velocity, acceleration)
+    times += np.where(deltas > 0, settle, 0.0)
+    return times.max(axis=1) if times.size else np.zeros(len(deltas))
+
+
+class OverheadStats(object):
+    '''Per-point and per-scan overheads measured from past scans
+
+    The per-point overhead is the time between consecutive events beyond
+    the exposure time and (if axis limits are known) the predicted move
+    time. The per-scan setup time is the time from the start document to
+    the first event.
+
+    Parameters
+    ----------
+    point_overheads : array_like, optional
+        Per-point overhead samples, in seconds
+    setup_times : array_like, optional
+        Per-scan setup time samples, in seconds
+    '''
+    def __init__(self, point_overheads=None, setup_times=None):
+        self.point_overheads = np.zeros(0)
+        self.setup_times = np.zeros(0)
+        if point_overheads is not None:
+            self.add(point_overheads)
+        if setup_times is not None:
+            self.add_setup(setup_times)
+
+    def add(self, point_overheads):
+        self.point_overheads = np.concatenate(
+            [self.point_overheads, np.ravel(point_overheads)])
+
+    def add_setup(self, setup_times):
+        self.setup_times = np.concatenate([self.setup_times,
+                                           np.ravel(setup_times)])
+
+    def add_scan(self, event_times, exposure_time, positions=None,
+                 axis_limits=None, start_time=None):
+        '''Add the overheads of a single scan
+
+        Parameters
+        ----------
+        event_times : array_like
+            Event timestamps
+        exposure_time : float
+            Per-point exposure time
+        positions : array_like, optional
+            (N, n_axes) positions of each event
+        axis_limits : sequence of AxisLimits, optional
+            Required to subtract the move time when positions are given
+        start_time : float, optional
+            Start document time, for the setup time
+        '''
+        event_times = np.asarray(event_times, dtype=float)
+        if len(event_times) == 0:
+            return
+
+        if start_time is not None:
+            self.add_setup([event_times[0] - start_time])
+
+        overheads = np.diff(event_times) - exposure_time
+        if positions is not None and axis_limits is not None:
+            overheads -= point_move_times(positions, axis_limits)[1:]
+        # negative values are timing jitter
+        self.add(np.clip(overheads, 0.0, None))
+
+    @classmethod
+    def from_headers(cls, headers, axis_limits=None):
+        '''Measure overheads from databroker headers of step scans'''
+        from databroker import DataBroker as db
+        from .scan_info import get_scan_info
+
+        stats = cls()
+        for header in headers:
+            info = get_scan_info(header)
+            motors = list(info.get('motors') or [])
+            if axis_limits is None:
+                motors = []
+
+            events = list(db.fetch_events(header, fill=False))
+            times = [event['time'] for event in events]
+            try:
+                positions = [[event['data'][motor] for motor in motors]
+                             for event in events]
+            except KeyError:
+                logger.debug('Motor positions unavailable for scan %s',
+                             header['start'].get('scan_id'))
+                motors = []
+
+            limits = None
+            if motors:
+                limits = list(zip(*_axis_limits(motors, axis_limits)))
+            stats.add_scan(times, info.get('exposure_time', 0.0),
+                           positions=positions if motors else None,
+                           axis_limits=limits,
+                           start_time=header['start'].get('time'))
+        return stats
+
+    def _stat(self, samples, func, default=0.0):
+        if len(samples) == 0:
+            return default
+        return float(func(samples))
+
+    @property
+    def mean(self):
+        return self._stat(self.point_overheads, np.mean)
+
+    @property
+    def std(self):
+        return self._stat(self.point_overheads, np.std)
+
+    @property
+    def setup(self):
+        return self._stat(self.setup_times, np.median)
+
+    def percentile(self, q):
+        return self._stat(self.point_overheads,
+                          lambda samples: np.percentile(samples, q))
+
+    def __repr__(self):
+        return ('{0.__class__.__name__}(samples={1}, mean={0.mean:.4f}, '
+                'std={0.std:.4f}, setup={0.setup:.3f})'
+                ''.format(self, len(self.point_overheads)))
+
+
+def outer_product_points(args):
+    '''Points of an outer-product scan
+
+    Parameters
+    ----------
+    args : list
+        (motor, start, stop, num, snake) for each axis, slowest first, as
+        given to OuterProductAbsScan
+
+    Returns
+    -------
+    points : ndarray
+        (N, n_axes) positions in scan order
+    '''
+    points = np.zeros((1, 0))
+    for motor, start, stop, num, snake in chunked(args, 5):
+        positions = np.linspace(start, stop, int(num))
+        outer = len(points)
+        inner = np.tile(positions, (outer, 1))
+        if snake:
+            inner[1::2] = inner[1::2, ::-1]
+        points = np.column_stack([np.repeat(points, int(num), axis=0),
+                                  inner.ravel()])
+    return points
+
+
+def predict_duration(points, exposure_time, axis_limits, overhead=None,
+                     start=None):
+    '''Predict the duration of a step scan over the given points
+
+    Parameters
+    ----------
+    points : array_like
+        (N, n_axes) positions, in scan order
+    exposure_time : float
+        Per-point exposure time
+    axis_limits : sequence of AxisLimits
+        One (velocity, acceleration[, settle_time]) per axis
+    overhead : OverheadStats or float, optional
+        Measured overheads, or a fixed per-point overhead
+    start : array_like, optional
+        Starting position of the axes
+
+    Returns
+    -------
+    estimate : DurationEstimate
+        Total duration in seconds, with low/high bounds from the 10th and
+        90th percentiles of the per-point overhead, and its components
+    '''
+    points = np.asarray(points, dtype=float)
+    num = len(points)
+    moving = float(np.sum(point_move_times(points, axis_limits,
+                                           start=start))) if num else 0.0
+    exposure = num * float(exposure_time or 0.0)
+
+    if isinstance(overhead, OverheadStats):
+        per_point = overhead.mean
+        low, high = overhead.percentile(10), overhead.percentile(90)
+        setup = overhead.setup
+    else:
+        per_point = low = high = float(overhead or 0.0)
+        setup = 0.0
+
+    base = moving + exposure + setup
+    return DurationEstimate(total=base + num * per_point,
+                            low=base + num * low,
+                            high=base + num * high,
+                            num_points=num,
+                            moving=moving,
+                            exposure=exposure,
+                            overhead=num * per_point,
+                            setup=setup)
+
+
+def predict_plan_duration(plan, axis_limits, overhead=None,
+                          exposure_time=None, reorder_time=0.1):
+    '''Predict the duration of a plan before running it
+
+    Supports multi-motor plans (e.g., HxnFermatPlan, HxnPatternPlan) through
+    their `get_points` and outer-product plans (e.g., HxnOuterAbsScan)
+    through their `args`. The points are those of the plan's current
+    settings, and the plan is not modified.
+
+    Parameters
+    ----------
+    plan : Plan
+    axis_limits : dict or sequence
+        AxisLimits keyed by motor (or motor name), or one per axis
+    overhead : OverheadStats or float, optional
+        Measured overheads, or a fixed per-point overhead
+    exposure_time : float, optional
+        Defaults to the plan's exposure_time
+    reorder_time : float, optional
+        Time spent ordering the points of plans with `reorder` set. This is
+        kept short, so the move time is an upper bound on that of the plan's
+        (longer) reordering.
+    '''
+    if exposure_time is None:
+        exposure_time = getattr(plan, 'exposure_time', None)
+        if exposure_time is None:
+            raise ValueError('Exposure time unknown for plan {!r}'
+                             ''.format(plan))
+
+    if hasattr(plan, 'get_points') and hasattr(plan, '_motors'):
+        motors = plan._motors
+        if hasattr(plan, 'get_point_args'):
+            point_args = plan.get_point_args()
+        else:
+            point_args = plan.point_args
+        points = plan.get_points(*point_args)
+        points = np.column_stack([np.asarray(m_points, dtype=float)
+                                  for m_points in points])
+        if getattr(plan, 'reorder', False):
+            points = points[relative_scan_order(points,
+                                                time_budget=reorder_time)]
+        # relative plans start from the origin
+        start = np.zeros(points.shape[1])
+    elif hasattr(plan, 'args'):
+        motors = list(plan.args[::5])
+        points = outer_product_points(plan.args)
+        start = None
+    else:
+        raise ValueError('Unsupported plan type: {}'
+                         ''.format(plan.__class__.__name__))
+
+    velocity, acceleration, settle = _axis_limits(motors, axis_limits)
+    limits = list(zip(velocity, acceleration, settle))
+    return predict_duration(points, exposure_time, limits, overhead=overhead,
+                            start=start)
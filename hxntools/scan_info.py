@@ -3,6 +3,8 @@ import numpy as np
 from databroker import DataBroker as db
 import logging
 
+from .handlers.prefetch import FramePrefetcher
+
 
 logger = logging.getLogger(__name__)
 
@@ -30,7 +32,7 @@ step_1d = ('InnerProductAbsScan', 'HxnInnerAbsScan',
            'DeltaScan', 'HxnDeltaScan')
 
 step_2d = ('OuterProductAbsScan', 'HxnOuterAbsScan')
-fermat_scans = ('HxnFermatPlan', )
+fermat_scans = ('HxnFermatPlan', 'HxnProgressiveFermatPlan')
 fly_scans = ('FlyPlan1D', 'FlyPlan2D')
 
 
@@ -186,6 +188,22 @@ class ScanInfo(object):
     def __repr__(self):
         return '{}({})'.format(self.__class__.__name__, self.header)
 
+    def iter_frames(self, key=None, **kwargs):
+        '''Iterate over (index, frame) of a filestore key, decoding ahead
+
+        Keyword arguments are passed on to `FramePrefetcher` (e.g.,
+        max_workers, read_ahead, ordered).
+        '''
+        if key is None:
+            key = self.key
+        if key is None:
+            raise ValueError('No key specified')
+
+        # a list, so that the prefetcher can be iterated more than once
+        uids = [event['data'][key]
+                for event in db.fetch_events(self.header, fill=False)]
+        return FramePrefetcher(uids, **kwargs)
+
     def __iter__(self):
         if self.key:
             for event in db.fetch_events(self.header, fill=False):
@@ -0,0 +1,440 @@
+'''Travel-minimizing ordering of scan points
+
+Patterns such as the clipped Fermat spiral are generated in an order that
+is good for coverage but leads to long stage moves. `optimize_order` finds
+a short open path through an arbitrary point set: a nearest-neighbour tour
+is improved with 2-opt and Or-opt moves until no move helps or the time
+budget runs out.
+
+Moves are restricted to each point's nearest neighbours, and the gains of
+all candidate moves are evaluated at once with numpy.
+'''
+import time
+import logging
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+
+logger = logging.getLogger(__name__)
+
+
+def _as_points(points):
+    points = np.asarray(points, dtype=float)
+    if points.ndim == 1:
+        points = points[:, np.newaxis]
+    if points.ndim != 2:
+        raise ValueError('Expected an (N, n_axes) array of points')
+    return points
+
+
+def _norm(diff, metric):
+    if metric == 'euclidean':
+        return np.sqrt(np.sum(diff * diff, axis=-1))
+    elif metric == 'chebyshev':
+        return np.max(np.abs(diff), axis=-1)
+    raise ValueError('Unknown metric: {!r} (expected euclidean or '
+                     'chebyshev)'.format(metric))
+
+
+def path_length(points, order=None, metric='euclidean'):
+    '''Total length of the path through the points
+
+    Parameters
+    ----------
+    points : array_like
+        (N, n_axes) point positions
+    order : array_like, optional
+        Visiting order (indices into points); defaults to the given order
+    metric : {'euclidean', 'chebyshev'}, optional
+        Move distance. Chebyshev (the largest single-axis move) is the
+        better model of move time when the axes move simultaneously.
+    '''
+    points = _as_points(points)
+    if order is not None:
+        points = points[np.asarray(order)]
+    if len(points) < 2:
+        return 0.0
+    return float(np.sum(_norm(np.diff(points, axis=0), metric)))
+
+
+def nearest_neighbors(points, k, metric='euclidean'):
+    '''Indices of the k nearest neighbours of each point (excluding itself)'''
+    points = _as_points(points)
+    num = len(points)
+    k = min(int(k), num - 1)
+    if k <= 0:
+        return np.zeros((num, 0), dtype=int)
+
+    _, idx = cKDTree(points).query(points, k=k + 1, p=_minkowski_p(metric))
+    # coincident points may be returned before the point itself
+    is_self = (idx == np.arange(num)[:, np.newaxis])
+    keep = np.ones_like(idx, dtype=bool)
+    keep[np.arange(num), np.where(is_self.any(axis=1),
+                                  is_self.argmax(axis=1), k)] = False
+    return idx[keep].reshape(num, k)
+
+
+def _minkowski_p(metric):
+    if metric == 'euclidean':
+        return 2
+    elif metric == 'chebyshev':
+        return np.inf
+    raise ValueError('Unknown metric: {!r} (expected euclidean or '
+                     'chebyshev)'.format(metric))
+
+
+def nearest_neighbor_order(points, start=0, neighbors=None,
+                           metric='euclidean', deadline=None):
+    '''Greedy nearest-neighbour path starting at point `start`
+
+    Parameters
+    ----------
+    points : array_like
+        (N, n_axes) point positions
+    start : int, optional
+        Index of the first point
+    neighbors : ndarray, optional
+        Candidate lists from `nearest_neighbors`, tried before falling back
+        to a search over all unvisited points
+    metric : {'euclidean', 'chebyshev'}, optional
+    deadline : float, optional
+        time.time() by which the path must be complete. Points not reached
+        by then follow in their input order.
+
+    Returns
+    -------
+    order : ndarray
+    '''
+    points = _as_points(points)
+    num = len(points)
+    if num == 0:
+        return np.zeros(0, dtype=int)
+
+    if neighbors is None:
+        neighbors = nearest_neighbors(points, 8, metric=metric)
+
+    visited = np.zeros(num, dtype=bool)
+    # superset of the unvisited points, compacted on each full search
+    remaining = np.arange(num)
+    candidate_lists = neighbors.tolist()
+    tree = None
+    order = np.empty(num, dtype=int)
+    current = int(start)
+    for i in range(num):
+        order[i] = current
+        visited[current] = True
+        if i == num - 1:
+            break
+
+        if (deadline is not None and i % 1024 == 0 and
+                time.time() > deadline):
+            logger.warning('Point ordering time budget spent after %d of %d '
+                           'points; the rest keep their input order', i + 1,
+                           num)
+            order[i + 1:] = np.flatnonzero(~visited)
+            break
+
+        for candidate in candidate_lists[current]:
+            if not visited[candidate]:
+                current = candidate
+                break
+        else:
+            remaining = remaining[~visited[remaining]]
+            if len(remaining) > 4096 and tree is None:
+                tree = cKDTree(points)
+            current = _nearest_unvisited(points, current, visited,
+                                         remaining, tree, metric)
+    return order
+
+
+def _nearest_unvisited(points, current, visited, remaining, tree, metric):
+    '''Nearest unvisited point, searching outwards with the tree before
+    falling back to all remaining points'''
+    k = 64
+    while tree is not None and k <= len(remaining) // 16:
+        _, idx = tree.query(points[current], k=k, p=_minkowski_p(metric))
+        idx = idx[idx < len(points)]
+        idx = idx[~visited[idx]]
+        if len(idx):
+            return int(idx[np.argmin(_norm(points[idx] - points[current],
+                                           metric))])
+        k *= 4
+
+    dist = _norm(points[remaining] - points[current], metric)
+    return int(remaining[np.argmin(dist)])
+
+
+class _Tour(object):
+    '''Open path being improved; positions -1 and N are virtual end points
+    at zero distance from everything'''
+    def __init__(self, points, order, metric):
+        self.points = points
+        self.order = np.array(order, dtype=int)
+        self.metric = metric
+        self.num = len(order)
+        self._update()
+
+    def _update(self):
+        self.position = np.empty(self.num, dtype=int)
+        self.position[self.order] = np.arange(self.num)
+        self.path = self.points[self.order]
+
+    def dist(self, a, b):
+        '''Distance between the points at tour positions a and b'''
+        valid = (a >= 0) & (a < self.num) & (b >= 0) & (b < self.num)
+        a = np.clip(a, 0, self.num - 1)
+        b = np.clip(b, 0, self.num - 1)
+        return np.where(valid, _norm(self.path[a] - self.path[b],
+                                     self.metric), 0.0)
+
+    def best_two_opt(self, neighbors, fix_start, window=None):
+        '''Best 2-opt move (gain, i, j): reverse tour[i + 1:j + 1]
+
+        Only moves adding an edge at a point in the `window` (start, stop) of
+        tour positions are considered.
+        '''
+        points = self.order if window is None else self.order[slice(*window)]
+        p = self.position[points, np.newaxis]
+        q = self.position[neighbors[points]]
+        p, q = np.broadcast_arrays(p, q)
+
+        # new edge between each point and a neighbour, either joining their
+        # successors (i, j = p, q) or their predecessors (i, j = p-1, q-1)
+        i = np.concatenate([np.minimum(p, q).ravel(),
+                            np.minimum(p, q).ravel() - 1])
+        j = np.concatenate([np.maximum(p, q).ravel(),
+                            np.maximum(p, q).ravel() - 1])
+
+        gain = (self.dist(i, i + 1) + self.dist(j, j + 1) -
+                self.dist(i, j) - self.dist(i + 1, j + 1))
+        invalid = (j - i) < 2
+        if fix_start:
+            invalid |= (i < 0)
+        gain[invalid] = 0.0
+
+        best = int(np.argmax(gain))
+        return gain[best], i[best], j[best]
+
+    def apply_two_opt(self, i, j):
+        self.order[i + 1:j + 1] = self.order[i + 1:j + 1][::-1]
+        self._update()
+
+    def best_or_opt(self, neighbors, max_segment, fix_start, window=None):
+        '''Best Or-opt move (gain, p, length, q, reverse): move the segment
+        tour[p:p + length] between positions q and q + 1
+
+        Only segments starting in the `window` (start, stop) of tour
+        positions are considered.
+        '''
+        best = (0.0, 0, 0, 0, False)
+        num_neighbors = neighbors.shape[1]
+        start, stop = (0, self.num) if window is None else window
+        for length in range(1, max_segment + 1):
+            if length >= self.num - 1:
+                break
+            # segments starting at every position in the window
+            p = np.arange(start, min(stop, self.num - length + 1))
+            if fix_start:
+                p = p[p > 0]
+            end = p + length - 1
+            removal = (self.dist(p - 1, p) + self.dist(end, end + 1) -
+                       self.dist(p - 1, end + 1))
+
+            # insert after a neighbour of the first or last segment point,
+            # or before one (i.e. after its predecessor)
+            first = self.order[p]
+            last = self.order[end]
+            q = np.concatenate([self.position[neighbors[first]],
+                                self.position[neighbors[last]]], axis=1)
+            q = np.concatenate([q, q - 1], axis=1)
+            p_ = np.repeat(p[:, np.newaxis], 4 * num_neighbors, axis=1)
+            end_ = p_ + length - 1
+            removal_ = np.repeat(removal[:, np.newaxis], 4 * num_neighbors,
+                                 axis=1)
+
+            base = self.dist(q, q + 1)
+            forward = base - self.dist(q, p_) - self.dist(end_, q + 1)
+            reverse = base - self.dist(q, end_) - self.dist(p_, q + 1)
+
+            invalid = (q >= p_ - 1) & (q <= end_)
+            if fix_start:
+                invalid |= (q < 0)
+            for reverse_segment, insertion in ((False, forward),
+                                               (True, reverse)):
+                gain = np.where(invalid, 0.0, removal_ + insertion)
+                idx = np.unravel_index(np.argmax(gain), gain.shape)
+                if gain[idx] > best[0]:
+                    best = (gain[idx], p_[idx], length, q[idx],
+                            reverse_segment)
+        return best
+
+    def apply_or_opt(self, p, length, q, reverse):
+        segment = self.order[p:p + length]
+        if reverse:
+            segment = segment[::-1]
+        rest = np.concatenate([self.order[:p], self.order[p + length:]])
+        # position q refers to the tour before the segment was removed
+        insert_at = q + 1 if q < p else q + 1 - length
+        self.order = np.concatenate([rest[:insert_at], segment,
+                                     rest[insert_at:]])
+        self._update()
+
+
+def improve_order(points, order, time_budget=1.0, neighbors=8,
+                  max_segment=3, fix_start=True, metric='euclidean',
+                  window=2048):
+    '''Improve a path with 2-opt and Or-opt moves
+
+    Parameters
+    ----------
+    points : array_like
+        (N, n_axes) point positions
+    order : array_like
+        Initial visiting order
+    time_budget : float, optional
+        Stop improving after this many seconds
+    neighbors : int or ndarray, optional
+        Number of nearest neighbours considered for each point, or
+        precomputed candidate lists
+    max_segment : int, optional
+        Longest segment relocated by Or-opt moves (0 to disable)
+    fix_start : bool, optional
+        Keep the first point of `order` first
+    metric : {'euclidean', 'chebyshev'}, optional
+    window : int, optional
+        Number of tour positions whose moves are evaluated per step; the
+        window advances along the tour when it has no improving move. This
+        bounds the time per step for large point sets.
+
+    Returns
+    -------
+    order : ndarray
+        Improved visiting order
+    '''
+    t0 = time.time()
+    points = _as_points(points)
+    num = len(points)
+    if num < 4:
+        return np.array(order, dtype=int)
+
+    if np.ndim(neighbors) == 0:
+        neighbors = nearest_neighbors(points, neighbors, metric=metric)
+
+    tour = _Tour(points, order, metric)
+    eps = 1e-12 * max(path_length(points, order, metric=metric), 1.0)
+    window = max(int(window), 1)
+    num_windows = -(-num // window)
+    current = idle = 0
+    moves = 0
+    while time.time() - t0 < time_budget:
+        bounds = (current * window, (current + 1) * window)
+        gain, i, j = tour.best_two_opt(neighbors, fix_start, bounds)
+        if max_segment > 0:
+            or_move = tour.best_or_opt(neighbors, max_segment, fix_start,
+                                       bounds)
+        else:
+            or_move = (0.0, )
+
+        if max(gain, or_move[0]) <= eps:
+            # done once no window has an improving move
+            idle += 1
+            if idle >= num_windows:
+                break
+            current = (current + 1) % num_windows
+            continue
+
+        idle = 0
+        if gain >= or_move[0]:
+            tour.apply_two_opt(i, j)
+        else:
+            tour.apply_or_opt(*or_move[1:])
+        moves += 1
+    else:
+        logger.debug('Point ordering stopped by time budget (%d moves)',
+                     moves)
+
+    return tour.order
+
+
+def optimize_order(points, time_budget=1.0, start=None, neighbors=8,
+                   max_segment=3, metric='euclidean'):
+    '''Short visiting order for a set of scan points
+
+    Parameters
+    ----------
+    points : array_like
+        (N, n_axes) point positions
+    time_budget : float, optional
+        Approximate limit in seconds. If it is spent before the initial
+        nearest-neighbour path is complete, the points it has not reached
+        follow in their input order.
+    start : int, optional
+        Index of the point to visit first. If unset, the path may start
+        anywhere.
+    neighbors : int, optional
+        Number of nearest neighbours considered for each point
+    max_segment : int, optional
+        Longest segment relocated by Or-opt moves
+    metric : {'euclidean', 'chebyshev'}, optional
+        Move distance being minimized
+
+    Returns
+    -------
+    order : ndarray
+        Indices into `points`
+
+    Examples
+    --------
+    >>> x, y = spiral_fermat(5.0, 5.0, 0.1, 1)
+    >>> order = optimize_order(np.column_stack([x, y]))
+    >>> x, y = x[order], y[order]
+    '''
+    t0 = time.time()
+    points = _as_points(points)
+    if len(points) == 0:
+        return np.zeros(0, dtype=int)
+
+    candidates = nearest_neighbors(points, neighbors, metric=metric)
+    order = nearest_neighbor_order(points,
+                                   start=0 if start is None else start,
+                                   neighbors=candidates, metric=metric,
+                                   deadline=t0 + time_budget)
+
+    remaining = max(0.0, time_budget - (time.time() - t0))
+    order = improve_order(points, order, time_budget=remaining,
+                          neighbors=candidates, max_segment=max_segment,
+                          fix_start=start is not None, metric=metric)
+
+    logger.debug('Path length %g -> %g (%d points, %.3f s)',
+                 path_length(points, metric=metric),
+                 path_length(points, order, metric=metric), len(points),
+                 time.time() - t0)
+    return order
+
+
+def relative_scan_order(points, time_budget=1.0):
+    '''Short visiting order for the points of a relative scan
+
+    The path starts at the point closest to the origin (the starting
+    position of relative scans), and moves are measured with the Chebyshev
+    metric, as the axes move simultaneously.
+
+    Parameters
+    ----------
+    points : array_like
+        (N, n_axes) point positions
+    time_budget : float, optional
+
+    Returns
+    -------
+    order : ndarray
+        Indices into `points`
+    '''
+    points = _as_points(points)
+    if len(points) == 0:
+        return np.zeros(0, dtype=int)
+
+    start = int(np.argmin(np.sum(points ** 2, axis=1)))
+    return optimize_order(points, time_budget=time_budget, start=start,
+                          metric='chebyshev')
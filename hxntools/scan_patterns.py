@@ -1,3 +1,7 @@
+import numbers
+import threading
+from collections import (OrderedDict, namedtuple)
+
 import numpy as np
 
 
@@ -15,28 +19,72 @@ def spiral_simple(x_range_egu, y_range_egu, dr_egu, nth):
         Delta radius, in engineering units
     nth : float
         Number of theta steps
+
+    Returns
+    -------
+    x_points, y_points : ndarray
+        Point positions, identical to those of the scalar implementation
     """
     half_x = x_range_egu / 2
     half_y = y_range_egu / 2
 
+    rings = np.arange(1, _spiral_simple_num_rings(half_x, half_y, dr_egu))
+    return _spiral_simple_rings(rings, half_x, half_y, dr_egu, nth)
+
+
+def _spiral_simple_num_rings(half_x, half_y, dr_egu):
+    '''One past the last ring of `spiral_simple`'''
     r_max_egu = np.sqrt(half_x ** 2 + half_y ** 2)
     num_ring = 1 + int(r_max_egu / dr_egu)
+    return num_ring + 2
+
+
+def _spiral_simple_ring_counts(rings, nth):
+    counts = (rings * nth).astype(int)
+    counts[counts < 0] = 0
+    return counts
+
 
-    x_points = []
-    y_points = []
-    for i_ring in range(1, num_ring + 2):
-        radius_egu = i_ring * dr_egu
-        angle_step = 2. * np.pi / (i_ring * nth)
+def _spiral_simple_rings(rings, half_x, half_y, dr_egu, nth):
+    '''Clipped points of the given rings of `spiral_simple`'''
+    counts = _spiral_simple_ring_counts(rings, nth)
+    angle_steps = 2. * np.pi / (rings * nth)
 
-        for i_angle in range(int(i_ring * nth)):
-            angle = i_angle * angle_step
-            x_egu = radius_egu * np.cos(angle)
-            y_egu = radius_egu * np.sin(angle)
-            if abs(x_egu) <= half_x and abs(y_egu) <= half_y:
-                x_points.append(x_egu)
-                y_points.append(y_egu)
+    # index of each point within its ring
+    starts = np.cumsum(counts) - counts
+    i_angle = np.arange(counts.sum()) - np.repeat(starts, counts)
+
+    angle = i_angle * np.repeat(angle_steps, counts)
+    radius_egu = np.repeat(rings * dr_egu, counts)
+    x_egu = radius_egu * np.cos(angle)
+    y_egu = radius_egu * np.sin(angle)
+
+    mask = (np.abs(x_egu) <= half_x) & (np.abs(y_egu) <= half_y)
+    return x_egu[mask], y_egu[mask]
+
+
+def iter_spiral_simple(x_range_egu, y_range_egu, dr_egu, nth,
+                       chunk_size=65536):
+    '''`spiral_simple` points generated a group of rings at a time
+
+    Yields
+    ------
+    x_points, y_points : ndarray
+        Consecutive parts of the `spiral_simple` pattern, each computed
+        from at most about `chunk_size` candidate points
+    '''
+    half_x = x_range_egu / 2
+    half_y = y_range_egu / 2
 
-    return x_points, y_points
+    rings = np.arange(1, _spiral_simple_num_rings(half_x, half_y, dr_egu))
+    counts = _spiral_simple_ring_counts(rings, nth)
+    # group consecutive rings into chunks of about chunk_size candidates
+    group = np.cumsum(counts) // max(int(chunk_size), 1)
+    bounds = np.flatnonzero(np.diff(group)) + 1
+    for ring_group in np.split(rings, bounds):
+        if len(ring_group):
+            yield _spiral_simple_rings(ring_group, half_x, half_y, dr_egu,
+                                       nth)
 
 
 def spiral_fermat(x_range_egu, y_range_egu, dr_egu, factor):
@@ -52,24 +100,703 @@ def spiral_fermat(x_range_egu, y_range_egu, dr_egu, factor):
         Delta radius, in engineering units
     factor : float
         Radius divided by this factor
+
+    Returns
+    -------
+    x_points, y_points : ndarray
+        Point positions, identical to those of the scalar implementation
     """
+    half_x = x_range_egu / 2
+    half_y = y_range_egu / 2
+
+    num_rings = _spiral_fermat_num_rings(half_x, half_y, dr_egu, factor)
+    i_ring = np.arange(1, max(num_rings, 1))
+    return _spiral_fermat_points(i_ring, half_x, half_y, dr_egu, factor)
+
+
+def _spiral_fermat_num_rings(half_x, half_y, dr_egu, factor):
+    '''One past the last candidate point index of `spiral_fermat`'''
+    diag = np.sqrt(half_x ** 2 + half_y ** 2)
+    return int((1.5 * diag / (dr_egu / factor)) ** 2)
+
+
+def _spiral_fermat_points(i_ring, half_x, half_y, dr_egu, factor):
+    '''Clipped points of `spiral_fermat` for the given point indices'''
     phi = 137.508 * np.pi / 180.
 
+    radius_egu = np.sqrt(i_ring) * dr_egu / factor
+    angle = phi * i_ring
+    x_egu = radius_egu * np.cos(angle)
+    y_egu = radius_egu * np.sin(angle)
+
+    mask = (np.abs(x_egu) <= half_x) & (np.abs(y_egu) <= half_y)
+    return x_egu[mask], y_egu[mask]
+
+
+def iter_spiral_fermat(x_range_egu, y_range_egu, dr_egu, factor,
+                       chunk_size=65536):
+    '''`spiral_fermat` points generated `chunk_size` candidates at a time
+
+    Yields
+    ------
+    x_points, y_points : ndarray
+        Consecutive parts of the `spiral_fermat` pattern
+    '''
     half_x = x_range_egu / 2
     half_y = y_range_egu / 2
 
-    x_points, y_points = [], []
+    num_rings = _spiral_fermat_num_rings(half_x, half_y, dr_egu, factor)
+    chunk_size = max(int(chunk_size), 1)
+    for start in range(1, max(num_rings, 1), chunk_size):
+        i_ring = np.arange(start, min(start + chunk_size, num_rings))
+        yield _spiral_fermat_points(i_ring, half_x, half_y, dr_egu, factor)
+
+
+def progressive_order(points, levels=4, cell_size=None):
+    """Coarse-to-fine ordering of a 2D point set
+
+    Level 0 takes the point nearest the center of each cell of a coarse
+    grid; each following level halves the grid cell size and takes one
+    new point from every cell not yet holding a point. The last level takes
+    all remaining points. Every point is in exactly one level and the order
+    within a level follows the original order.
+
+    Parameters
+    ----------
+    points : array_like
+        (N, 2) positions
+    levels : int, optional
+        Number of levels
+    cell_size : float, optional
+        Grid cell size of the next-to-last level's refinement; defaults to
+        the mean point spacing. Level i uses ``cell_size * 2 ** (levels - 1
+        - i)``.
+
+    Returns
+    -------
+    order : ndarray
+        Indices into points, level by level
+    level_starts : ndarray
+        (levels + 1, ) offsets of each level in `order`
+    """
+    points = np.asarray(points, dtype=float)
+    num = len(points)
+    levels = max(int(levels), 1)
+    level = np.full(num, levels - 1, dtype=int)
+
+    if num and levels > 1:
+        origin = points.min(axis=0)
+        extent = points.max(axis=0) - origin
+        if cell_size is None:
+            area = np.prod(extent[extent > 0]) if np.any(extent > 0) else 1.
+            cell_size = np.sqrt(area / num)
+        cell_size = max(float(cell_size), np.finfo(float).tiny)
+
+        assigned = np.zeros(num, dtype=bool)
+        for current in range(levels - 1):
+            size = cell_size * 2 ** (levels - 1 - current)
+            cells = np.floor((points - origin) / size).astype(np.int64)
+            shape = cells.max(axis=0) + 1
+            flat = cells[:, 0] * shape[1] + cells[:, 1]
+
+            # one new point per cell without an earlier-level point
+            candidates = ~assigned & ~np.isin(flat, flat[assigned])
+            index = np.flatnonzero(candidates)
+            centers = (cells[index] + 0.5) * size + origin
+            dist = np.sum((points[index] - centers) ** 2, axis=1)
+            order = np.lexsort((dist, flat[index]))
+            _, first = np.unique(flat[index][order], return_index=True)
+            chosen = index[order[first]]
+
+            level[chosen] = current
+            assigned[chosen] = True
+
+    order = np.lexsort((np.arange(num), level))
+    counts = np.bincount(level, minlength=levels)
+    level_starts = np.concatenate([[0], np.cumsum(counts)])
+    return order, level_starts
+
+
+def spiral_fermat_progressive(x_range_egu, y_range_egu, dr_egu, factor,
+                              levels=4):
+    """Fermat spiral points ordered coarse-to-fine
+
+    The points are those of `spiral_fermat`, reordered by
+    `progressive_order` so that each level fills in the map left by the
+    previous ones.
+
+    Returns
+    -------
+    x_points, y_points : ndarray
+        Point positions
+    level_starts : ndarray
+        (levels + 1, ) offsets of each level in the points
+    """
+    x, y = spiral_fermat(x_range_egu, y_range_egu, dr_egu, factor)
+    order, level_starts = progressive_order(np.column_stack([x, y]),
+                                            levels=levels)
+    return x[order], y[order], level_starts
+
+
+PointCount = namedtuple('PointCount', 'lower estimate upper')
+
+# relative margin keeping the bounds clear of floating point rounding in the
+# point positions
+_COUNT_MARGIN = 1e-9
+
+
+def spiral_fermat_count_bounds(x_range_egu, y_range_egu, dr_egu, factor):
+    """Bounds on the number of `spiral_fermat` points, without generating
+    any
+
+    Points within the largest circle inscribed in the scan rectangle are
+    all kept, and points beyond its circumscribed circle are all dropped;
+    only those in between need checking.
+
+    Returns
+    -------
+    count : PointCount
+        (lower, estimate, upper); the estimate is based on the density of
+        the spiral, one point per pi * (dr / factor) ** 2
+    """
+    half_x = x_range_egu / 2
+    half_y = y_range_egu / 2
+    step = abs(dr_egu / factor)
+    if half_x < 0 or half_y < 0:
+        # nothing fits in a negative range
+        return PointCount(0, 0, 0)
+
+    num_rings = _spiral_fermat_num_rings(half_x, half_y, dr_egu, factor)
+    last = max(num_rings - 1, 0)
+    inner = int((min(half_x, half_y) / step) ** 2 * (1 - _COUNT_MARGIN))
+    outer = int((half_x ** 2 + half_y ** 2) / step ** 2 *
+                (1 + _COUNT_MARGIN)) + 1
+
+    lower = min(inner, last)
+    upper = min(outer, last)
+    estimate = 4 * half_x * half_y / (np.pi * step ** 2)
+    return PointCount(lower, int(round(min(max(estimate, lower), upper))),
+                      upper)
+
+
+def spiral_fermat_count(x_range_egu, y_range_egu, dr_egu, factor,
+                        chunk_size=2 ** 20):
+    """Exact number of `spiral_fermat` points
+
+    Only the points between the inscribed and circumscribed circles of the
+    scan rectangle (see `spiral_fermat_count_bounds`) are evaluated.
+    """
+    lower, _, upper = spiral_fermat_count_bounds(x_range_egu, y_range_egu,
+                                                 dr_egu, factor)
+    half_x = x_range_egu / 2
+    half_y = y_range_egu / 2
+
+    count = lower
+    if upper == 0:
+        return count
+    for start in range(lower + 1, upper + 1, chunk_size):
+        i_ring = np.arange(start, min(start + chunk_size, upper + 1))
+        x, _ = _spiral_fermat_points(i_ring, half_x, half_y, dr_egu, factor)
+        count += len(x)
+    return count
+
+
+def _spiral_simple_ring_ranges(half_x, half_y, dr_egu):
+    """Rings of `spiral_simple`: (all, fully inside, possibly clipped)"""
+    rings = np.arange(1, _spiral_simple_num_rings(half_x, half_y, dr_egu))
+    if half_x < 0 or half_y < 0:
+        # nothing fits in a negative range
+        none = np.zeros(len(rings), dtype=bool)
+        return rings, none, none
+
+    radius = rings * abs(dr_egu)
+    inside = radius <= min(half_x, half_y) * (1 - _COUNT_MARGIN)
+    outside = radius > (np.sqrt(half_x ** 2 + half_y ** 2) *
+                        (1 + _COUNT_MARGIN))
+    return rings, inside, ~inside & ~outside
+
+
+def spiral_simple_count_bounds(x_range_egu, y_range_egu, dr_egu, nth):
+    """Bounds on the number of `spiral_simple` points, without generating
+    any
+
+    Returns
+    -------
+    count : PointCount
+        (lower, estimate, upper); the estimate is based on the density of
+        the rings, nth / (2 pi dr ** 2)
+    """
+    half_x = x_range_egu / 2
+    half_y = y_range_egu / 2
+    rings, inside, partial = _spiral_simple_ring_ranges(half_x, half_y,
+                                                        dr_egu)
+    counts = _spiral_simple_ring_counts(rings, nth)
+    lower = int(counts[inside].sum())
+    upper = lower + int(counts[partial].sum())
+    estimate = (4 * abs(half_x * half_y) * nth /
+                (2 * np.pi * dr_egu ** 2))
+    return PointCount(lower, int(round(min(max(estimate, lower), upper))),
+                      upper)
+
+
+def spiral_simple_count(x_range_egu, y_range_egu, dr_egu, nth,
+                        chunk_size=2 ** 20):
+    """Exact number of `spiral_simple` points
+
+    Only rings crossing the edge of the scan rectangle are evaluated.
+    """
+    half_x = x_range_egu / 2
+    half_y = y_range_egu / 2
+    rings, inside, partial = _spiral_simple_ring_ranges(half_x, half_y,
+                                                        dr_egu)
+    counts = _spiral_simple_ring_counts(rings, nth)
+    count = int(counts[inside].sum())
+
+    partial = rings[partial]
+    group = (np.cumsum(_spiral_simple_ring_counts(partial, nth)) //
+             max(int(chunk_size), 1))
+    for ring_group in np.split(partial, np.flatnonzero(np.diff(group)) + 1):
+        if len(ring_group):
+            x, _ = _spiral_simple_rings(ring_group, half_x, half_y, dr_egu,
+                                        nth)
+            count += len(x)
+    return count
+
+
+class Pattern(object):
+    """Points generated by a registered pattern
+
+    Attributes
+    ----------
+    name : str
+        Pattern name
+    params : dict
+        Parameters the pattern was generated with
+    points : ndarray
+        (num, n_axes) point positions
+    """
+    def __init__(self, name, params, points):
+        self.name = name
+        self.params = params
+        self.points = points
+
+    @property
+    def num(self):
+        return self.points.shape[0]
+
+    @property
+    def n_axes(self):
+        return self.points.shape[1]
+
+    @property
+    def bounds(self):
+        """(minimum, maximum) position along each axis"""
+        if self.num == 0:
+            return np.full(self.n_axes, np.nan), np.full(self.n_axes, np.nan)
+        return self.points.min(axis=0), self.points.max(axis=0)
+
+    @property
+    def axes(self):
+        """Point positions, one array per axis"""
+        return [self.points[:, axis] for axis in range(self.n_axes)]
+
+    def __len__(self):
+        return self.num
+
+    def __repr__(self):
+        return ('{0.__class__.__name__}({0.name!r}, params={0.params!r}, '
+                'num={0.num})'.format(self))
+
+
+class PatternGenerator(object):
+    """A registered pattern: a function of keyword parameters returning an
+    (N, n_axes) array"""
+    def __init__(self, name, func, n_axes, defaults=None):
+        self.name = name
+        self.func = func
+        self.n_axes = n_axes
+        self.defaults = dict(defaults or {})
+        self.chunk_func = None
+        self.count_func = None
+        self.__doc__ = func.__doc__
+
+    def normalize_params(self, params):
+        """Parameters with defaults filled in"""
+        normalized = dict(self.defaults)
+        normalized.update(params)
+        return normalized
+
+    def cache_key(self, params):
+        """Hashable key of the normalized parameters, or None if any of them
+        cannot be hashed"""
+        items = []
+        for key, value in sorted(self.normalize_params(params).items()):
+            if isinstance(value, numbers.Real) and not isinstance(value,
+                                                                  bool):
+                value = float(value)
+            try:
+                hash(value)
+            except TypeError:
+                return None
+            items.append((key, value))
+        return (self.name, tuple(items))
+
+    def __call__(self, **params):
+        params = self.normalize_params(params)
+        points = np.array(self.func(**params), dtype=float)
+        points = points.reshape(-1, self.n_axes)
+        # patterns may be shared between scans (see PatternCache)
+        points.flags.writeable = False
+        return Pattern(self.name, params, points)
+
+    def _chunks(self, chunk_size, params):
+        if self.chunk_func is None:
+            points = self(**params).points
+            for start in range(0, len(points), chunk_size):
+                yield points[start:start + chunk_size]
+            return
+
+        for chunk in self.chunk_func(chunk_size=chunk_size, **params):
+            yield np.asarray(chunk, dtype=float).reshape(-1, self.n_axes)
+
+    def chunks(self, chunk_size=65536, **params):
+        """Generate the pattern in (chunk_size, n_axes) pieces
+
+        Patterns without a registered chunk generator are generated in full
+        and then split. The last chunk may be shorter.
+        """
+        params = self.normalize_params(params)
+        chunk_size = max(int(chunk_size), 1)
+        pending, num_pending = [], 0
+        for chunk in self._chunks(chunk_size, params):
+            pending.append(chunk)
+            num_pending += len(chunk)
+            if num_pending < chunk_size:
+                continue
+
+            merged = np.concatenate(pending)
+            for start in range(0, num_pending - chunk_size + 1, chunk_size):
+                yield merged[start:start + chunk_size]
+            remainder = merged[start + chunk_size:]
+            pending, num_pending = [remainder], len(remainder)
+
+        if num_pending:
+            yield np.concatenate(pending)
+
+    def count(self, **params):
+        """Number of points, computed analytically where possible"""
+        params = self.normalize_params(params)
+        if self.count_func is not None:
+            return int(self.count_func(**params))
+        return sum(len(chunk) for chunk in self._chunks(65536, params))
+
+    def __repr__(self):
+        return ('{0.__class__.__name__}({0.name!r}, n_axes={0.n_axes})'
+                ''.format(self))
+
+
+patterns = {}
+
+
+def register_pattern(name, n_axes=2, **defaults):
+    """Decorator registering a pattern generator
+
+    The function takes keyword parameters and returns an (N, n_axes) array
+    of positions.
+    """
+    def wrapper(func):
+        patterns[name] = PatternGenerator(name, func, n_axes, defaults)
+        return func
+
+    return wrapper
+
+
+def register_chunks(name):
+    """Decorator registering a chunked generator of a registered pattern
+
+    The function takes the pattern parameters and `chunk_size`, and yields
+    consecutive parts of the pattern (as (n, n_axes) arrays or per-axis
+    sequences).
+    """
+    def wrapper(func):
+        get_pattern(name).chunk_func = func
+        return func
+
+    return wrapper
+
+
+def register_count(name):
+    """Decorator registering a point count function of a registered pattern
+    """
+    def wrapper(func):
+        get_pattern(name).count_func = func
+        return func
+
+    return wrapper
+
+
+def get_pattern(name):
+    try:
+        return patterns[name]
+    except KeyError:
+        raise ValueError('Unknown scan pattern {!r}; registered patterns: {}'
+                         ''.format(name, ', '.join(sorted(patterns))))
+
+
+class PatternCache(object):
+    """Bounded LRU cache of generated patterns
+
+    Patterns are keyed by name and normalized parameters (defaults filled
+    in, numbers compared as floats). Their point arrays are read-only, so a
+    cached pattern can be shared by any number of scans.
+
+    Parameters
+    ----------
+    max_entries : int, optional
+        Maximum number of patterns kept
+    """
+    def __init__(self, max_entries=16):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def __len__(self):
+        return len(self._cache)
+
+    def peek(self, name, **params):
+        """The cached pattern, if any, without generating it"""
+        key = get_pattern(name).cache_key(params)
+        with self._lock:
+            return self._cache.get(key) if key is not None else None
+
+    def get(self, name, **params):
+        generator = get_pattern(name)
+        key = generator.cache_key(params)
+        if key is None:
+            return generator(**params)
+
+        with self._lock:
+            try:
+                pattern = self._cache.pop(key)
+            except KeyError:
+                pass
+            else:
+                self.hits += 1
+                self._cache[key] = pattern
+                return pattern
+
+        pattern = generator(**params)
+        with self._lock:
+            self.misses += 1
+            self._cache[key] = pattern
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return pattern
+
+    def __repr__(self):
+        return ('{0.__class__.__name__}(max_entries={0.max_entries}, '
+                'entries={1}, hits={0.hits}, misses={0.misses})'
+                ''.format(self, len(self._cache)))
+
+
+pattern_cache = PatternCache()
+
+
+def generate_pattern(name, **params):
+    """Generate a registered pattern, or reuse it from `pattern_cache`
+
+    The returned point arrays are read-only.
+
+    Returns
+    -------
+    pattern : Pattern
+        Points and metadata
+
+    Examples
+    --------
+    >>> pattern = generate_pattern('snake', x_range=1.0, y_range=1.0,
+    ...                            x_num=11, y_num=11)
+    >>> pattern.num, pattern.bounds
+    """
+    return pattern_cache.get(name, **params)
+
+
+def count_pattern(name, **params):
+    """Number of points of a registered pattern
+
+    Computed analytically where possible, otherwise counted chunk by chunk
+    without keeping the points.
+    """
+    pattern = pattern_cache.peek(name, **params)
+    if pattern is not None:
+        return pattern.num
+    return get_pattern(name).count(**params)
+
+
+def iter_pattern(name, chunk_size=65536, **params):
+    """Iterate over a registered pattern in (chunk_size, n_axes) pieces
+
+    Uses the cached pattern if there is one, but does not add to the cache.
+    """
+    pattern = pattern_cache.peek(name, **params)
+    if pattern is not None:
+        chunk_size = max(int(chunk_size), 1)
+        return (pattern.points[start:start + chunk_size]
+                for start in range(0, pattern.num, chunk_size))
+    return get_pattern(name).chunks(chunk_size=chunk_size, **params)
+
+
+def _grid(x_range, y_range, x_num, y_num):
+    x = np.linspace(-x_range / 2., x_range / 2., int(x_num))
+    y = np.linspace(-y_range / 2., y_range / 2., int(y_num))
+    return np.meshgrid(x, y)
+
+
+@register_pattern('raster')
+def raster(x_range, y_range, x_num, y_num):
+    """Raster grid centered on the origin, rows scanned left to right
+
+    Parameters
+    ----------
+    x_range, y_range : float
+        Extent of the grid, in engineering units
+    x_num, y_num : int
+        Number of points along each axis
+    """
+    x, y = _grid(x_range, y_range, x_num, y_num)
+    return np.column_stack([x.ravel(), y.ravel()])
+
+
+@register_pattern('snake')
+def snake(x_range, y_range, x_num, y_num):
+    """Raster grid centered on the origin, alternate rows reversed
+
+    Parameters
+    ----------
+    x_range, y_range : float
+        Extent of the grid, in engineering units
+    x_num, y_num : int
+        Number of points along each axis
+    """
+    x, y = _grid(x_range, y_range, x_num, y_num)
+    x[1::2] = x[1::2, ::-1]
+    return np.column_stack([x.ravel(), y.ravel()])
+
+
+@register_pattern('lissajous', x_freq=3, y_freq=2, phase=np.pi / 2)
+def lissajous(x_range, y_range, num, x_freq=3, y_freq=2, phase=np.pi / 2):
+    """Lissajous curve sampled at equal time steps over one period
+
+    Parameters
+    ----------
+    x_range, y_range : float
+        Extent of the curve, in engineering units
+    num : int
+        Number of points
+    x_freq, y_freq : int, optional
+        Frequencies along each axis
+    phase : float, optional
+        Phase of the x axis, in radians
+    """
+    t = np.linspace(0, 2 * np.pi, int(num), endpoint=False)
+    return np.column_stack([x_range / 2. * np.sin(x_freq * t + phase),
+                            y_range / 2. * np.sin(y_freq * t)])
+
+
+@register_pattern('rings')
+def rings(radius, num_rings, nth):
+    """Concentric rings around a center point
+
+    Parameters
+    ----------
+    radius : float
+        Radius of the outermost ring, in engineering units
+    num_rings : int
+        Number of rings (excluding the center point)
+    nth : int
+        Points in the first ring; ring i has i * nth points
+    """
+    ring = np.arange(1, int(num_rings) + 1)
+    counts = ring * int(nth)
+    starts = np.cumsum(counts) - counts
+    i_angle = np.arange(counts.sum()) - np.repeat(starts, counts)
+
+    angle = 2. * np.pi * i_angle / np.repeat(counts, counts)
+    r = np.repeat(ring * (radius / max(int(num_rings), 1)), counts)
+    points = np.column_stack([r * np.cos(angle), r * np.sin(angle)])
+    return np.concatenate([np.zeros((1, 2)), points])
+
+
+@register_pattern('spiral_simple')
+def _spiral_simple_pattern(x_range, y_range, dr, nth):
+    """Rings clipped to a rectangle; see `spiral_simple`"""
+    return np.column_stack(spiral_simple(x_range, y_range, dr, nth))
+
+
+@register_pattern('fermat')
+def _spiral_fermat_pattern(x_range, y_range, dr, factor):
+    """Fermat spiral clipped to a rectangle; see `spiral_fermat`"""
+    return np.column_stack(spiral_fermat(x_range, y_range, dr, factor))
+
+
+@register_count('raster')
+@register_count('snake')
+def _grid_count(x_range, y_range, x_num, y_num):
+    return max(int(x_num), 0) * max(int(y_num), 0)
+
+
+@register_count('lissajous')
+def _lissajous_count(x_range, y_range, num, **kwargs):
+    return max(int(num), 0)
+
+
+@register_count('rings')
+def _rings_count(radius, num_rings, nth):
+    num_rings = max(int(num_rings), 0)
+    return 1 + int(nth) * num_rings * (num_rings + 1) // 2
+
+
+@register_count('spiral_simple')
+def _spiral_simple_count(x_range, y_range, dr, nth):
+    return spiral_simple_count(x_range, y_range, dr, nth)
+
+
+@register_count('fermat')
+def _spiral_fermat_count(x_range, y_range, dr, factor):
+    return spiral_fermat_count(x_range, y_range, dr, factor)
+
+
+@register_chunks('spiral_simple')
+def _spiral_simple_chunks(x_range, y_range, dr, nth, chunk_size):
+    for chunk in iter_spiral_simple(x_range, y_range, dr, nth,
+                                    chunk_size=chunk_size):
+        yield np.column_stack(chunk)
+
+
+@register_chunks('fermat')
+def _spiral_fermat_chunks(x_range, y_range, dr, factor, chunk_size):
+    for chunk in iter_spiral_fermat(x_range, y_range, dr, factor,
+                                    chunk_size=chunk_size):
+        yield np.column_stack(chunk)
+
+
+@register_pattern('fermat_progressive', levels=4)
+def _spiral_fermat_progressive_pattern(x_range, y_range, dr, factor,
+                                       levels=4):
+    """Fermat spiral ordered coarse-to-fine; see `spiral_fermat_progressive`
+    """
+    x, y, _ = spiral_fermat_progressive(x_range, y_range, dr, factor,
+                                        levels=levels)
+    return np.column_stack([x, y])
+
+
+@register_count('fermat_progressive')
+def _spiral_fermat_progressive_count(x_range, y_range, dr, factor, levels=4):
+    return spiral_fermat_count(x_range, y_range, dr, factor)
 
-    diag = np.sqrt(half_x ** 2 + half_y ** 2)
-    num_rings = int((1.5 * diag / (dr_egu / factor)) ** 2)
-    for i_ring in range(1, num_rings):
-        radius_egu = np.sqrt(i_ring) * dr_egu / factor
-        angle = phi * i_ring
-        x_egu = radius_egu * np.cos(angle)
-        y_egu = radius_egu * np.sin(angle)
-
-        if abs(x_egu) <= half_x and abs(y_egu) <= half_y:
-            x_points.append(x_egu)
-            y_points.append(y_egu)
-
-    return x_points, y_points
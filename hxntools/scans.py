@@ -1,3 +1,4 @@
+import time
 import logging
 
 from boltons.iterutils import chunked
@@ -54,16 +55,221 @@ def scan_setup(detectors, total_points):
         yield Msg('set', det, scan_mode='step_scan', total_points=total_points)
 
 
+def _find_beam_status(detectors):
+    '''Find the beam status detector (BeamStatusDetector) in a scan'''
+    for det in detectors:
+        if hasattr(det, 'affected_points') and hasattr(det,
+                                                       'point_timestamps'):
+            return det
+
+
+class ReacquiredPoint(object):
+    '''Readable identifying the scan point a re-acquired event replaces
+
+    It is read along with the detectors when re-acquiring points, so those
+    events get their own descriptor, with the original scan index in
+    `point_index` and the re-acquisition pass (starting at 1) in
+    `rewind_pass`.
+    '''
+    def __init__(self, name='reacquired'):
+        self.name = name
+        self.point_index = None
+        self.rewind_pass = None
+
+    def read(self):
+        timestamp = time.time()
+        return {'point_index': {'value': self.point_index,
+                                'timestamp': timestamp},
+                'rewind_pass': {'value': self.rewind_pass,
+                                'timestamp': timestamp},
+                }
+
+    def describe(self):
+        return {key: {'source': 'HXN:{}'.format(self.name),
+                      'dtype': 'number',
+                      'shape': [],
+                      }
+                for key in ('point_index', 'rewind_pass')}
+
+    def __repr__(self):
+        return '{0.__class__.__name__}(name={0.name!r})'.format(self)
+
+
+class RepeatedPoints(object):
+    '''Readable summarizing the points re-acquired in a scan
+
+    Read once after re-acquisition, giving a single event (in its own
+    descriptor) with all re-acquired scan indices in `repeated_points`.
+    '''
+    def __init__(self, points, name='repeated_points'):
+        self.name = name
+        self.points = list(points)
+
+    def read(self):
+        return {'repeated_points': {'value': list(self.points),
+                                    'timestamp': time.time()}}
+
+    def describe(self):
+        return {'repeated_points': {'source': 'HXN:{}'.format(self.name),
+                                    'dtype': 'array',
+                                    'shape': [len(self.points)],
+                                    }}
+
+    def __repr__(self):
+        return ('{0.__class__.__name__}(num={1})'
+                ''.format(self, len(self.points)))
+
+
+def lookup_steps(trajectory, indices):
+    '''Positions of some points of a scan trajectory
+
+    The trajectory (e.g., a cycler or ChunkedTrajectory) is iterated over
+    once, keeping only the requested points.
+
+    Returns
+    -------
+    steps : dict
+        {index: {motor: position}}
+    '''
+    wanted = set(int(index) for index in indices)
+    steps = {}
+    if not wanted:
+        return steps
+
+    last = max(wanted)
+    for index, step in enumerate(trajectory):
+        if index in wanted:
+            steps[index] = step
+        if index >= last:
+            break
+    return steps
+
+
+def reacquire_points(detectors, steps, indices, point_info=None):
+    '''Move to and re-acquire a set of points
+
+    Triggering waits on all detectors, so with a beam status detector in the
+    scan this waits for the beam to recover before each point.
+
+    Parameters
+    ----------
+    detectors : list
+        Detectors to trigger and read
+    steps : dict or list
+        {motor: position} of (at least) the points to re-acquire, by index
+    indices : sequence of int
+        Points to re-acquire
+    point_info : ReacquiredPoint, optional
+        Read with each point, to record the index of the point re-acquired
+    '''
+    for index in indices:
+        yield Msg('checkpoint')
+        step = steps[index]
+        for motor, pos in step.items():
+            yield Msg('set', motor, pos, block_group='A')
+        yield Msg('wait', None, 'A')
+
+        yield Msg('create')
+        for det in detectors:
+            yield Msg('trigger', det, block_group='B')
+        yield Msg('wait', None, 'B')
+        readables = list(detectors) + list(step.keys())
+        if point_info is not None:
+            point_info.point_index = index
+            readables.append(point_info)
+        for obj in readables:
+            yield Msg('read', obj)
+        yield Msg('save')
+
+
 class HxnScanMixin1D:
+    # re-acquire points taken while the beam was down (requires a
+    # BeamStatusDetector in the scan detectors)
+    rewind_on_beam_loss = True
+    # maximum number of re-acquisition passes
+    max_rewinds = 3
+
     def _pre_scan(self):
         # bluesky increments the scan id by one in open_run,
         # so set it appropriately
         gs.RE.md['scan_id'] = get_next_scan_id() - 1
+        self.repeated_points = []
         if hasattr(self, '_pre_scan_calculate'):
             yield from self._pre_scan_calculate()
         yield from scan_setup(self.detectors, total_points=self.num)
         yield from super()._pre_scan()
 
+    def _post_scan(self):
+        if self.rewind_on_beam_loss:
+            yield from self._rewind_beam_loss()
+        yield from super()._post_scan()
+
+    def _rewind_beam_loss(self):
+        '''Re-acquire the points taken while the beam was down
+
+        Points re-acquired are recorded in `repeated_points`. Their events
+        are in a separate descriptor, with the index of the scan point they
+        replace in the `point_index` data key (see `ReacquiredPoint`), and
+        a final event lists all of them (see `RepeatedPoints`). Only the
+        positions of the affected points are kept.
+        '''
+        beam_status = _find_beam_status(self.detectors)
+        if beam_status is None:
+            return
+
+        exposure = getattr(self, 'exposure_time', None) or 0.0
+        point_info = ReacquiredPoint()
+        # re-acquired points are read after the scan points; map them back
+        # to their scan indices
+        point_indices = None
+        steps = None
+        checked = 0
+        for rewind in range(self.max_rewinds):
+            timestamps = beam_status.point_timestamps[checked:]
+            affected = beam_status.affected_points(timestamps,
+                                                   exposure=exposure)
+            checked += len(timestamps)
+            if not len(affected):
+                break
+
+            if point_indices is None:
+                indices = [int(i) for i in affected]
+            else:
+                indices = [point_indices[i] for i in affected]
+
+            if steps is None:
+                # later passes re-acquire a subset of these points
+                try:
+                    steps = lookup_steps(self.cycler, indices)
+                except (AttributeError, TypeError):
+                    logger.warning('Unable to rewind on beam loss: scan '
+                                   'points unavailable')
+                    return
+                indices = [index for index in indices if index in steps]
+
+            logger.warning('Beam was down for %d point(s); re-acquiring '
+                           '(pass %d of %d)', len(indices), rewind + 1,
+                           self.max_rewinds)
+            self.repeated_points.extend(indices)
+            point_indices = indices
+            point_info.rewind_pass = rewind + 1
+            yield from reacquire_points(self.detectors, steps, indices,
+                                        point_info=point_info)
+        else:
+            timestamps = beam_status.point_timestamps[checked:]
+            if len(beam_status.affected_points(timestamps,
+                                               exposure=exposure)):
+                logger.error('Beam still down after %d re-acquisition '
+                             'passes', self.max_rewinds)
+
+        if self.repeated_points:
+            logger.info('Re-acquired points: %s', self.repeated_points)
+            # the run records which points were repeated, as the stop
+            # document cannot carry it
+            yield Msg('create')
+            yield Msg('read', RepeatedPoints(self.repeated_points))
+            yield Msg('save')
+
 
 class HxnAbsScan(HxnScanMixin1D, scans.AbsScan):
     pass
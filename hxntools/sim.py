@@ -0,0 +1,332 @@
+'''Offline, in-process stand-in for the EPICS signals used by hxntools
+
+The device classes in hxntools (Zebra, Xspress3, Merlin, ANC350, ...) build
+their signals from ophyd's EpicsSignal. `simulated_epics` swaps EpicsSignal
+for `SimSignal`, backed by a `SimBackend` holding all PV values in memory,
+with configurable put latency, readback delay and failure injection::
+
+    backend = SimBackend(put_latency=0.005, readback_delay=0.01)
+    with simulated_epics(backend):
+        from hxntools.detectors import HXNZebra
+        zebra = HXNZebra('XF:03IDC-ES{Zeb:1}:', name='zebra')
+        zebra.set(scan_mode='step_scan')
+
+    print(backend.put_count)
+
+Note that module-level signals (e.g., in hxntools.scans) are created on
+import, so those modules must be first imported inside the context manager.
+'''
+import sys
+import time
+import random
+import logging
+import threading
+from collections import (Counter, defaultdict)
+from contextlib import contextmanager
+
+
+logger = logging.getLogger(__name__)
+
+
+class SimBackend(object):
+    '''In-memory PV values shared by SimSignals
+
+    Parameters
+    ----------
+    put_latency : float, optional
+        Time for a put to reach the (simulated) IOC, in seconds
+    readback_delay : float, optional
+        Additional time before the readback PV reflects a put
+    failure_rate : float, optional
+        Probability that any put raises `failure_exception`
+    failure_exception : Exception class, optional
+        Raised for randomly failed puts
+    seed : int, optional
+        Random seed for failure injection
+    '''
+    def __init__(self, put_latency=0.0, readback_delay=0.0, failure_rate=0.0,
+                 failure_exception=RuntimeError, seed=None):
+        self.put_latency = put_latency
+        self.readback_delay = readback_delay
+        self.failure_rate = failure_rate
+        self.failure_exception = failure_exception
+        self.values = {}
+        self.timestamps = {}
+        self.put_counts = Counter()
+        self._random = random.Random(seed)
+        self._failures = {}
+        self._dropped = Counter()
+        self._monitors = defaultdict(list)
+        self._on_put = defaultdict(list)
+        self._lock = threading.RLock()
+
+    @property
+    def put_count(self):
+        '''Total number of puts'''
+        return sum(self.put_counts.values())
+
+    def reset_counts(self):
+        self.put_counts.clear()
+
+    def get(self, pvname, default=0):
+        with self._lock:
+            return self.values.get(pvname, default)
+
+    def set(self, pvname, value, timestamp=None):
+        '''Set a PV value immediately, running its monitors'''
+        if timestamp is None:
+            timestamp = time.time()
+
+        with self._lock:
+            self.values[pvname] = value
+            self.timestamps[pvname] = timestamp
+            callbacks = list(self._monitors[pvname])
+
+        for callback in callbacks:
+            try:
+                callback(pvname, value, timestamp)
+            except Exception as ex:
+                logger.error('Monitor callback failed for %s', pvname,
+                             exc_info=ex)
+
+    def _set_later(self, delay, pvname, value):
+        if delay > 0:
+            timer = threading.Timer(delay, self.set, args=(pvname, value))
+            timer.daemon = True
+            timer.start()
+        else:
+            self.set(pvname, value)
+
+    def add_monitor(self, pvname, callback):
+        '''callback(pvname, value, timestamp) on every value change'''
+        with self._lock:
+            self._monitors[pvname].append(callback)
+
+    def remove_monitor(self, pvname, callback):
+        with self._lock:
+            try:
+                self._monitors[pvname].remove(callback)
+            except ValueError:
+                pass
+
+    def on_put(self, pvname, callback):
+        '''Simulate IOC logic: callback(backend, value) after each put
+
+        For example, a 'Yes' command PV setting a status PV::
+
+            backend.on_put('P:SaveYes',
+                           lambda backend, value: backend.set('P:Save_RBV', 1))
+        '''
+        self._on_put[pvname].append(callback)
+
+    def inject_failure(self, pvname, exception=None, count=1):
+        '''Make the next `count` puts to a PV raise an exception'''
+        if exception is None:
+            exception = self.failure_exception('Injected failure: {}'
+                                               ''.format(pvname))
+        self._failures[pvname] = [exception, count]
+
+    def drop_puts(self, pvname, count=1):
+        '''Silently ignore the next `count` puts to a PV'''
+        self._dropped[pvname] += count
+
+    def put(self, pvname, value, readback_pv=None, wait=False,
+            callback=None):
+        '''Put a value, updating the readback PV after readback_delay
+
+        Parameters
+        ----------
+        pvname : str
+            Setpoint PV
+        value :
+            The value
+        readback_pv : str, optional
+            Readback PV, if different from the setpoint
+        wait : bool, optional
+            Block for the put latency
+        callback : callable, optional
+            Called with no arguments once the put completes
+        '''
+        with self._lock:
+            self.put_counts[pvname] += 1
+
+            failure = self._failures.get(pvname)
+            if failure is not None:
+                failure[1] -= 1
+                if failure[1] <= 0:
+                    del self._failures[pvname]
+                raise failure[0]
+
+            if (self.failure_rate and
+                    self._random.random() < self.failure_rate):
+                raise self.failure_exception('Random put failure: {}'
+                                             ''.format(pvname))
+
+            if self._dropped[pvname] > 0:
+                self._dropped[pvname] -= 1
+                return
+
+        def complete():
+            if readback_pv is None or readback_pv == pvname:
+                self._set_later(self.readback_delay, pvname, value)
+            else:
+                self.set(pvname, value)
+                self._set_later(self.readback_delay, readback_pv, value)
+            for hook in self._on_put[pvname]:
+                hook(self, value)
+            if callback is not None:
+                callback()
+
+        if self.put_latency > 0 and not wait:
+            timer = threading.Timer(self.put_latency, complete)
+            timer.daemon = True
+            timer.start()
+        else:
+            if self.put_latency > 0:
+                time.sleep(self.put_latency)
+            complete()
+
+
+_default_backend = SimBackend()
+
+
+class SimSignal(object):
+    '''Stand-in for ophyd's EpicsSignal, backed by a SimBackend
+
+    Accepts the same construction arguments as EpicsSignal; unknown keyword
+    arguments are ignored.
+    '''
+    backend = _default_backend
+
+    def __init__(self, read_pv, write_pv=None, rw=True, string=False,
+                 name=None, alias=None, backend=None, **kwargs):
+        if backend is not None:
+            self.backend = backend
+
+        self._read_pv = read_pv
+        self._write_pv = write_pv if write_pv is not None else read_pv
+        self._rw = rw
+        self._string = string
+        self.name = name if name is not None else read_pv
+        self.alias = alias
+        self._subs = {}
+
+    @property
+    def pvname(self):
+        return self._read_pv
+
+    @property
+    def setpoint_pvname(self):
+        return self._write_pv
+
+    @property
+    def connected(self):
+        return True
+
+    def get(self, as_string=None, **kwargs):
+        value = self.backend.get(self._read_pv,
+                                 default='' if self._string else 0)
+        if as_string or (as_string is None and self._string):
+            return str(value)
+        return value
+
+    def put(self, value, wait=False, callback=None, **kwargs):
+        if not self._rw:
+            raise RuntimeError('Read-only signal: {}'.format(self.name))
+
+        self.backend.put(self._write_pv, value, readback_pv=self._read_pv,
+                         wait=wait, callback=callback)
+
+    @property
+    def value(self):
+        return self.get()
+
+    @value.setter
+    def value(self, value):
+        self.put(value)
+
+    @property
+    def timestamp(self):
+        return self.backend.timestamps.get(self._read_pv, 0.0)
+
+    def subscribe(self, cb, event_type=None, run=True):
+        def monitor(pvname, value, timestamp):
+            cb(value=value, timestamp=timestamp, obj=self)
+
+        self._subs[cb] = monitor
+        self.backend.add_monitor(self._read_pv, monitor)
+        if run:
+            cb(value=self.get(), timestamp=self.timestamp, obj=self)
+        return cb
+
+    def clear_sub(self, cb, event_type=None):
+        monitor = self._subs.pop(cb, None)
+        if monitor is not None:
+            self.backend.remove_monitor(self._read_pv, monitor)
+
+    def read(self):
+        return {self.name: {'value': self.get(),
+                            'timestamp': self.timestamp}}
+
+    def describe(self):
+        value = self.get()
+        if isinstance(value, str):
+            dtype = 'string'
+        elif hasattr(value, '__len__'):
+            dtype = 'array'
+        else:
+            dtype = 'number'
+        return {self.name: {'source': 'SIM:{}'.format(self._read_pv),
+                            'dtype': dtype,
+                            'shape': [len(value)] if dtype == 'array' else [],
+                            }}
+
+    def __repr__(self):
+        return ('{0.__class__.__name__}({0._read_pv!r}, '
+                'write_pv={0._write_pv!r})'.format(self))
+
+
+def _signal_class(backend):
+    return type('SimSignal', (SimSignal, ), {'backend': backend})
+
+
+@contextmanager
+def simulated_epics(backend=None, modules=('ophyd', 'hxntools')):
+    '''Replace EpicsSignal with SimSignal in ophyd and hxntools modules
+
+    Parameters
+    ----------
+    backend : SimBackend, optional
+        Defaults to a new SimBackend with no latency
+    modules : sequence of str, optional
+        Package prefixes of the modules to patch
+
+    Yields
+    ------
+    backend : SimBackend
+    '''
+    from ophyd.controls import EpicsSignal
+
+    if backend is None:
+        backend = SimBackend()
+
+    sim_class = _signal_class(backend)
+
+    def swap(old, new):
+        for name, module in list(sys.modules.items()):
+            if module is None:
+                continue
+            if not any(name == prefix or name.startswith(prefix + '.')
+                       for prefix in modules):
+                continue
+            if getattr(module, 'EpicsSignal', None) is old:
+                module.EpicsSignal = new
+
+    # ophyd.controls itself is patched, so modules first imported within the
+    # context pick up the simulated signal as well
+    swap(EpicsSignal, sim_class)
+    try:
+        yield backend
+    finally:
+        swap(sim_class, EpicsSignal)
+
@@ -0,0 +1,270 @@
+'''Spatial index over scan points
+
+`PointIndex` buckets points into a uniform grid, so that batched
+nearest-neighbour and radius queries only compare each query against
+points in nearby cells instead of every point::
+
+    index = PointIndex(np.column_stack([x, y]))
+    dist, idx = index.nearest(clicked_positions, k=4)
+    offsets, idx, dist = index.within(grid_positions, radius=0.05)
+'''
+import logging
+
+import numpy as np
+
+
+logger = logging.getLogger(__name__)
+
+
+class PointIndex(object):
+    '''Uniform grid index over (N, n_axes) points
+
+    Parameters
+    ----------
+    points : array_like
+        (N, n_axes) positions (or (N, ) for a single axis)
+    cell_size : float, optional
+        Grid cell size. Defaults to a size giving about `points_per_cell`
+        points per cell for uniformly spread points.
+    points_per_cell : float, optional
+    max_candidates : int, optional
+        Approximate number of candidate pairs compared per batch; bounds
+        memory use of queries
+    '''
+    def __init__(self, points, cell_size=None, points_per_cell=2.0,
+                 max_candidates=2 ** 22):
+        points = np.asarray(points, dtype=float)
+        if points.ndim == 1:
+            points = points[:, np.newaxis]
+        if points.ndim != 2:
+            raise ValueError('Expected an (N, n_axes) array of points')
+
+        self.points = points
+        self.max_candidates = int(max_candidates)
+        num, n_axes = points.shape
+
+        if num:
+            self.origin = points.min(axis=0)
+            extent = points.max(axis=0) - self.origin
+        else:
+            self.origin = np.zeros(n_axes)
+            extent = np.zeros(n_axes)
+
+        if cell_size is None:
+            positive = extent[extent > 0]
+            if len(positive) and num:
+                volume = np.prod(positive)
+                cell_size = (volume * points_per_cell /
+                             num) ** (1. / len(positive))
+            else:
+                cell_size = 1.0
+
+        # keep the number of cells on the order of the number of points
+        while np.prod(np.floor(extent / cell_size) + 1) > 4 * max(num, 1):
+            cell_size *= 2
+
+        self.cell_size = float(cell_size)
+        self.shape = tuple(int(n) for n in np.floor(extent / cell_size) + 1)
+
+        cells = self._flat_cells(self._cells(points))
+        self._order = np.argsort(cells, kind='stable')
+        counts = np.bincount(cells, minlength=int(np.prod(self.shape)))
+        self._cell_count = counts
+        self._cell_start = np.cumsum(counts) - counts
+
+    def __len__(self):
+        return len(self.points)
+
+    @property
+    def n_axes(self):
+        return self.points.shape[1]
+
+    def _cells(self, positions):
+        return np.floor((positions - self.origin) /
+                        self.cell_size).astype(int)
+
+    def _query_cells(self, positions):
+        # queries outside the grid search from the nearest cell in the grid
+        return np.clip(self._cells(positions), 0, np.array(self.shape) - 1)
+
+    def _covered_radius(self, positions, reach):
+        '''Radius around each query within which all points are in the
+        cells searched at the given reach'''
+        cells = self._query_cells(positions)
+        low = self.origin + (cells - reach) * self.cell_size
+        high = self.origin + (cells + reach + 1) * self.cell_size
+        # searching beyond the edge of the grid covers everything there
+        low = np.where(cells - reach <= 0, -np.inf, low)
+        high = np.where(cells + reach >= np.array(self.shape) - 1, np.inf,
+                        high)
+        return np.min(np.minimum(positions - low, high - positions), axis=1)
+
+    def _flat_cells(self, cells):
+        return np.ravel_multi_index(tuple(cells.T), self.shape, mode='clip')
+
+    def _as_queries(self, positions):
+        positions = np.asarray(positions, dtype=float)
+        single = (positions.ndim == 1 and self.n_axes > 1)
+        positions = positions.reshape(-1, self.n_axes)
+        return positions, single
+
+    def _candidates(self, positions, reach):
+        '''Pairs of (query, point) in cells within `reach` cells of each
+        query, as (query indices, point indices)'''
+        steps = np.arange(-reach, reach + 1)
+        offsets = np.stack(np.meshgrid(*([steps] * self.n_axes),
+                                       indexing='ij'),
+                           axis=-1).reshape(-1, self.n_axes)
+
+        cells = self._query_cells(positions)[:, np.newaxis, :] + offsets
+        valid = np.all((cells >= 0) & (cells < self.shape), axis=-1)
+        flat = self._flat_cells(cells.reshape(-1, self.n_axes))
+        counts = np.where(valid.ravel(), self._cell_count[flat], 0)
+        starts = self._cell_start[flat]
+
+        total = counts.sum()
+        query = np.repeat(np.arange(len(positions)), offsets.shape[0])
+        query = np.repeat(query, counts)
+        # position of each candidate within its cell
+        within = np.arange(total) - np.repeat(np.cumsum(counts) - counts,
+                                              counts)
+        point = self._order[np.repeat(starts, counts) + within]
+        return query, point
+
+    @staticmethod
+    def _group_sort(query, dist, num_queries):
+        '''Sort candidates (grouped by query) by distance within each group
+
+        Returns the sorting order, the size of each group and the rank of
+        each sorted candidate within its group.
+        '''
+        counts = np.bincount(query, minlength=num_queries)
+        starts = np.cumsum(counts) - counts
+        rank = np.arange(len(query)) - np.repeat(starts, counts)
+        width = counts.max() if len(counts) else 0
+
+        # sorting short rows of a padded array is much faster than a
+        # lexicographic sort of all candidates
+        padded = np.full((num_queries, width), np.inf)
+        padded[query, rank] = dist
+        columns = np.argsort(padded, axis=1)
+        valid = np.arange(width) < counts[:, np.newaxis]
+        order = (starts[:, np.newaxis] + columns)[valid]
+        return order, counts, rank
+
+    def _batches(self, num, reach):
+        '''Query slices sized to bound the number of candidate pairs'''
+        per_query = ((2 * reach + 1) ** self.n_axes *
+                     max(1.0, len(self.points) / max(len(self._cell_count),
+                                                     1)))
+        batch = max(1, int(self.max_candidates // per_query))
+        for start in range(0, num, batch):
+            yield slice(start, min(start + batch, num))
+
+    def within(self, positions, radius):
+        '''Points within `radius` of each query position
+
+        Parameters
+        ----------
+        positions : array_like
+            (M, n_axes) query positions
+        radius : float
+
+        Returns
+        -------
+        offsets : ndarray
+            (M + 1, ) offsets; the matches of query i are
+            ``indices[offsets[i]:offsets[i + 1]]``
+        indices : ndarray
+            Point indices, sorted by distance for each query
+        distances : ndarray
+            Corresponding distances
+        '''
+        positions, _ = self._as_queries(positions)
+        reach = int(np.ceil(radius / self.cell_size))
+        counts = np.zeros(len(positions), dtype=int)
+        indices, distances = [], []
+        for sl in self._batches(len(positions), reach):
+            query, point = self._candidates(positions[sl], reach)
+            dist = np.sqrt(np.sum((self.points[point] -
+                                   positions[sl][query]) ** 2, axis=1))
+            keep = dist <= radius
+            query, point, dist = query[keep], point[keep], dist[keep]
+            order, counts[sl], _ = self._group_sort(query, dist,
+                                                    sl.stop - sl.start)
+            indices.append(point[order])
+            distances.append(dist[order])
+
+        offsets = np.concatenate([[0], np.cumsum(counts)])
+        if not indices:
+            return offsets, np.zeros(0, dtype=int), np.zeros(0)
+        return offsets, np.concatenate(indices), np.concatenate(distances)
+
+    def count_within(self, positions, radius):
+        '''Number of points within `radius` of each query position'''
+        offsets, _, _ = self.within(positions, radius)
+        return np.diff(offsets)
+
+    def nearest(self, positions, k=1):
+        '''The k nearest points to each query position
+
+        Parameters
+        ----------
+        positions : array_like
+            (M, n_axes) query positions, or a single position
+        k : int, optional
+
+        Returns
+        -------
+        distances : ndarray
+            (M, k) distances, sorted (or (k, ) for a single position)
+        indices : ndarray
+            (M, k) point indices. If there are fewer than k points, missing
+            entries have index -1 and distance inf.
+        '''
+        positions, single = self._as_queries(positions)
+        num = len(positions)
+        k = int(k)
+        distances = np.full((num, k), np.inf)
+        indices = np.full((num, k), -1, dtype=int)
+
+        npoints = len(self.points)
+        if npoints and num:
+            found = min(k, npoints)
+            # start with a reach expected to hold k points, growing it for
+            # the queries that did not find enough
+            density = npoints / max(len(self._cell_count), 1)
+            reach = max(1, int(np.ceil(((found / density) **
+                                        (1. / self.n_axes) - 1) / 2)))
+            pending = np.arange(num)
+            while len(pending):
+                for sl in self._batches(len(pending), reach):
+                    queries = pending[sl]
+                    query, point = self._candidates(positions[queries],
+                                                    reach)
+                    dist = np.sqrt(np.sum((self.points[point] -
+                                           positions[queries][query]) ** 2,
+                                          axis=1))
+                    order, _, rank = self._group_sort(query, dist,
+                                                      len(queries))
+                    # query is unchanged by the sort within groups
+                    point, dist = point[order], dist[order]
+                    take = rank < k
+                    distances[queries[query[take]], rank[take]] = dist[take]
+                    indices[queries[query[take]], rank[take]] = point[take]
+
+                # results are only exact when the k-th neighbour lies within
+                # the region fully covered by the searched cells
+                kth = distances[pending, found - 1]
+                done = kth <= self._covered_radius(positions[pending], reach)
+                pending = pending[~done]
+                reach *= 2
+
+        if single:
+            return distances[0], indices[0]
+        return distances, indices
+
+    def __repr__(self):
+        return ('{0.__class__.__name__}(num={1}, n_axes={0.n_axes}, '
+                'cell_size={0.cell_size:g}, shape={0.shape})'
+                ''.format(self, len(self.points)))
@@ -8,7 +8,9 @@ from bluesky.simple_scans import (_BundledScan, _set_acquire_time,
                                   _unset_acquire_time)
 from bluesky.utils import DefaultSubs
 from .scans import HxnScanMixin1D
-from .scan_patterns import spiral_fermat
+from .scan_patterns import (get_pattern, generate_pattern, iter_pattern,
+                            count_pattern, spiral_fermat_progressive)
+from .scan_ordering import relative_scan_order
 
 from collections import defaultdict
 from cycler import cycler
@@ -16,6 +18,50 @@ from cycler import cycler
 logger = logging.getLogger(__name__)
 
 
+class ChunkedTrajectory(object):
+    """Lazy, cycler-like trajectory generated a chunk of points at a time
+
+    Iterating yields {motor: position} dictionaries, as iterating over a
+    cycler does.
+
+    Parameters
+    ----------
+    motors : list
+        Motors, in the order of the positions in each chunk
+    chunks : callable
+        Returns an iterable of chunks, each a list of position arrays (one
+        per motor). Called for every iteration over the trajectory.
+    num : int
+        Total number of points
+    offsets : dict, optional
+        Offset added to the positions of each motor
+    """
+    def __init__(self, motors, chunks, num, offsets=None):
+        self.motors = list(motors)
+        self.chunks = chunks
+        self.num = int(num)
+        self.offsets = offsets if offsets is not None else {}
+
+    @property
+    def keys(self):
+        return set(self.motors)
+
+    def __len__(self):
+        return self.num
+
+    def __iter__(self):
+        for chunk in self.chunks():
+            positions = [np.asarray(m_points) + self.offsets.get(motor, 0.0)
+                         for motor, m_points in zip(self.motors, chunk)]
+            for values in zip(*positions):
+                yield dict(zip(self.motors, values))
+
+    def __repr__(self):
+        return ('{0.__class__.__name__}(motors={1}, num={0.num})'
+                ''.format(self, [getattr(motor, 'name', motor)
+                                 for motor in self.motors]))
+
+
 class MultipleMotorPlan(scans.ScanND):
     """Scan over multi-motor trajectory
 
@@ -27,13 +73,28 @@ class MultipleMotorPlan(scans.ScanND):
         (m1, m2, ...)
     point_args : list
         List of arguments used to generate the points for the scan
+    reorder : bool, optional
+        Reorder the points to minimize the total travel of the motors
+    reorder_time : float, optional
+        Time budget for reordering, in seconds
+    chunk_size : int, optional
+        Generate and step through the points this many at a time instead of
+        building the whole trajectory up front (for very large patterns).
+        Re-acquiring points after beam loss (see `HxnScanMixin1D`) iterates
+        over the chunks again, keeping only the affected points. Not
+        compatible with reorder.
     """
-    _fields = ['detectors', 'motors', 'point_args']
+    _fields = ['detectors', 'motors', 'point_args', 'reorder']
 
-    def __init__(self, detectors, motors, point_args):
+    def __init__(self, detectors, motors, point_args, reorder=False,
+                 reorder_time=1.0, chunk_size=None):
         self.detectors = detectors
         self.point_args = list(point_args)
         self.num = None
+        self.reorder = reorder
+        self.reorder_time = reorder_time
+        self.point_order = None
+        self.chunk_size = chunk_size
 
         self._motors = list(motors)
         # the (non-private) .motors attribute is used by subscriptions and
@@ -47,7 +108,21 @@ class MultipleMotorPlan(scans.ScanND):
         # Called by HxnScanMixin1D - if in _pre_scan instead,
         # the order of operations is wrong and num will be None
         # when detectors are configured.
+        if self.chunk_size:
+            if self.reorder:
+                raise ValueError('Reordering requires all points; it cannot '
+                                 'be used with chunk_size')
+            self.points = None
+            self.cycler = ChunkedTrajectory(self._motors, self._iter_chunks,
+                                            self.count_points(
+                                                *self.point_args),
+                                            offsets=self._offsets)
+            self.num = len(self.cycler)
+            return
+
         self.points = self.get_points(*self.point_args)
+        if self.reorder:
+            self.points = self.reorder_points(self.points)
 
         self.cycler = None
         for motor, m_points in zip(self._motors, self.points):
@@ -60,6 +135,45 @@ class MultipleMotorPlan(scans.ScanND):
 
         self.num = len(self.cycler)
 
+    def reorder_points(self, points):
+        '''Reorder points to minimize motor travel
+
+        The path starts at the point closest to the origin (the starting
+        position of relative scans). The order relative to `get_points` is
+        kept in `point_order`.
+        '''
+        positions = np.column_stack([np.asarray(m_points, dtype=float)
+                                     for m_points in points])
+        if len(positions) == 0:
+            return points
+
+        self.point_order = relative_scan_order(positions,
+                                               time_budget=self.reorder_time)
+        return [np.asarray(m_points)[self.point_order] for m_points in points]
+
+    def get_point_args(self):
+        '''Arguments of `get_points` for the plan's current settings'''
+        return list(self.point_args)
+
+    def _iter_chunks(self):
+        return self.iter_points(*self.point_args, chunk_size=self.chunk_size)
+
+    def iter_points(self, *args, chunk_size=65536):
+        '''Points in chunks of `chunk_size`, in the format of `get_points`
+
+        Subclasses that can generate their points incrementally should
+        override this; by default the points are generated in full and
+        split.
+        '''
+        points = [np.asarray(m_points) for m_points in self.get_points(*args)]
+        num = len(points[0]) if points else 0
+        for start in range(0, num, chunk_size):
+            yield [m_points[start:start + chunk_size] for m_points in points]
+
+    def count_points(self, *args):
+        '''Number of points, without keeping them where possible'''
+        return sum(len(chunk[0]) for chunk in self.iter_points(*args))
+
     def get_points(self, *args):
         '''
         Returns
@@ -138,6 +252,8 @@ class HxnFermatPlan(HxnScanMixin1D, MultipleMotorDeltaPlan):
         delta radius
     factor : float
         radius gets divided by this
+    reorder : bool, optional
+        Reorder the points to minimize the total travel of the motors
 
     Examples
     --------
@@ -168,8 +284,216 @@ class HxnFermatPlan(HxnScanMixin1D, MultipleMotorDeltaPlan):
         self.factor = factor
         self.exposure_time = time
 
+    @asyncio.coroutine
+    def _pre_scan_calculate(self):
+        # pick up parameter changes between runs
+        self.point_args = self.get_point_args()
+        yield from super()._pre_scan_calculate()
+
+    def get_point_args(self):
+        return [self.x_range, self.y_range, self.dr, self.factor]
+
     def get_points(self, x_range, y_range, dr, factor):
-        return spiral_fermat(x_range, y_range, dr, factor)
+        return generate_pattern('fermat', x_range=x_range, y_range=y_range,
+                                dr=dr, factor=factor).axes
+
+    def iter_points(self, x_range, y_range, dr, factor, chunk_size=65536):
+        for chunk in iter_pattern('fermat', chunk_size=chunk_size,
+                                  x_range=x_range, y_range=y_range, dr=dr,
+                                  factor=factor):
+            yield list(chunk.T)
+
+    def count_points(self, x_range, y_range, dr, factor):
+        return count_pattern('fermat', x_range=x_range, y_range=y_range,
+                             dr=dr, factor=factor)
+
+
+class HxnProgressiveFermatPlan(HxnFermatPlan):
+    """Relative fermat spiral scan, measured coarse-to-fine
+
+    The points of the fermat spiral are measured in levels of increasing
+    density (see `scan_patterns.progressive_order`): the first levels give
+    an overview map after a fraction of the scan, and each point is
+    measured once. The scan can end early at a level boundary.
+
+    Parameters
+    ----------
+    detectors : list
+        list of 'readable' objects
+    x_motor : object
+        any 'setable' object (motor, temp controller, etc.)
+    y_motor : object
+        any 'setable' object (motor, temp controller, etc.)
+    x_range : float
+        x range of spiral
+    y_range : float
+        y range of spiral
+    dr : float
+        delta radius
+    factor : float
+        radius gets divided by this
+    time : float
+        exposure time
+    levels : int, optional
+        Number of density levels
+    stop_after_level : int, optional
+        Last level to measure; the scan then has only the points of the
+        levels up to it
+
+    Examples
+    --------
+
+    >>> my_plan = HxnProgressiveFermatPlan([det1], motor1, motor2, 1., 1.,
+    ...                                    .1, 10, 0.1, levels=4)
+    >>> RE(my_plan)
+    # From another thread, when the map is good enough:
+    >>> my_plan.request_stop()
+    """
+    _fields = HxnFermatPlan._fields + ['levels', 'stop_after_level']
+
+    def __init__(self, detectors, x_motor, y_motor, x_range, y_range, dr,
+                 factor, time, levels=4, stop_after_level=None, **kwargs):
+        super().__init__(detectors, x_motor, y_motor, x_range, y_range, dr,
+                         factor, time, **kwargs)
+        self.levels = levels
+        self.stop_after_level = stop_after_level
+        self.level_starts = None
+        self.current_level = None
+        self._stop_requested = False
+        self._last_level = None
+
+    @asyncio.coroutine
+    def _pre_scan_calculate(self):
+        if self.reorder or self.chunk_size:
+            raise ValueError('Progressive scans do not support reorder or '
+                             'chunk_size')
+
+        self.current_level = None
+        self._stop_requested = False
+        self._last_level = None
+        self.points, self.level_starts = self.get_level_points(
+            *self.point_args)
+        self.num = len(self.points[0])
+        self.cycler = ChunkedTrajectory(self._motors, self._iter_levels,
+                                        self.num, offsets=self._offsets)
+
+    def get_level_points(self, x_range, y_range, dr, factor):
+        '''Points of the levels to be measured, with the offset of each level
+
+        Returns
+        -------
+        points : list
+            [x, y], in the format of `get_points`
+        level_starts : ndarray
+            Offsets of each level in the points, ending with the number of
+            points
+        '''
+        x, y, level_starts = spiral_fermat_progressive(
+            x_range, y_range, dr, factor, levels=self.levels)
+        if self.stop_after_level is not None:
+            # the number of points measured is known up front
+            last_level = min(max(int(self.stop_after_level), 0),
+                             len(level_starts) - 2)
+            level_starts = level_starts[:last_level + 2]
+            x, y = x[:level_starts[-1]], y[:level_starts[-1]]
+        return [x, y], level_starts
+
+    def get_points(self, x_range, y_range, dr, factor):
+        points, _ = self.get_level_points(x_range, y_range, dr, factor)
+        return points
+
+    def request_stop(self):
+        '''End the scan once the current level is complete'''
+        self._stop_requested = True
+
+    def _iter_levels(self):
+        starts = self.level_starts
+        num_levels = len(starts) - 1
+        for level in range(num_levels):
+            if self._last_level is not None:
+                # the levels were decided on the first pass; later passes
+                # (e.g., re-acquiring points after beam loss) must match
+                if level > self._last_level:
+                    return
+            elif level > 0 and (self._stop_requested or
+                                (self.stop_after_level is not None and
+                                 level > self.stop_after_level)):
+                self._last_level = level - 1
+                logger.info('Progressive scan stopped after level %d '
+                            '(%d of %d points)', level - 1, starts[level],
+                            starts[-1])
+                return
+
+            self.current_level = level
+            logger.debug('Progressive scan level %d: points %d-%d',
+                         level, starts[level], starts[level + 1])
+            yield [m_points[starts[level]:starts[level + 1]]
+                   for m_points in self.points]
+
+        if self._last_level is None:
+            self._last_level = num_levels - 1
+
+
+class HxnPatternPlan(HxnScanMixin1D, MultipleMotorDeltaPlan):
+    """Relative scan over any registered scan pattern
+
+    Parameters
+    ----------
+    detectors : list
+        list of 'readable' objects
+    motors : list
+        'setable' objects, one per pattern axis
+    pattern : str
+        Name of a pattern registered in `scan_patterns.patterns`
+    params : dict
+        Pattern parameters
+    time : float
+        exposure time
+
+    Examples
+    --------
+
+    >>> my_plan = HxnPatternPlan([det1], [motor1, motor2], 'snake',
+    ...                          dict(x_range=1., y_range=1., x_num=11,
+    ...                               y_num=11), 0.1)
+    >>> RE(my_plan)
+    """
+    _fields = MultipleMotorPlan._fields + ['pattern', 'params',
+                                           'exposure_time']
+
+    def __init__(self, detectors, motors, pattern, params, time, **kwargs):
+        generator = get_pattern(pattern)
+        if len(motors) != generator.n_axes:
+            raise ValueError('Pattern {!r} requires {} motors (got {})'
+                             ''.format(pattern, generator.n_axes,
+                                       len(motors)))
+
+        point_args = [pattern, params]
+        super().__init__(detectors, motors, point_args, **kwargs)
+        self.setup_attrs()
+
+        self.pattern = pattern
+        self.params = dict(params)
+        self.exposure_time = time
+
+    @asyncio.coroutine
+    def _pre_scan_calculate(self):
+        # pick up changes to the pattern or its parameters between runs
+        self.point_args = self.get_point_args()
+        yield from super()._pre_scan_calculate()
+
+    def get_point_args(self):
+        return [self.pattern, self.params]
+
+    def get_points(self, pattern, params):
+        return generate_pattern(pattern, **params).axes
+
+    def iter_points(self, pattern, params, chunk_size=65536):
+        for chunk in iter_pattern(pattern, chunk_size=chunk_size, **params):
+            yield list(chunk.T)
+
+    def count_points(self, pattern, params):
+        return count_pattern(pattern, **params)
 
 
 class HxnFermatScan(_BundledScan):
@@ -211,3 +535,18 @@ class HxnFermatScan(_BundledScan):
                                   time, **kwargs)
         _unset_acquire_time(original_times)
         return result
+
+
+class HxnProgressiveFermatScan(HxnFermatScan):
+    """Relative fermat spiral scan, measured coarse-to-fine
+
+    Takes the arguments of `HxnFermatScan`, plus the `levels` and
+    `stop_after_level` keyword arguments of `HxnProgressiveFermatPlan`.
+
+    Examples
+    --------
+
+    >>> progressive_fermat(motor1, motor2, 1.0, 1.0, 0.1, 10, time=0.1,
+    ...                    levels=4)
+    """
+    scan_class = HxnProgressiveFermatPlan
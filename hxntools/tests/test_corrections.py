@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('filestore')
+
+from hxntools.handlers.corrections import (FrameCorrector, ReferenceCache,
+                                           average_frames)
+
+
+@pytest.fixture
+def references():
+    rs = np.random.RandomState(0)
+    dark = rs.uniform(0, 10, size=(32, 40))
+    flat = rs.uniform(50, 150, size=(32, 40))
+    mask = rs.uniform(size=(32, 40)) < 0.05
+    frames = rs.uniform(0, 1000, size=(5, 32, 40))
+    return dark, flat, mask, frames
+
+
+def naive_correction(frames, dark=None, flat=None, mask=None,
+                     fill_value=0.0):
+    frames = np.array(frames, dtype=np.float64)
+    if dark is None:
+        dark = 0.0
+    out = frames - dark
+    bad = np.zeros(frames.shape[-2:], dtype=bool)
+    if flat is not None:
+        flat = flat - dark
+        bad = ~(flat > 0)
+        if mask is not None:
+            bad |= mask
+        out = out / flat * np.mean(flat[~bad])
+    elif mask is not None:
+        bad = mask
+    out[..., bad] = fill_value
+    return out
+
+
+@pytest.mark.parametrize('use_dark', [False, True])
+@pytest.mark.parametrize('use_flat', [False, True])
+@pytest.mark.parametrize('use_mask', [False, True])
+@pytest.mark.parametrize('fill_value', [0.0, -1.0])
+def test_matches_naive_correction(references, use_dark, use_flat, use_mask,
+                                  fill_value):
+    dark, flat, mask, frames = references
+    kwargs = dict(dark=dark if use_dark else None,
+                  flat=flat if use_flat else None,
+                  mask=mask if use_mask else None)
+    corrector = FrameCorrector(fill_value=fill_value, **kwargs)
+    expected = naive_correction(frames, fill_value=fill_value, **kwargs)
+    np.testing.assert_allclose(corrector.apply(frames), expected,
+                               rtol=1e-5, atol=1e-3)
+    # single frames, and in place
+    np.testing.assert_allclose(corrector(frames[0]), expected[0], rtol=1e-5,
+                               atol=1e-3)
+    inplace = frames.astype(np.float32)
+    assert corrector.apply(inplace) is inplace
+    np.testing.assert_allclose(inplace, expected, rtol=1e-5, atol=1e-3)
+
+
+def test_non_contiguous_and_cropped(references):
+    dark, flat, mask, frames = references
+    corrector = FrameCorrector(dark=dark, flat=flat, mask=mask)
+    expected = naive_correction(frames, dark, flat, mask)
+
+    np.testing.assert_allclose(corrector.apply(np.asfortranarray(frames)),
+                               expected, rtol=1e-5, atol=1e-3)
+
+    cropped = corrector.cropped((4, 20, 5, 30))
+    np.testing.assert_allclose(cropped.apply(frames[:, 4:20, 5:30]),
+                               expected[:, 4:20, 5:30], rtol=1e-5, atol=1e-3)
+    with pytest.raises(ValueError):
+        corrector.apply(frames[:, 4:20, 5:30])
+
+
+def test_reference_cache():
+    cache = ReferenceCache(max_entries=2)
+    loads = []
+
+    def loader():
+        loads.append(1)
+        return (np.full((2, 2), i) for i in range(3))
+
+    ref = cache.get('dark', {'acquire_time': 0.1}, loader)
+    np.testing.assert_array_equal(ref, average_frames(
+        np.full((2, 2), i) for i in range(3)))
+    cache.get('dark', {'acquire_time': 0.1 + 1e-12}, loader)
+    assert len(loads) == 1
+    cache.get('dark', {'acquire_time': 0.2}, loader)
+    cache.get('flat', {'acquire_time': 0.2}, loader)
+    assert len(cache) == 2 and len(loads) == 3
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('scipy')
+
+from hxntools.scan_ordering import (optimize_order, relative_scan_order,
+                                    nearest_neighbor_order, path_length)
+from hxntools.scan_patterns import spiral_fermat
+
+
+def _is_permutation(order, num):
+    return np.array_equal(np.sort(order), np.arange(num))
+
+
+@pytest.mark.parametrize('num', [0, 1, 2, 3, 10, 200])
+@pytest.mark.parametrize('metric', ['euclidean', 'chebyshev'])
+def test_optimize_order_permutation(num, metric):
+    points = np.random.RandomState(num).uniform(size=(num, 2))
+    order = optimize_order(points, time_budget=0.5, metric=metric)
+    assert _is_permutation(order, num)
+    if num:
+        nn_order = nearest_neighbor_order(points, metric=metric)
+        assert (path_length(points, order, metric=metric) <=
+                path_length(points, nn_order, metric=metric) + 1e-9)
+
+
+def test_optimize_order_start_and_duplicates():
+    points = np.random.RandomState(0).uniform(size=(100, 2))
+    points[10:20] = points[0]
+    order = optimize_order(points, time_budget=0.5, start=42)
+    assert _is_permutation(order, len(points))
+    assert order[0] == 42
+
+
+def test_optimize_order_out_of_time():
+    # with no time to spare, the partial path still starts at `start`
+    points = np.random.RandomState(0).uniform(size=(5000, 2))
+    order = optimize_order(points, time_budget=0.0, start=7)
+    assert _is_permutation(order, len(points))
+    assert order[0] == 7
+
+
+def test_relative_scan_order():
+    x, y = spiral_fermat(2., 2., 0.1, 1)
+    points = np.column_stack([x, y]) + 0.05
+    order = relative_scan_order(points, time_budget=0.5)
+    assert _is_permutation(order, len(points))
+    assert order[0] == np.argmin(np.sum(points ** 2, axis=1))
+    assert (path_length(points, order, metric='chebyshev') <
+            path_length(points, metric='chebyshev'))
@@ -0,0 +1,161 @@
+import numpy as np
+import pytest
+
+from hxntools.scan_patterns import (spiral_simple, spiral_fermat,
+                                    iter_spiral_simple, iter_spiral_fermat,
+                                    spiral_simple_count, spiral_fermat_count,
+                                    spiral_simple_count_bounds,
+                                    spiral_fermat_count_bounds,
+                                    progressive_order,
+                                    spiral_fermat_progressive)
+
+
+def spiral_simple_loop(x_range_egu, y_range_egu, dr_egu, nth):
+    """
+    Scalar reference implementation of `spiral_simple`
+
+    Parameters
+    ----------
+    x_range_egu : float
+        X range, in engineering units
+    y_range_egu : float
+        Y range, in engineering units
+    dr_egu : float
+        Delta radius, in engineering units
+    nth : float
+        Number of theta steps
+    """
+    half_x = x_range_egu / 2
+    half_y = y_range_egu / 2
+
+    r_max_egu = np.sqrt(half_x ** 2 + half_y ** 2)
+    num_ring = 1 + int(r_max_egu / dr_egu)
+
+    x_points = []
+    y_points = []
+    for i_ring in range(1, num_ring + 2):
+        radius_egu = i_ring * dr_egu
+        angle_step = 2. * np.pi / (i_ring * nth)
+
+        for i_angle in range(int(i_ring * nth)):
+            angle = i_angle * angle_step
+            x_egu = radius_egu * np.cos(angle)
+            y_egu = radius_egu * np.sin(angle)
+            if abs(x_egu) <= half_x and abs(y_egu) <= half_y:
+                x_points.append(x_egu)
+                y_points.append(y_egu)
+
+    return x_points, y_points
+
+
+def spiral_fermat_loop(x_range_egu, y_range_egu, dr_egu, factor):
+    """Scalar reference implementation of `spiral_fermat`
+
+    Parameters
+    ----------
+    x_range_egu : float
+        X range, in engineering units
+    y_range_egu : float
+        Y range, in engineering units
+    dr_egu : float
+        Delta radius, in engineering units
+    factor : float
+        Radius divided by this factor
+    """
+    phi = 137.508 * np.pi / 180.
+
+    half_x = x_range_egu / 2
+    half_y = y_range_egu / 2
+
+    x_points, y_points = [], []
+
+    diag = np.sqrt(half_x ** 2 + half_y ** 2)
+    num_rings = int((1.5 * diag / (dr_egu / factor)) ** 2)
+    for i_ring in range(1, num_rings):
+        radius_egu = np.sqrt(i_ring) * dr_egu / factor
+        angle = phi * i_ring
+        x_egu = radius_egu * np.cos(angle)
+        y_egu = radius_egu * np.sin(angle)
+
+        if abs(x_egu) <= half_x and abs(y_egu) <= half_y:
+            x_points.append(x_egu)
+            y_points.append(y_egu)
+
+    return x_points, y_points
+
+
+simple_args = [(10., 10., 0.05, 5), (3., 7., 0.3, 3), (2., 1., 0.1, 2.5)]
+fermat_args = [(10., 10., 0.1, 1), (3., 7., 0.3, 2), (1., 1., 0.01, 1)]
+
+
+@pytest.mark.parametrize('args', simple_args)
+def test_spiral_simple_matches_loop(args):
+    x, y = spiral_simple(*args)
+    x_ref, y_ref = spiral_simple_loop(*args)
+    np.testing.assert_array_equal(x, x_ref)
+    np.testing.assert_array_equal(y, y_ref)
+
+
+@pytest.mark.parametrize('args', fermat_args)
+def test_spiral_fermat_matches_loop(args):
+    x, y = spiral_fermat(*args)
+    x_ref, y_ref = spiral_fermat_loop(*args)
+    np.testing.assert_array_equal(x, x_ref)
+    np.testing.assert_array_equal(y, y_ref)
+
+
+@pytest.mark.parametrize('func, iter_func, args',
+                         [(spiral_simple, iter_spiral_simple, simple_args[0]),
+                          (spiral_fermat, iter_spiral_fermat, fermat_args[0])])
+def test_chunks_match_pattern(func, iter_func, args):
+    x, y = func(*args)
+    chunks = list(iter_func(*args, chunk_size=100))
+    assert len(chunks) > 1
+    np.testing.assert_array_equal(np.concatenate([c[0] for c in chunks]), x)
+    np.testing.assert_array_equal(np.concatenate([c[1] for c in chunks]), y)
+
+
+@pytest.mark.parametrize('args', simple_args + [(0., 0., 0.1, 5),
+                                                (1., 1., 2., 5),
+                                                (4., 0.5, 0.07, 7)])
+def test_spiral_simple_count(args):
+    num = len(spiral_simple(*args)[0])
+    assert spiral_simple_count(*args) == num
+    assert spiral_simple_count(*args, chunk_size=10) == num
+    lower, estimate, upper = spiral_simple_count_bounds(*args)
+    assert lower <= estimate <= upper
+    assert lower <= num <= upper
+
+
+@pytest.mark.parametrize('args', fermat_args + [(0., 0., 0.1, 1),
+                                                (1., 1., 2., 1),
+                                                (4., 0.5, 0.07, 3)])
+def test_spiral_fermat_count(args):
+    num = len(spiral_fermat(*args)[0])
+    assert spiral_fermat_count(*args) == num
+    assert spiral_fermat_count(*args, chunk_size=10) == num
+    lower, estimate, upper = spiral_fermat_count_bounds(*args)
+    assert lower <= estimate <= upper
+    assert lower <= num <= upper
+
+
+@pytest.mark.parametrize('levels', [1, 2, 4, 6])
+def test_progressive_order_is_permutation(levels):
+    points = np.random.RandomState(0).uniform(-1, 1, size=(500, 2))
+    order, level_starts = progressive_order(points, levels=levels)
+    np.testing.assert_array_equal(np.sort(order), np.arange(len(points)))
+    assert len(level_starts) == levels + 1
+    assert level_starts[0] == 0 and level_starts[-1] == len(points)
+    assert np.all(np.diff(level_starts) >= 0)
+    # original order within each level
+    for start, stop in zip(level_starts[:-1], level_starts[1:]):
+        assert np.all(np.diff(order[start:stop]) > 0)
+
+
+def test_spiral_fermat_progressive_points():
+    args = (3., 2., 0.1, 1)
+    x, y = spiral_fermat(*args)
+    x_prog, y_prog, level_starts = spiral_fermat_progressive(*args, levels=4)
+    assert level_starts[-1] == len(x)
+    assert (sorted(zip(x_prog.tolist(), y_prog.tolist())) ==
+            sorted(zip(x.tolist(), y.tolist())))
@@ -0,0 +1,96 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('filestore')
+pytest.importorskip('h5py')
+
+from hxntools.handlers.sparse import (SparseFrames, SparseFrameWriter,
+                                      SparseFrameHandler, to_sparse)
+from hxntools.handlers.utils import bin_frames
+
+
+@pytest.fixture
+def frames():
+    rs = np.random.RandomState(0)
+    frames = rs.randint(1, 50, size=(6, 20, 30)).astype(np.uint16)
+    frames[rs.uniform(size=frames.shape) < 0.8] = 0
+    # an empty frame
+    frames[3] = 0
+    return frames
+
+
+def test_dense_round_trip(frames):
+    sparse = SparseFrames.from_dense(frames)
+    assert len(sparse) == len(frames)
+    assert sparse.nnz == np.count_nonzero(frames)
+    for i, frame in enumerate(frames):
+        np.testing.assert_array_equal(sparse.dense(i), frame)
+    index, values = to_sparse(frames[0], threshold=10)
+    np.testing.assert_array_equal(values, frames[0].ravel()[index])
+    assert np.all(values > 10)
+
+
+def test_reductions_match_dense(frames):
+    sparse = SparseFrames.from_dense(frames)
+    dense = frames.astype(np.float64)
+
+    np.testing.assert_allclose(sparse.frame_sums(), dense.sum(axis=(1, 2)))
+    np.testing.assert_allclose(sparse.sum_frames(), dense.sum(axis=0))
+    np.testing.assert_allclose(sparse.roi_sums(slice(2, 11), slice(5, 29)),
+                               dense[:, 2:11, 5:29].sum(axis=(1, 2)))
+
+    rows, cols = np.indices(frames.shape[1:])
+    total = dense.sum(axis=(1, 2))
+    with np.errstate(invalid='ignore'):
+        expected = np.column_stack([(dense * rows).sum(axis=(1, 2)) / total,
+                                    (dense * cols).sum(axis=(1, 2)) / total])
+    np.testing.assert_allclose(sparse.center_of_mass(), expected)
+    assert np.all(np.isnan(sparse.center_of_mass()[3]))
+
+
+def test_hdf5_round_trip(frames, tmpdir):
+    fn = str(tmpdir.join('sparse.h5'))
+    with SparseFrameWriter(fn) as writer:
+        for frame in frames:
+            writer.append(frame)
+
+    sparse = SparseFrames.from_hdf5(fn)
+    assert sparse.frame_shape == frames.shape[1:]
+    for i, frame in enumerate(frames):
+        np.testing.assert_array_equal(sparse.dense(i), frame)
+
+
+def _crop_bin_dense(frames, crop, binning):
+    row0, row1, col0, col1 = crop
+    return bin_frames(frames[:, row0:row1, col0:col1], binning)
+
+
+@pytest.mark.parametrize('crop, binning', [((0, 20, 0, 30), 1),
+                                           ((2, 17, 3, 28), 1),
+                                           ((0, 20, 0, 30), 3),
+                                           ((1, 19, 4, 29), (2, 4))])
+def test_crop_bin_matches_dense(frames, crop, binning):
+    sparse = SparseFrames.from_dense(frames).crop_bin(crop, binning)
+    expected = _crop_bin_dense(frames, crop, binning)
+    assert sparse.frame_shape == expected.shape[1:]
+    for i, frame in enumerate(expected):
+        np.testing.assert_array_equal(sparse.dense(i), frame)
+
+
+def test_handler_crop_and_binning(frames, tmpdir):
+    fn = str(tmpdir.join('sparse.h5'))
+    with SparseFrameWriter(fn) as writer:
+        for frame in frames:
+            writer.append(frame)
+
+    crop = (2, 18, 3, 27)
+    handler = SparseFrameHandler(fn, frame_per_point=2, crop=crop, binning=2)
+    np.testing.assert_array_equal(
+        handler(1), _crop_bin_dense(frames[2:4], crop, 2))
+    # per-call overrides, defaulting to the handler settings
+    np.testing.assert_array_equal(
+        handler(1, binning=3), _crop_bin_dense(frames[2:4], crop, 3))
+    np.testing.assert_array_equal(
+        handler(2, crop=(0, 20, 0, 30), binning=1), frames[4:6])
+    np.testing.assert_array_equal(
+        handler(0), _crop_bin_dense(frames[0:2], crop, 2))
@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from hxntools.spatial import PointIndex
+
+
+def _point_sets():
+    rs = np.random.RandomState(1)
+    yield rs.uniform(size=(300, 2))
+    # duplicates
+    yield np.round(rs.uniform(size=(200, 2)) * 3) / 3
+    # dense cluster with distant outliers
+    yield np.concatenate([rs.uniform(size=(200, 2)) * 0.01,
+                          rs.uniform(size=(3, 2)) * 100])
+    # very different axis scales, three axes
+    yield rs.normal(size=(150, 3)) * [1e3, 1, 1e-3]
+    yield rs.uniform(size=(100, 1))
+    yield rs.uniform(size=(3, 2))
+
+
+@pytest.mark.parametrize('points', list(_point_sets()))
+@pytest.mark.parametrize('k', [1, 4, 7])
+def test_nearest_matches_brute_force(points, k):
+    queries = np.random.RandomState(2).uniform(-2, 2,
+                                               size=(50, points.shape[1]))
+    dist, idx = PointIndex(points).nearest(queries, k=k)
+
+    expected = np.sqrt(np.sum((queries[:, np.newaxis] -
+                               points[np.newaxis]) ** 2, axis=-1))
+    found = min(k, len(points))
+    np.testing.assert_allclose(dist[:, :found],
+                               np.sort(expected, axis=1)[:, :found])
+    np.testing.assert_allclose(
+        np.take_along_axis(expected, idx[:, :found], axis=1),
+        dist[:, :found])
+    assert np.all(idx[:, found:] == -1)
+    assert np.all(np.isinf(dist[:, found:]))
+
+
+@pytest.mark.parametrize('points', list(_point_sets()))
+@pytest.mark.parametrize('radius', [0.01, 0.2, 1.5])
+def test_within_matches_brute_force(points, radius):
+    queries = np.random.RandomState(3).uniform(-1, 1,
+                                               size=(40, points.shape[1]))
+    offsets, idx, dist = PointIndex(points).within(queries, radius)
+
+    expected = np.sqrt(np.sum((queries[:, np.newaxis] -
+                               points[np.newaxis]) ** 2, axis=-1))
+    for i, row in enumerate(expected):
+        found = slice(offsets[i], offsets[i + 1])
+        assert (sorted(idx[found].tolist()) ==
+                np.flatnonzero(row <= radius).tolist())
+        np.testing.assert_allclose(dist[found], row[idx[found]])
+        assert np.all(np.diff(dist[found]) >= 0)
+
+
+def test_single_position_and_empty_index():
+    points = np.array([[0., 0.], [1., 0.], [0., 2.]])
+    dist, idx = PointIndex(points).nearest([0.9, 0.1], k=2)
+    np.testing.assert_array_equal(idx, [1, 0])
+
+    dist, idx = PointIndex(np.zeros((0, 2))).nearest([[0., 0.]], k=2)
+    assert np.all(idx == -1) and np.all(np.isinf(dist))
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('bluesky')
+pytest.importorskip('ophyd')
+cycler = pytest.importorskip('cycler').cycler
+
+from hxntools.spiral_scans import (ChunkedTrajectory, HxnFermatPlan,
+                                   HxnProgressiveFermatPlan)
+from hxntools.scans import lookup_steps
+
+
+class Motor(object):
+    def __init__(self, name):
+        self.name = name
+        self.position = 0.0
+
+
+@pytest.fixture
+def motors():
+    return Motor('x'), Motor('y')
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 100, 100000])
+def test_chunked_trajectory_matches_full(motors, chunk_size):
+    x_motor, y_motor = motors
+    plan = HxnFermatPlan([], x_motor, y_motor, 1., 1., 0.05, 1, 0.1)
+    args = plan.get_point_args()
+    x, y = plan.get_points(*args)
+    offsets = {x_motor: 1.5, y_motor: -2.0}
+
+    full = (cycler(x_motor, np.asarray(x) + 1.5) +
+            cycler(y_motor, np.asarray(y) - 2.0))
+    chunked = ChunkedTrajectory(
+        [x_motor, y_motor],
+        lambda: plan.iter_points(*args, chunk_size=chunk_size),
+        plan.count_points(*args), offsets=offsets)
+
+    assert len(chunked) == len(full)
+    assert list(chunked) == list(full)
+    # iterating again (e.g., to re-acquire points) gives the same points
+    indices = [0, 3, len(full) - 1]
+    steps = list(full)
+    assert lookup_steps(chunked, indices) == {i: steps[i] for i in indices}
+
+
+def test_progressive_get_points_has_no_side_effects(motors):
+    x_motor, y_motor = motors
+    plan = HxnProgressiveFermatPlan([], x_motor, y_motor, 1., 1., 0.05, 1,
+                                    0.1, levels=3, stop_after_level=1)
+    args = plan.get_point_args()
+    x, y = plan.get_points(*args)
+    assert plan.level_starts is None
+
+    points, level_starts = plan.get_level_points(*args)
+    assert len(level_starts) == 3
+    assert level_starts[-1] == len(x) == len(points[0])
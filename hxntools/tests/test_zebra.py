@@ -0,0 +1,107 @@
+import pytest
+
+pytest.importorskip('ophyd')
+
+from hxntools.sim import (SimBackend, simulated_epics)
+from hxntools.detectors.utils import readback_matches
+
+
+@pytest.fixture
+def zebra():
+    backend = SimBackend()
+    with simulated_epics(backend):
+        from hxntools.detectors.zebra import HXNZebra
+        zebra = HXNZebra('XF:03IDC-ES{Zeb:1}:', name='zebra')
+        zebra.backend = backend
+        yield zebra
+
+
+def _address(zebra, name):
+    return next(addr for addr, addr_name in zebra.addresses.items()
+                if addr_name == name)
+
+
+def _profile_registers(zebra, name):
+    return [(signal, value)
+            for stage, verify, registers in zebra.compile_profile(name)
+            for signal, value in registers]
+
+
+def test_unchanged_registers_are_skipped(zebra):
+    registers = _profile_registers(zebra, 'step_scan')
+    zebra.set(scan_mode='step_scan')
+    assert sum(zebra.register_stats) == len(registers)
+    assert all(readback_matches(signal, value)
+               for signal, value in registers)
+
+    zebra.backend.reset_counts()
+    zebra.set(scan_mode='step_scan')
+    assert zebra.register_stats == (0, len(registers))
+    assert zebra.backend.put_count == 0
+
+
+def test_externally_changed_register_is_rewritten(zebra):
+    registers = _profile_registers(zebra, 'step_scan')
+    zebra.set(scan_mode='step_scan')
+
+    # e.g., changed in the Zebra GUI
+    ttl = zebra.output[1].ttl
+    zebra.backend.set(ttl.pvname, 0)
+    zebra.backend.reset_counts()
+    zebra.set(scan_mode='step_scan')
+    assert zebra.register_stats == (1, len(registers) - 1)
+    assert zebra.backend.put_counts[ttl.setpoint_pvname] == 1
+    assert readback_matches(ttl, _address(zebra, 'PULSE1'))
+
+
+def test_force_rewrites_all_registers(zebra):
+    registers = _profile_registers(zebra, 'step_scan')
+    zebra.set(scan_mode='step_scan')
+    zebra.set(scan_mode='step_scan', force=True)
+    assert zebra.register_stats == (len(registers), 0)
+    assert not zebra.force_resync
+
+
+def test_mode_switch_writes_differences(zebra):
+    step = _profile_registers(zebra, 'step_scan')
+    zebra.set(scan_mode='step_scan')
+    zebra.set(scan_mode='fly_scan')
+    changed = sum(1 for signal, value in step
+                  if not readback_matches(signal, value))
+    assert changed > 0
+
+    zebra.backend.reset_counts()
+    zebra.set(scan_mode='step_scan')
+    assert zebra.register_stats == (changed, len(step) - changed)
+    assert zebra.backend.put_count == changed
+
+
+def test_compile_profile(zebra):
+    from hxntools.detectors.zebra import (ZebraProfile, hxn_step_scan)
+
+    plan = zebra.compile_profile('step_scan')
+    assert zebra.compile_profile(hxn_step_scan) is plan
+    assert [stage for stage, _, _ in plan] == ['inputs', 'edges', 'outputs']
+    assert [verify for _, verify, _ in plan] == [False, True, False]
+    assert all(signal is zebra.gate[2].input1_edge or
+               signal is zebra.gate[2].input2_edge or
+               signal is zebra.pulse[1].input_edge
+               for signal, _ in plan[1][2])
+
+    # replacing a profile recompiles it
+    profile = ZebraProfile('step_scan', [('output1.ttl', 'GATE1')])
+    zebra.add_profile(profile)
+    plan = zebra.compile_profile('step_scan')
+    assert plan == [('outputs', False,
+                     [(zebra.output[1].ttl, _address(zebra, 'GATE1'))])]
+
+
+@pytest.mark.parametrize('registers', [{'pulse5.width': 1.0},
+                                       {'output5.ttl': 'PULSE1'},
+                                       {'gate1.input1': 'NOT_AN_ADDRESS'},
+                                       {'gate1.input1_edge': 2},
+                                       {'bogus': 1}])
+def test_invalid_profiles(registers):
+    from hxntools.detectors.zebra import ZebraProfile
+    with pytest.raises(ValueError):
+        ZebraProfile('bad', registers)
@@ -0,0 +1,185 @@
+import os
+import json
+import time
+import logging
+import functools
+import threading
+from collections import (deque, OrderedDict)
+
+
+logger = logging.getLogger(__name__)
+
+
+class TimingRecorder(object):
+    '''Per-scan timing records of detector methods
+
+    Disabled by default; while disabled, instrumented methods cost a single
+    attribute check. Subscribe the recorder to the RunEngine so that records
+    are grouped by scan::
+
+        recorder.enable()
+        gs.RE.subscribe('all', recorder)
+
+    Parameters
+    ----------
+    max_records : int, optional
+        Maximum number of records kept; the oldest are dropped first
+    '''
+    def __init__(self, max_records=100000):
+        self.enabled = False
+        self.scan_id = None
+        self._records = deque(maxlen=max_records)
+        self._lock = threading.Lock()
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def clear(self):
+        with self._lock:
+            self._records.clear()
+
+    def record(self, name, phase, start, duration):
+        '''Add a single record
+
+        Parameters
+        ----------
+        name : str
+            Object name
+        phase : str
+            Method or phase name
+        start : float
+            Start time (time.time())
+        duration : float
+            Duration in seconds
+        '''
+        with self._lock:
+            self._records.append((self.scan_id, name, phase, start, duration,
+                                  threading.get_ident()))
+
+    def __call__(self, name, doc):
+        '''Bluesky callback with document info'''
+        if name == 'start':
+            self.scan_id = doc.get('scan_id', doc.get('uid'))
+        elif name == 'stop':
+            # records made between scans are not attributed to the last one
+            self.scan_id = None
+
+    def records(self, scan_id=None):
+        '''Records as (scan_id, name, phase, start, duration, thread_id)
+
+        Parameters
+        ----------
+        scan_id : optional
+            Only return records from this scan
+        '''
+        with self._lock:
+            records = list(self._records)
+
+        if scan_id is None:
+            return records
+        return [rec for rec in records if rec[0] == scan_id]
+
+    def summary(self, scan_id=None):
+        '''Per-object, per-phase summary table
+
+        Returns
+        -------
+        table : str
+            Count, total, mean and maximum time of each (name, phase)
+        '''
+        stats = OrderedDict()
+        for _, name, phase, start, duration, _ in self.records(scan_id):
+            key = (name, phase)
+            count, total, max_ = stats.get(key, (0, 0.0, 0.0))
+            stats[key] = (count + 1, total + duration, max(max_, duration))
+
+        lines = ['{:<30s} {:<12s} {:>6s} {:>10s} {:>10s} {:>10s}'
+                 ''.format('name', 'phase', 'count', 'total', 'mean', 'max')]
+        for (name, phase), (count, total, max_) in sorted(
+                stats.items(), key=lambda item: -item[1][1]):
+            lines.append('{:<30s} {:<12s} {:>6d} {:>10.4f} {:>10.4f} '
+                         '{:>10.4f}'.format(name, phase, count, total,
+                                            total / count, max_))
+        return '\n'.join(lines)
+
+    def to_chrome_trace(self, scan_id=None):
+        '''Records in the Chrome/Perfetto trace event format'''
+        pid = os.getpid()
+        events = [{'name': '{}.{}'.format(name, phase),
+                   'cat': phase,
+                   'ph': 'X',
+                   'ts': start * 1e6,
+                   'dur': duration * 1e6,
+                   'pid': pid,
+                   'tid': thread_id,
+                   'args': {'scan_id': rec_scan_id},
+                   }
+                  for rec_scan_id, name, phase, start, duration, thread_id
+                  in self.records(scan_id)]
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def export_chrome_trace(self, fn, scan_id=None):
+        '''Write a trace file loadable in chrome://tracing or Perfetto'''
+        with open(fn, 'wt') as f:
+            json.dump(self.to_chrome_trace(scan_id), f)
+
+    def __repr__(self):
+        return ('{0.__class__.__name__}(enabled={0.enabled}, '
+                'records={1})'.format(self, len(self._records)))
+
+
+recorder = TimingRecorder()
+
+
+def _object_name(obj):
+    name = getattr(obj, 'name', None)
+    if name:
+        return '{}:{}'.format(obj.__class__.__name__, name)
+    return obj.__class__.__name__
+
+
+def timed(func, phase=None):
+    '''Wrap a method so that calls are recorded when timing is enabled'''
+    if phase is None:
+        phase = func.__name__
+
+    @functools.wraps(func)
+    def wrapped(self, *args, **kwargs):
+        if not recorder.enabled:
+            return func(self, *args, **kwargs)
+
+        t0 = time.time()
+        try:
+            return func(self, *args, **kwargs)
+        finally:
+            recorder.record(_object_name(self), phase, t0, time.time() - t0)
+
+    wrapped._timed = True
+    return wrapped
+
+
+default_methods = ('configure', 'deconfigure', 'set', 'read', 'bulk_read',
+                   'describe')
+
+
+def instrumented(*methods):
+    '''Class decorator recording calls to the given methods
+
+    Inherited methods are wrapped as well. Defaults to configure,
+    deconfigure, set, read, bulk_read and describe.
+    '''
+    if not methods:
+        methods = default_methods
+
+    def wrapper(cls):
+        for method in methods:
+            func = getattr(cls, method, None)
+            if func is None or getattr(func, '_timed', False):
+                continue
+            setattr(cls, method, timed(func, method))
+        return cls
+
+    return wrapper